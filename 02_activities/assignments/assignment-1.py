@@ -3,148 +3,44 @@
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 
-# Example 1: Basic scatter plot (similar to Life Expectancy visualization)
+from async_save import AsyncSaver
+from figures import (aspect_ratio_figure, campaign_costs_figure, life_expectancy_figure,
+                     sales_line_figure, simple_example_figure)
 
-# Create sample data similar to the life expectancy example
-np.random.seed(42)
-continents = ['Africa', 'Americas', 'Asia', 'Europe', 'Oceania']
-colors = ['#3498db', '#e67e22', '#2ecc71', '#e74c3c', '#9b59b6']
+# Each example is a builder in figures.py that returns the Figure; here we
+# save and show them one by one (export.py renders them all in parallel).
+# The saver encodes each PNG in the background while the next one is built.
+saver = AsyncSaver()
 
-# Generate sample data
-data = []
-for i, continent in enumerate(continents):
-    n_countries = np.random.randint(20, 40)
-    gdp = np.random.lognormal(8, 1.5, n_countries)
-    life_exp = 50 + 15 * np.log(gdp) + np.random.normal(0, 3, n_countries)
-    life_exp = np.clip(life_exp, 40, 85)
-    
-    for j in range(n_countries):
-        data.append({
-            'continent': continent,
-            'gdp_per_capita': gdp[j],
-            'life_expectancy': life_exp[j],
-            'population': np.random.lognormal(15, 2),
-            'color': colors[i]
-        })
-
-df = pd.DataFrame(data)
-
-# Create the visualization
-plt.figure(figsize=(12, 8))
-for continent, color in zip(continents, colors):
-    continent_data = df[df['continent'] == continent]
-    plt.scatter(
-        continent_data['gdp_per_capita'],
-        continent_data['life_expectancy'],
-        s=continent_data['population'] / 1e6,
-        alpha=0.6,
-        c=color,
-        label=continent,
-        edgecolors='white',
-        linewidth=0.5
-    )
-
-plt.xlabel('GDP per capita (2000 dollars)', fontsize=12)
-plt.ylabel('Life Expectancy (years)', fontsize=12)
-plt.title('Life Expectancy v. Per Capita GDP, 2007', fontsize=14, fontweight='bold')
-plt.xscale('log')
-plt.legend(title='Continent', loc='lower right')
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.savefig('life_expectancy_gdp.png', dpi=300, bbox_inches='tight')
+# Example 1: Basic scatter plot (similar to Life Expectancy visualization)
+fig = life_expectancy_figure()
+saver.savefig(fig, 'life_expectancy_gdp.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 # Example 2: Line chart with multiple series
-
-# Create sample sales data
-months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
-desktops = [80, 45, 25, 20, 10, 5]
-laptops = [30, 25, 35, 50, 45, 55]
-tablets = [10, 15, 20, 35, 60, 95]
-
-plt.figure(figsize=(10, 6))
-plt.plot(months, desktops, marker='o', linewidth=2, label='Desktops')
-plt.plot(months, laptops, marker='o', linewidth=2, label='Laptops')
-plt.plot(months, tablets, marker='o', linewidth=2, label='Tablets')
-
-plt.xlabel('Month', fontsize=12)
-plt.ylabel('Units Sold', fontsize=12)
-plt.title('Product Sales by Month', fontsize=14, fontweight='bold')
-plt.legend()
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.savefig('sales_line_chart.png', dpi=300, bbox_inches='tight')
+fig = sales_line_figure()
+saver.savefig(fig, 'sales_line_chart.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 # Example 3: Demonstrating aspect ratio effects (from slide 21)
-
-# Generate exponential data
-x = np.linspace(0, 8, 100)
-y = np.exp(x / 2)
-
-# Create two plots with different aspect ratios
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
-
-# Tall, narrow plot
-ax1.plot(x, y, linewidth=2, color='#2c3e50')
-ax1.set_xlabel('x', fontsize=11)
-ax1.set_ylabel('Value', fontsize=11)
-ax1.set_title('Narrow Aspect Ratio\n(Emphasizes steepness)', fontsize=12)
-ax1.grid(True, alpha=0.3)
-ax1.set_aspect(0.002)
-
-# Wide plot
-ax2.plot(x, y, linewidth=2, color='#2c3e50')
-ax2.set_xlabel('x', fontsize=11)
-ax2.set_ylabel('Value', fontsize=11)
-ax2.set_title('Wide Aspect Ratio\n(De-emphasizes steepness)', fontsize=12)
-ax2.grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.savefig('aspect_ratio_comparison.png', dpi=300, bbox_inches='tight')
+fig = aspect_ratio_figure()
+saver.savefig(fig, 'aspect_ratio_comparison.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 # Example 4: Bar chart
-
-years = ['1972', '1974', '1976', '1978', '1980', '1982 est.']
-costs = [50, 75, 125, 175, 250, 300]
-
-plt.figure(figsize=(10, 6))
-bars = plt.bar(years, costs, color='#c0392b', alpha=0.7, edgecolor='black')
-plt.xlabel('Year', fontsize=12)
-plt.ylabel('Total Campaign Expenditures (millions)', fontsize=12)
-plt.title('House and Senate Campaign Costs', fontsize=14, fontweight='bold')
-plt.grid(True, alpha=0.3, axis='y')
-
-# Add value labels on bars
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height,
-             f'${int(height)}M',
-             ha='center', va='bottom', fontsize=10)
-
-plt.tight_layout()
-plt.savefig('campaign_costs.png', dpi=300, bbox_inches='tight')
+fig = campaign_costs_figure()
+saver.savefig(fig, 'campaign_costs.png', dpi=300, bbox_inches='tight')
 plt.show()
 
 # Example 5: Creating a basic plot with customization (teaching example)
-
-# Simple example for beginners
-x = [1, 2, 3, 4, 5]
-y = [2, 4, 6, 8, 10]
-
-plt.figure(figsize=(8, 6))
-plt.plot(x, y, marker='o', linestyle='-', color='blue', linewidth=2, markersize=8)
-plt.xlabel('X Values', fontsize=12)
-plt.ylabel('Y Values', fontsize=12)
-plt.title('Simple Line Plot Example', fontsize=14, fontweight='bold')
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.savefig('simple_example.png', dpi=300, bbox_inches='tight')
+fig = simple_example_figure()
+saver.savefig(fig, 'simple_example.png', dpi=300, bbox_inches='tight')
 plt.show()
 
+# Wait for the last files to be written
+saver.close()
+
 print("All visualizations have been created and saved!")
 print("\nFiles created:")
 print("1. life_expectancy_gdp.png")
@@ -229,14 +125,13 @@ ax.grid(axis='y')
 # Add styled gridlines
 ax.grid(axis='y', color='blue', linewidth=2, linestyle='-.')
 
+# Close the previous deck's figures before starting the next one
+plt.close('all')
+
 # Slide deck 05 - Advanced Matplotlib: Legends, Annotations, and Styling
 
 import numpy as np
 import matplotlib.pyplot as plt
-import pandas as pd
-import scipy
-import PIL
-import requests
 
 # Generate sample data
 np.random.seed(613)
@@ -371,14 +266,13 @@ ax.plot(x, y1)
 ax.plot(x, y2)
 fig.show()
 
+# Close the previous deck's figures before starting the next one
+plt.close('all')
+
 # Slide deck 06 - Subplots, Multiple Plots, Error Bars, and Images
 
 import numpy as np
 import matplotlib.pyplot as plt
-import pandas as pd
-import scipy
-import PIL
-import requests
 
 # Generate sample data
 np.random.seed(613)
@@ -487,13 +381,11 @@ ax.errorbar(x,
             errorevery=2)       # Show every 2nd error bar
 
 # Download and load image from URL
-from PIL import Image
-import requests
-from io import BytesIO
+# (kept in a disk cache, so reruns only revalidate instead of downloading)
+from image_cache import ImageCache, inset_image
 
-response = requests.get('https://upload.wikimedia.org/wikipedia/en/c/cb/Monkey_D_Luffy.png')
-image_file = BytesIO(response.content)
-image = Image.open(image_file)
+luffy_url = 'https://upload.wikimedia.org/wikipedia/en/c/cb/Monkey_D_Luffy.png'
+images = ImageCache()
 
 # Create plot with space for image
 fig, ax = plt.subplots(figsize=(7, 3))
@@ -508,9 +400,9 @@ ax_image = fig.add_axes([0.1,   # x position (0-1 range)
 # Display image in overlay axes
 fig, ax = plt.subplots(figsize=(7, 3))
 ax.plot(x, y2, color="red")
-ax_image = fig.add_axes([0.1, 0.11, 0.15, 0.35])
-ax_image.imshow(image)
-ax_image.axis('off')  # Hide image axes
+# (only the pixels the inset covers are decoded; saving at another dpi
+# picks a matching level from a cached thumbnail pyramid, axes hidden)
+ax_image, _ = inset_image(fig, [0.1, 0.11, 0.15, 0.35], luffy_url, cache=images)
 
 
 
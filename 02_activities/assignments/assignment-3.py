@@ -1,78 +1,64 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import os
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
-# Set styling
-plt.style.use('seaborn-v0_8-whitegrid')
-sns.set_palette("husl")
+from startup import lazy_import, use_noninteractive_backend
 
-def create_language_analysis(df, output_path):
+# Figures are only saved, never shown
+use_noninteractive_backend()
+
+from async_save import COMPRESS_LEVELS, AsyncSaver
+from column_sources import ARROW_EXTENSIONS
+from earlyon_data import (LANGUAGE_COLUMNS, LOCATION_COLUMNS, language_counts, language_stats,
+                          load_earlyon, load_language_matrix, stream_language_stats,
+                          update_language_stats)
+from figures import (LAYOUT_CACHE, LanguageAnalysisView, language_analysis_figure,
+                     languages_offered_figure, location_analysis_figure, location_stats)
+from render_profile import background_save, enable as enable_profiling, phase, profile_figure
+
+# pandas, pyplot and seaborn load on first use, so --help and runs with
+# nothing new to draw skip them entirely
+plt = lazy_import('matplotlib.pyplot')
+
+# Above this size the CSV is streamed instead of loaded into memory
+STREAMING_THRESHOLD_BYTES = 1_000_000_000
+
+# Styling (seaborn-v0_8-whitegrid, husl palette) is applied by LanguageAnalysisView
+
+def save_figure(fig, output_path, saver=None):
+    """Save at 300 dpi; with an AsyncSaver the PNG is encoded in the background"""
+    if saver is None:
+        with phase('save', fig=fig, target=output_path):
+            LAYOUT_CACHE.savefig(fig, output_path, dpi=300, bbox_inches='tight')
+        return
+    # The file is written later: the profile books its encode time and size when it is done
+    with phase('save', fig=fig):
+        future = saver.savefig(fig, output_path, dpi=300, bbox_inches='tight')
+    background_save(future, output_path)
+
+def create_language_analysis(df, output_path, saver=None):
     """Create language analysis visualization"""
+    with phase('aggregate'):
+        stats = language_stats(df)
+    plot_language_stats(stats, output_path, saver)
+
+def plot_language_stats(stats, output_path, saver=None):
+    """Draw the language analysis charts and summary from precomputed counts"""
     print("Creating Language Analysis Visualization...")
     
-    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
-    
     # Count centres with language information
-    centres_with_languages = df['languages'].notna().sum()
-    french_programs = df['french_language_program'].notna().sum()
-    indigenous_programs = df['indigenous_program'].notna().sum()
-    
-    # 1. Language program availability (Bar Chart)
-    ax1 = axes[0]
-    language_stats = {
-        'Multiple Languages': centres_with_languages,
-        'French Programs': french_programs,
-        'Indigenous Programs': indigenous_programs
-    }
-    
-    colors = ['#3498db', '#e74c3c', '#2ecc71']
-    bars = ax1.bar(language_stats.keys(), language_stats.values(), 
-                   color=colors, edgecolor='black', linewidth=1.5)
-    ax1.set_ylabel('Number of Centres', fontsize=12, fontweight='bold')
-    ax1.set_title('Language Program Availability', fontsize=14, fontweight='bold', pad=15)
-    ax1.grid(axis='y', alpha=0.3, linestyle='--')
+    total = stats['total']
+    centres_with_languages = stats['centres_with_languages']
+    french_programs = stats['french_programs']
+    indigenous_programs = stats['indigenous_programs']
     
-    # Add value labels on bars
-    for bar in bars:
-        height = bar.get_height()
-        ax1.text(bar.get_x() + bar.get_width()/2., height,
-                f'{int(height)}',
-                ha='center', va='bottom', fontsize=12, fontweight='bold')
-    
-    # 2. Percentage breakdown (Pie Chart)
-    ax2 = axes[1]
-    total = len(df)
-    percentages = {
-        'Multilingual\nSupport': (centres_with_languages / total * 100),
-        'French\nPrograms': (french_programs / total * 100),
-        'Indigenous\nPrograms': (indigenous_programs / total * 100),
-        'English\nOnly': ((total - centres_with_languages) / total * 100)
-    }
-    
-    colors_pie = ['#3498db', '#e74c3c', '#2ecc71', '#95a5a6']
-    wedges, texts, autotexts = ax2.pie(percentages.values(), 
-                                         labels=percentages.keys(),
-                                         autopct='%1.1f%%',
-                                         startangle=90,
-                                         colors=colors_pie,
-                                         textprops={'fontsize': 10})
-    
-    # Make percentage text more visible
-    for autotext in autotexts:
-        autotext.set_color('white')
-        autotext.set_fontweight('bold')
-        autotext.set_fontsize(11)
-    
-    ax2.set_title('Language Service Distribution', fontsize=14, fontweight='bold', pad=15)
-    
-    plt.suptitle('EarlyON Child and Family Centres - Language Services Analysis', 
-                 fontsize=16, fontweight='bold', y=1.02)
-    
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close()
+    # Bar chart of program availability + pie chart of the percentage breakdown
+    with phase('build'):
+        fig = language_analysis_figure(stats)
+    save_figure(fig, output_path, saver)
+    plt.close(fig)
     
     print(f"✓ Language analysis visualization saved to: {output_path}")
     
@@ -87,27 +73,153 @@ def create_language_analysis(df, output_path):
     print(f"English Only: {total - centres_with_languages} ({(total - centres_with_languages)/total*100:.1f}%)")
     print("="*60 + "\n")
 
-def main():
-    """Main function"""
+def create_location_analysis(df, output_path, saver=None):
+    """Create the location analysis visualization (needs the geometry column)"""
+    print("Creating Location Analysis Visualization...")
+    with phase('aggregate'):
+        stats = location_stats(df)
+    with phase('build'):
+        fig = location_analysis_figure(stats)
+    save_figure(fig, output_path, saver)
+    plt.close(fig)
+
+    print(f"✓ Location analysis visualization saved to: {output_path}")
     print("\n" + "="*60)
-    print("EARLYON LANGUAGE ANALYSIS VISUALIZATION")
+    print("CENTRES BY CITY")
+    print("="*60)
+    by_city = stats['by_city'].rename(columns={'nearby': f"within {stats['radius_km']:g} km"})
+    print(by_city.round(1).to_string())
+    print("="*60 + "\n")
+
+def create_languages_offered(matrix, output_path, saver=None):
+    """Create the per-language visualization from a language_matrix()"""
+    print("Creating Languages Offered Visualization...")
+    with phase('build'):
+        fig = languages_offered_figure(matrix)
+    save_figure(fig, output_path, saver)
+    plt.close(fig)
+
+    print(f"✓ Languages offered visualization saved to: {output_path}")
+    print("\n" + "="*60)
+    print("CENTRES PER LANGUAGE")
+    print("="*60)
+    print(language_counts(matrix).to_string())
     print("="*60 + "\n")
-    
 
+def refresh_language_analysis(input_file, output_path, view=None):
+    """Incrementally update the language analysis from newly appended rows
+    
+    Counts are kept on disk between runs (see update_language_stats), so only
+    the rows added since the last refresh are parsed. When the previous view
+    is passed in, only the bars, labels and pie wedges are updated.
+    """
+    with phase('load'):
+        stats, new_rows = update_language_stats(input_file)
+    print(f"✓ Counted {new_rows} new rows ({stats['total']} centres in total)")
+    if view is None:
+        with phase('build'):
+            view = LanguageAnalysisView(stats)
+    else:
+        with phase('update'):
+            changed = view.update(stats)
+        if not changed:
+            print("No changes, figure not re-saved")
+            return view
+    with phase('save', fig=view.fig, target=output_path):
+        LAYOUT_CACHE.savefig(view.fig, output_path, dpi=300, bbox_inches='tight')
+    print(f"✓ Language analysis visualization saved to: {output_path}")
+    return view
+
+def main():
+    """Main function"""
     input_file = r"C:\Users\86185\Desktop\DSI\Assignments\visualization\02_activities\assignments\EarlyON_Child_and_Family_Centres_Locations_-_geometry_-_4326.csv"
     
     output_file = r"C:\Users\86185\Desktop\DSI\Assignments\visualization\02_activities\assignments\language_analysis.png"
     
-    # Load data
-    print(f"Loading data from: {input_file}")
-    df = pd.read_csv(input_file)
-    print(f"✓ Data loaded successfully! ({len(df)} centres)")
+    parser = argparse.ArgumentParser(description="EarlyON language analysis visualization")
+    parser.add_argument('--input', default=input_file,
+                        help='EarlyON centres CSV (or Arrow/Feather extract)')
+    parser.add_argument('--output', default=output_file, help='output image')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only process rows appended since the last run')
+    parser.add_argument('--watch', type=float, metavar='SECONDS',
+                        help='with --incremental, keep refreshing every SECONDS')
+    parser.add_argument('--locations', metavar='OUTPUT',
+                        help='also draw the location analysis (centres per city, density map, '
+                             'centres nearby) to OUTPUT')
+    parser.add_argument('--languages', metavar='OUTPUT',
+                        help='also draw the centres per language and the languages offered '
+                             'together to OUTPUT')
+    parser.add_argument('--compress-level', default='default',
+                        help=f"PNG zlib level 0-9 or one of {', '.join(COMPRESS_LEVELS)} "
+                             "(default: the same bytes as savefig)")
+    parser.add_argument('--profile', metavar='JSONL',
+                        help='append a timing record per render (load, build, layout, '
+                             'draw, encode) to this file')
+    parser.add_argument('--cprofile', metavar='DIR',
+                        help='with --profile, also write a cProfile dump here')
+    args = parser.parse_args()
+    input_file, output_file = args.input, args.output
+    if args.profile:
+        enable_profiling(args.profile, args.cprofile)
     
-    # Create visualization
-    create_language_analysis(df, output_file)
+    print("\n" + "="*60)
+    print("EARLYON LANGUAGE ANALYSIS VISUALIZATION")
+    print("="*60 + "\n")
     
+    compress_level = args.compress_level
+    if compress_level.isdigit():
+        compress_level = int(compress_level)
+    # Each PNG is encoded and written in the background while the next figure is built
+    with AsyncSaver(compress_level=compress_level, render=LAYOUT_CACHE.savefig) as saver:
+        if args.incremental:
+            with profile_figure('language_analysis', input=input_file, mode='incremental'):
+                view = refresh_language_analysis(input_file, output_file)
+        # Files bigger than STREAMING_THRESHOLD_BYTES are aggregated chunk by chunk
+        elif (os.path.getsize(input_file) > STREAMING_THRESHOLD_BYTES
+              and not input_file.lower().endswith(ARROW_EXTENSIONS)):
+            with profile_figure('language_analysis', input=input_file, mode='stream'):
+                print(f"Streaming data from: {input_file}")
+                with phase('load'):
+                    stats = stream_language_stats(input_file)
+                print(f"✓ Data aggregated successfully! ({stats['total']} centres)")
+                plot_language_stats(stats, output_file, saver)
+        else:
+            with profile_figure('language_analysis', input=input_file, mode='full'):
+                # Load data (only the language columns; reuses a cached sidecar when the CSV is unchanged)
+                print(f"Loading data from: {input_file}")
+                with phase('load'):
+                    df = load_earlyon(input_file, columns=LANGUAGE_COLUMNS)
+                print(f"✓ Data loaded successfully! ({len(df)} centres)")
+
+                # Create visualization
+                create_language_analysis(df, output_file, saver)
+
+        if args.locations:
+            with profile_figure('location_analysis', input=input_file):
+                # City, school flag and the point geometry, parsed into coordinates once
+                with phase('load'):
+                    centres = load_earlyon(input_file, columns=LOCATION_COLUMNS, geometry=True)
+                create_location_analysis(centres, args.locations, saver)
+
+        if args.languages:
+            with profile_figure('languages_offered', input=input_file):
+                # Tokenized once per version of the file, then read from a sidecar
+                with phase('load'):
+                    matrix = load_language_matrix(input_file)
+                create_languages_offered(matrix, args.languages, saver)
+
+    while args.incremental and args.watch:
+        time.sleep(args.watch)
+        with profile_figure('language_analysis', input=input_file, mode='watch'):
+            view = refresh_language_analysis(input_file, output_file, view)
+
     print("\n✨ Visualization complete! ✨")
     print(f"Output saved to: {output_file}\n")
+    if args.locations:
+        print(f"Location analysis saved to: {args.locations}\n")
+    if args.languages:
+        print(f"Languages offered saved to: {args.languages}\n")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,165 @@
+# Saving figures in the background
+#
+# fig.savefig('x.png') blocks while Agg draws the figure and then while
+# zlib compresses the pixels, and only the drawing needs the figure.
+# AsyncSaver draws on the calling thread, snapshots the RGBA buffer and
+# hands PNG encoding and the file write to a thread pool. Pillow releases
+# the GIL while it compresses, so the script builds the next figure while
+# the last one is encoded. Other formats are rendered into memory on the
+# calling thread (matplotlib is not thread-safe) and only written in the
+# background.
+
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from startup import lazy_import
+
+mpl = lazy_import('matplotlib')
+mimage = lazy_import('matplotlib.image')
+np = lazy_import('numpy')
+
+# zlib levels by name; 6 is what fig.savefig() writes
+COMPRESS_LEVELS = {'fast': 1, 'default': 6, 'small': 9}
+
+
+def _compress_level(level):
+    level = COMPRESS_LEVELS.get(level, level)
+    if not isinstance(level, int) or not 0 <= level <= 9:
+        raise ValueError(f"compress_level must be 0-9 or one of {', '.join(COMPRESS_LEVELS)}, "
+                         f"not {level!r}")
+    return level
+
+
+def _format(fname, fmt):
+    if fmt is None and isinstance(fname, (str, os.PathLike)):
+        fmt = os.path.splitext(os.fspath(fname))[1][1:]
+    return (fmt or mpl.rcParams['savefig.format']).lower()
+
+
+class AsyncSaver:
+    """fig.savefig() that returns once the figure is drawn; encoding and writes run in workers
+
+    saver.savefig(fig, fname, ...) takes fig.savefig()'s arguments and
+    returns a Future for the path. The figure can be changed or closed as
+    soon as it returns. At most max_pending saves are queued or encoding
+    at once; savefig() waits for a free slot beyond that, which bounds the
+    memory held in pixel snapshots. flush() waits for every save so far
+    and raises the first error; leaving a `with AsyncSaver() as saver:`
+    block flushes and stops the workers.
+
+    compress_level (0-9, or 'fast', 'default' or 'small') trades PNG size
+    for encode time; the default writes the same bytes as fig.savefig().
+    Pass render=LAYOUT_CACHE.savefig to draw through a LayoutCache.
+    Each Future's timing dict gets the 'seconds' its worker spent encoding
+    and writing once it is done (render_profile.background_save() books
+    them).
+    """
+
+    def __init__(self, workers=2, max_pending=4, compress_level='default', render=None):
+        self.compress_level = _compress_level(compress_level)
+        self._render = render or (lambda fig, fname, **kwargs: fig.savefig(fname, **kwargs))
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='async-save')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def savefig(self, fig, fname, *, format=None, compress_level=None, **kwargs):
+        """Draw fig now and save it to fname in the background; returns a Future"""
+        fmt = _format(fname, format)
+        self._slots.acquire()
+        try:
+            if fmt == 'png':
+                level = _compress_level(self.compress_level if compress_level is None
+                                        else compress_level)
+                job = self._snapshot_png(fig, fname, level, kwargs)
+            else:
+                buffer = io.BytesIO()
+                self._render(fig, buffer, format=fmt, **kwargs)
+                job = (_write, fname, buffer.getvalue())
+            timing = {}
+            future = self._pool.submit(_timed, timing, *job)
+            future.timing = timing
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _snapshot_png(self, fig, fname, level, kwargs):
+        """Draw fig to raw RGBA; returns the encode job for a worker"""
+        metadata = kwargs.pop('metadata', None)
+        pil_kwargs = dict(kwargs.pop('pil_kwargs', None) or {})
+        pil_kwargs.setdefault('compress_level', level)
+        renderers = []
+        callback = fig.canvas.mpl_connect('draw_event',
+                                          lambda event: renderers.append(event.renderer))
+        buffer = io.BytesIO()
+        try:
+            self._render(fig, buffer, format='rgba', **kwargs)
+        finally:
+            fig.canvas.mpl_disconnect(callback)
+        # The last draw is the one written out (after any tight-bbox crop)
+        renderer = renderers[-1]
+        pixels = np.frombuffer(buffer.getbuffer(), np.uint8).reshape(
+            int(renderer.height), int(renderer.width), 4)
+        return _encode_png, fname, pixels, renderer.dpi, metadata, pil_kwargs
+
+    def _done(self, future):
+        self._slots.release()
+
+    def flush(self):
+        """Wait for every save started so far; raises the first one that failed"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        done, _ = wait(pending)
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+            return
+        # Do not mask the error from the block with one from a save
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def _timed(timing, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timing['seconds'] = time.perf_counter() - start
+
+
+def _encode_png(fname, pixels, dpi, metadata, pil_kwargs):
+    # What Agg's print_png() does with its buffer, off the drawing thread
+    mimage.imsave(fname, memoryview(pixels), format='png', origin='upper', dpi=dpi,
+                  metadata=metadata, pil_kwargs=pil_kwargs)
+    return fname
+
+
+def _write(fname, data):
+    if hasattr(fname, 'write'):
+        fname.write(data)
+    else:
+        with open(fname, 'wb') as f:
+            f.write(data)
+    return fname
@@ -0,0 +1,1149 @@
+# Benchmarks for the course example helpers
+#
+# Run from this folder:
+#     python benchmarks.py                  # every benchmark
+#     python benchmarks.py sample_data      # just one
+#     python benchmarks.py examples --save-baseline   # record baselines
+#     python benchmarks.py examples         # fails on a regression past them
+#
+# Behaviour checks are tests, which run in seconds:
+#     python -m unittest
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from earlyon_data import (language_co_occurrence, language_counts, language_matrix,
+                          language_stats, load_earlyon, load_language_matrix, normalize_language,
+                          parallel_language_stats, stream_language_stats,
+                          update_language_stats)
+from export import export_all
+from figure_pool import FigurePool
+from figures import EARLYON_FIGURES, FIGURE_BUILDERS
+from image_cache import USER_AGENT, ImageCache, inset_image
+from layout_cache import LayoutCache
+from plot_helpers import (adaptive_scatter, grouped_scatter, grouped_scatter_loop, label_bars,
+                          label_bars_loop, lod_plot)
+from render_server import RenderPool, serve
+from sample_data import (CONTINENTS, generate_earlyon_like, generate_gapminder_like,
+                         generate_gapminder_loop, write_earlyon_csv)
+from startup import import_time_breakdown
+
+
+def _timeit(func, *args, repeat=3, **kwargs):
+    """Best wall time over repeat runs, plus the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_sample_data(sizes=(1_000, 100_000, 10_000_000), legacy_max=100_000):
+    """Vectorized generate_gapminder_like vs the original per-row dict loop"""
+    print(f"{'rows':>12} {'loop (s)':>10} {'vector (s)':>11} {'speedup':>8} {'MB':>8}")
+    for rows in sizes:
+        n_per_group = max(1, rows // len(CONTINENTS))
+        repeat = 1 if rows >= 1_000_000 else 3
+        vec_time, df = _timeit(generate_gapminder_like, n_per_group, repeat=repeat)
+        megabytes = df.memory_usage(deep=True).sum() / 1e6
+        if rows <= legacy_max:
+            loop_time, _ = _timeit(generate_gapminder_loop, n_per_group, repeat=repeat)
+            loop_text, speedup = f"{loop_time:10.3f}", f"{loop_time / vec_time:7.1f}x"
+        else:
+            loop_text, speedup = f"{'skipped':>10}", f"{'-':>8}"
+        print(f"{rows:>12,} {loop_text} {vec_time:11.3f} {speedup} {megabytes:8.1f}")
+
+
+def _draw_scatter(scatter_func, x, y, groups):
+    fig, ax = plt.subplots(figsize=(6, 4))
+    scatter_func(ax, x, y, groups, s=4)
+    fig.canvas.draw()
+    n_artists = len(ax.collections)
+    plt.close(fig)
+    return n_artists
+
+
+def bench_grouped_scatter(rows=100_000, group_counts=(5, 50, 500)):
+    """Single-collection grouped_scatter vs one masked scatter per group"""
+    rng = np.random.default_rng(0)
+    x, y = rng.random(rows), rng.random(rows)
+    print(f"{'groups':>8} {'loop (s)':>10} {'artists':>8} {'single (s)':>11} {'speedup':>8}")
+    for n_groups in group_counts:
+        groups = rng.integers(0, n_groups, rows).astype(str)
+        loop_time, loop_artists = _timeit(_draw_scatter, grouped_scatter_loop, x, y, groups,
+                                          repeat=1)
+        single_time, _ = _timeit(_draw_scatter, grouped_scatter, x, y, groups, repeat=1)
+        print(f"{n_groups:>8} {loop_time:10.3f} {loop_artists:>8} {single_time:11.3f} "
+              f"{loop_time / single_time:7.1f}x")
+
+
+def _save_scatter(max_points, x, y, groups, path):
+    fig, ax = plt.subplots(figsize=(12, 8))
+    ax.set_xscale('log')
+    adaptive_scatter(ax, x, y, groups, max_points=max_points, s=4)
+    fig.savefig(path, dpi=300)
+    plt.close(fig)
+    return os.path.getsize(path)
+
+
+def bench_aggregate_scatter(sizes=(10_000, 100_000, 1_000_000), vector_max=1_000_000):
+    """Binned raster vs vector markers for a log-x scatter saved at 300 dpi"""
+    print(f"{'points':>10} {'vector (s)':>11} {'vector MB':>10} {'raster (s)':>11} {'raster MB':>10}")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'scatter.pdf')
+        for rows in sizes:
+            x = rng.lognormal(8, 1.5, rows)
+            y = 40 + 5 * np.log(x) + rng.normal(0, 3, rows)
+            groups = rng.integers(0, 5, rows)
+            if rows <= vector_max:
+                vec_time, vec_size = _timeit(_save_scatter, float('inf'), x, y, groups, path,
+                                             repeat=1)
+                vector_text = f"{vec_time:11.3f} {vec_size / 1e6:10.2f}"
+            else:
+                vector_text = f"{'skipped':>11} {'-':>10}"
+            agg_time, agg_size = _timeit(_save_scatter, 0, x, y, groups, path, repeat=1)
+            print(f"{rows:>10,} {vector_text} {agg_time:11.3f} {agg_size / 1e6:10.2f}")
+
+
+def _digests(folder):
+    return {name: hashlib.sha256(open(os.path.join(folder, name), 'rb').read()).hexdigest()
+            for name in sorted(os.listdir(folder))}
+
+
+def bench_batch_export(formats=('png', 'svg', 'pdf'), workers=None):
+    """Serial vs process-pool export of the example figures"""
+    names = [name for name in FIGURE_BUILDERS if name not in EARLYON_FIGURES]
+    with tempfile.TemporaryDirectory() as tmp:
+        serial_dir, parallel_dir = os.path.join(tmp, 'serial'), os.path.join(tmp, 'parallel')
+        serial_time, _ = _timeit(export_all, names, serial_dir, formats, workers=1, repeat=1)
+        parallel_time, _ = _timeit(export_all, names, parallel_dir, formats, workers=workers,
+                                   repeat=1)
+        identical = _digests(serial_dir) == _digests(parallel_dir)
+    print(f"serial {serial_time:.2f}s, parallel {parallel_time:.2f}s "
+          f"({serial_time / parallel_time:.1f}x on {os.cpu_count()} CPUs), "
+          f"identical bytes: {identical}")
+
+
+def _peak_memory(func, *args, **kwargs):
+    """(seconds, peak MB allocated by Python/NumPy/pandas, result)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / 1e6, result
+
+
+def bench_earlyon_load(rows=(10_000, 200_000)):
+    """Full pd.read_csv vs column-pruned load_earlyon (cold, then from the sidecar)"""
+    print(f"{'rows':>9} {'path':<18} {'time (s)':>9} {'peak MB':>9} {'frame MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in rows:
+            path = os.path.join(tmp, f'earlyon_{n_rows}.csv')
+            generate_earlyon_like(n_rows).to_csv(path, index=False)
+            runs = [('read_csv (all)', pd.read_csv, {}),
+                    ('load_earlyon cold', load_earlyon, {}),
+                    ('load_earlyon warm', load_earlyon, {})]
+            for label, func, kwargs in runs:
+                elapsed, peak, df = _peak_memory(func, path, **kwargs)
+                frame = df.memory_usage(deep=True).sum() / 1e6
+                print(f"{n_rows:>9,} {label:<18} {elapsed:9.3f} {peak:9.1f} {frame:9.1f}")
+
+
+def bench_earlyon_stream(rows=(50_000, 400_000), chunksize=50_000):
+    """Peak memory of whole-file language_stats vs chunked stream_language_stats"""
+    print(f"{'rows':>9} {'path':<10} {'time (s)':>9} {'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in rows:
+            path = os.path.join(tmp, f'earlyon_{n_rows}.csv')
+            generate_earlyon_like(n_rows).to_csv(path, index=False)
+            whole_time, whole_peak, whole = _peak_memory(
+                lambda: language_stats(pd.read_csv(path)))
+            stream_time, stream_peak, streamed = _peak_memory(
+                stream_language_stats, path, chunksize=chunksize)
+            assert whole == streamed, (whole, streamed)
+            print(f"{n_rows:>9,} {'in memory':<10} {whole_time:9.3f} {whole_peak:9.1f}")
+            print(f"{n_rows:>9,} {'streamed':<10} {stream_time:9.3f} {stream_peak:9.1f}")
+
+
+def bench_earlyon_parallel(n_rows=400_000, worker_counts=(1, 2, 4, 8)):
+    """Single-threaded read_csv + notna().sum() vs parallel_language_stats"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'earlyon.csv')
+        generate_earlyon_like(n_rows).to_csv(path, index=False)
+        base_time, expected = _timeit(lambda: language_stats(pd.read_csv(path)), repeat=1)
+        print(f"{n_rows:,} rows, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'time (s)':>9} {'speedup':>8}")
+        print(f"{'baseline':>8} {base_time:9.3f} {'1.0x':>8}")
+        for workers in worker_counts:
+            elapsed, stats = _timeit(parallel_language_stats, path, workers=workers, repeat=1)
+            assert stats == expected, (stats, expected)
+            print(f"{workers:>8} {elapsed:9.3f} {base_time / elapsed:7.1f}x")
+
+
+def _check_incremental(path, state_path, expected_new):
+    stats, new_rows = update_language_stats(path, state_path)
+    expected = language_stats(load_earlyon(path, cache=False))
+    assert stats == expected, (stats, expected)
+    assert new_rows == expected_new, (new_rows, expected_new)
+    return stats
+
+
+def bench_incremental_update(n_rows=400_000, appended=4_000, check_rows=5_000):
+    """update_language_stats after an append vs a full recount; checks the edge cases first"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path, state_path = os.path.join(tmp, 'earlyon.csv'), os.path.join(tmp, 'state.json')
+        df = generate_earlyon_like(check_rows + 100)
+        text = df.iloc[:check_rows].to_csv(index=False)
+        # A last record without a trailing newline is counted, then re-read on the next append
+        with open(path, 'w') as f:
+            f.write(text.rstrip('\n'))
+        _check_incremental(path, state_path, check_rows)
+        with open(path, 'a') as f:
+            f.write('\n' + df.iloc[check_rows:check_rows + 50].to_csv(index=False, header=False))
+        _check_incremental(path, state_path, 50)
+        # An edit before the high-water mark is a rewrite, even with the tail unchanged
+        edited = df.iloc[:check_rows + 100].copy()
+        edited.loc[0, 'languages'] = np.nan if pd.notna(edited.loc[0, 'languages']) else 'Tamil'
+        edited.to_csv(path, index=False)
+        _check_incremental(path, state_path, check_rows + 100)
+
+        write_earlyon_csv(path, n_rows)
+        os.remove(state_path)
+        update_language_stats(path, state_path)
+        extra = generate_earlyon_like(appended, seed=1, first_id=n_rows + 1)
+        extra.to_csv(path, mode='a', header=False, index=False)
+        full_time, expected = _timeit(stream_language_stats, path, repeat=1)
+        update_time, (stats, new_rows) = _timeit(update_language_stats, path, state_path,
+                                                 repeat=1)
+        assert stats == expected and new_rows == appended, (stats, expected, new_rows)
+        print(f"{n_rows:,} rows + {appended:,} appended")
+        print(f"{'full recount':<14} {full_time:9.3f} s")
+        print(f"{'incremental':<14} {update_time:9.3f} s ({full_time / update_time:.1f}x)")
+
+
+def _cold_run_ms(command, cwd, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, capture_output=True)
+        times.append((time.perf_counter() - start) * 1e3)
+    return min(times), max(times)
+
+
+def bench_startup(budget_ms=300, render_budget_ms=4000, render_rows=200, repeat=5):
+    """Cold `assignment-3.py --help` and a cold small render, each failing above its budget
+
+    --help returns before any figure code loads, so the render run (a
+    render_rows-row CSV to PNG) is what catches pyplot, seaborn or pandas
+    being imported eagerly again on the real path.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    script = os.path.join(here, 'assignment-3.py')
+    over = []
+    best, worst = _cold_run_ms([sys.executable, script, '--help'], here, repeat)
+    print(f"assignment-3.py --help: best {best:.0f} ms, worst {worst:.0f} ms "
+          f"(budget {budget_ms} ms)")
+    rows, _ = import_time_breakdown("import runpy; runpy.run_path('assignment-3.py')",
+                                    ['--help'], top=5)
+    for module, self_ms, cumulative_ms in rows:
+        print(f"  {module:<28} {cumulative_ms:8.1f} ms")
+    if best > budget_ms:
+        over.append(f"startup took {best:.0f} ms, over the {budget_ms} ms budget")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args = ['--input', write_earlyon_csv(os.path.join(tmp, 'earlyon.csv'), render_rows),
+                '--output', os.path.join(tmp, 'language_analysis.png')]
+        best, worst = _cold_run_ms([sys.executable, script, *args], here, repeat)
+        print(f"assignment-3.py {render_rows}-row render: best {best:.0f} ms, "
+              f"worst {worst:.0f} ms (budget {render_budget_ms} ms)")
+        rows, _ = import_time_breakdown("import runpy; runpy.run_path('assignment-3.py', "
+                                        "run_name='__main__')", args, top=5)
+    for module, self_ms, cumulative_ms in rows:
+        print(f"  {module:<28} {cumulative_ms:8.1f} ms")
+    if best > render_budget_ms:
+        over.append(f"a small render took {best:.0f} ms, over the {render_budget_ms} ms budget")
+    if over:
+        raise SystemExit('; '.join(over))
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    """Serves server.images over keep-alive HTTP/1.1 with ETags, like a CDN would"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = self.server.images.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.server.requests += 1
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_images(images):
+    """Local stand-in image host; images maps a URL path to PNG bytes
+
+    Returns the running server; its base URL is
+    f'http://127.0.0.1:{server.server_port}'. Call shutdown() when done.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHandler)
+    server.images = images
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _png_bytes(rng, size):
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (*size, 4), dtype=np.uint8)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def bench_image_fetch(n_images=50, size=(800, 800), inset=(160, 180)):
+    """Download + decode per use (deck 06) vs ImageCache, against a local server"""
+    rng = np.random.default_rng(0)
+    server = serve_images({f'/img/{i}.png': _png_bytes(rng, size) for i in range(n_images)})
+    urls = [f'http://127.0.0.1:{server.server_port}/img/{i}.png' for i in range(n_images)]
+
+    def uncached():
+        for url in urls:
+            request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+            with urllib.request.urlopen(request) as response:
+                image = Image.open(io.BytesIO(response.read()))
+                image.thumbnail(inset)
+                np.asarray(image.convert('RGBA'))
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            base_time, _ = _timeit(uncached, repeat=1)
+            cache = ImageCache(tmp, max_age=0)
+            cold_time, _ = _timeit(cache.prefetch, urls, repeat=1)
+            revalidate_time, _ = _timeit(cache.prefetch, urls, repeat=1)
+            assert cache.downloads == n_images and cache.revalidated == n_images
+
+            decode_time, arrays = _timeit(lambda: [cache.get_array(url, inset) for url in urls],
+                                          repeat=1)
+            assert max(arrays[0].shape[:2]) <= max(inset)
+            cache.max_age = 3600
+            requests_before = server.requests
+            warm_time, _ = _timeit(lambda: [cache.get_array(url, inset) for url in urls])
+            assert server.requests == requests_before, 'fresh entries must not hit the server'
+
+        print(f"{n_images} images of {size[0]}x{size[1]}, inset {inset[0]}x{inset[1]} px")
+        print(f"{'step':<34} {'time (s)':>9}")
+        print(f"{'urllib + decode per use':<34} {base_time:9.3f}")
+        print(f"{'cold prefetch (downloads)':<34} {cold_time:9.3f}")
+        print(f"{'prefetch again (304s)':<34} {revalidate_time:9.3f}")
+        print(f"{'get_array, first decode':<34} {decode_time:9.3f}")
+        print(f"{'get_array, memory hits':<34} {warm_time:9.3f}")
+        print("ImageCache: " + ', '.join(f'{k}={v}' for k, v in cache.stats().items()))
+    finally:
+        server.shutdown()
+
+
+def _save_inset(path, dpi, draw_inset):
+    fig, ax = plt.subplots(figsize=(7, 3))
+    ax.plot([0, 1], [0, 1], color='red')
+    image = draw_inset(fig)
+    fig.savefig(os.path.join(os.path.dirname(path), f'out_{dpi}.png'), dpi=dpi)
+    held = image.get_array().nbytes
+    plt.close(fig)
+    return held
+
+
+def bench_inset_image(size=(4000, 3000), dpis=(100, 300, 150), rect=(0.1, 0.11, 0.15, 0.35)):
+    """imshow of the full image vs inset_image's pyramid, one save per dpi"""
+    y, x = np.mgrid[0:size[1], 0:size[0]]
+    pixels = np.dstack([x % 256, y % 256, (x + y) % 256]).astype(np.uint8)
+    print(f"{size[0]}x{size[1]} image into a {rect[2]}x{rect[3]} inset")
+    print(f"{'format':>6} {'dpi':>4} {'full (s)':>9} {'pyramid (s)':>12} {'full MB':>8} {'pyramid MB':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ('jpeg', 'png'):
+            path = os.path.join(tmp, f'image.{fmt}')
+            Image.fromarray(pixels).save(path)
+            cache = ImageCache(os.path.join(tmp, 'cache'))
+
+            def full(fig):
+                ax = fig.add_axes(rect)
+                ax.axis('off')
+                return ax.imshow(Image.open(path))
+
+            for dpi in dpis:
+                full_time, full_bytes = _timeit(_save_inset, path, dpi, full, repeat=1)
+                inset_time, inset_bytes = _timeit(
+                    _save_inset, path, dpi, lambda fig: inset_image(fig, rect, path, cache)[1],
+                    repeat=1)
+                print(f"{fmt:>6} {dpi:>4} {full_time:9.3f} {inset_time:12.3f} "
+                      f"{full_bytes / 1e6:8.1f} {inset_bytes / 1e6:11.2f}")
+
+
+def _save_labelled_bars(label_func, n_bars, path):
+    fig, ax = plt.subplots(figsize=(12, 5))
+    bars = ax.bar(np.arange(n_bars), np.random.default_rng(0).integers(1, 1000, n_bars))
+    labels = label_func(ax, bars, '%d', fontsize=8)
+    fig.savefig(path, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    return labels
+
+
+def bench_bar_labels(bar_counts=(10, 1_000, 10_000)):
+    """Per-bar ax.text loop vs label_bars, build + tight savefig"""
+    print(f"{'bars':>7} {'no labels (s)':>14} {'loop (s)':>9} {'label_bars (s)':>15} "
+          f"{'labels drawn':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bars.png')
+        for n_bars in bar_counts:
+            bare_time, _ = _timeit(_save_labelled_bars, lambda *args, **kw: None, n_bars, path,
+                                   repeat=1)
+            loop_time, _ = _timeit(_save_labelled_bars, label_bars_loop, n_bars, path, repeat=1)
+            fast_time, artist = _timeit(_save_labelled_bars, label_bars, n_bars, path, repeat=1)
+            drawn = len(artist.visible_labels(artist.get_figure(root=True)._get_renderer()))
+            print(f"{n_bars:>7,} {bare_time:14.3f} {loop_time:9.3f} {fast_time:15.3f} "
+                  f"{drawn:>13,}")
+
+
+def _save_line(plot_func, x, y, path):
+    fig, ax = plt.subplots(figsize=(10, 4))
+    plot_func(ax, x, y)
+    fig.savefig(path, dpi=100)
+    return fig, ax
+
+
+def bench_lod_line(n_samples=10_000_000, formats=('png', 'svg'), pans=5):
+    """ax.plot vs lod_plot on a memory-mapped random walk: save time, file size, pan redraw"""
+    with tempfile.TemporaryDirectory() as tmp:
+        series_path = os.path.join(tmp, 'series.npy')
+        walk = np.lib.format.open_memmap(series_path, mode='w+', dtype=np.float64,
+                                         shape=(n_samples,))
+        rng = np.random.default_rng(0)
+        for start in range(0, n_samples, 1 << 22):
+            stop = min(start + (1 << 22), n_samples)
+            walk[start:stop] = rng.normal(size=stop - start)
+        np.cumsum(walk, out=walk)
+        walk.flush()
+        del walk
+        y = np.load(series_path, mmap_mode='r')
+
+        print(f"{n_samples:,} samples (memory-mapped)")
+        print(f"{'method':<10} {'format':>6} {'time (s)':>9} {'MB':>9} {'peak MB':>8}")
+        for name, plot_func in (('ax.plot', lambda ax, x, y: ax.plot(np.asarray(y))),
+                                ('lod_plot', lod_plot)):
+            for fmt in formats:
+                path = os.path.join(tmp, f'line.{fmt}')
+                elapsed, peak, (fig, ax) = _peak_memory(_save_line, plot_func, None, y, path)
+                print(f"{name:<10} {fmt:>6} {elapsed:9.3f} {os.path.getsize(path) / 1e6:9.2f} "
+                      f"{peak:8.1f}")
+                plt.close(fig)
+
+            # Pan across a 1% window, redrawing each step
+            fig, ax = _save_line(plot_func, None, y, os.path.join(tmp, 'pan.png'))
+            width = n_samples // 100
+            start = time.perf_counter()
+            for step in range(pans):
+                ax.set_xlim(step * width, (step + 1) * width)
+                fig.canvas.draw()
+            print(f"{name:<10} {'pan':>6} {(time.perf_counter() - start) / pans:9.3f}  per redraw")
+            plt.close(fig)
+        del y
+
+
+_RSS_SCRIPT = """
+import resource, sys, time
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+from figures import life_expectancy_figure
+start = time.perf_counter()
+{body}
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def _peak_rss(body):
+    """(seconds, peak RSS in MB) of body run in a fresh interpreter"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', _RSS_SCRIPT.format(body=body)], cwd=here,
+                            check=True, capture_output=True, text=True)
+    elapsed, max_rss_kb = result.stdout.split()[-2:]
+    return float(elapsed), int(max_rss_kb) / 1e3
+
+
+def bench_column_inputs(n_per_group=400_000):
+    """Peak RSS of the life expectancy figure from CSV, .npy folder and Arrow inputs"""
+    from column_sources import save_npy_columns
+
+    df = generate_gapminder_like(n_per_group, CONTINENTS, seed=42)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'gapminder.csv')
+        npy_folder = save_npy_columns(df, os.path.join(tmp, 'gapminder_npy'))
+        df.to_csv(csv_path, index=False)
+        cases = [
+            ('imports only', 'pass'),
+            ('pd.read_csv', f"life_expectancy_figure(data=pd.read_csv({csv_path!r}))"
+                            f".savefig({tmp!r} + '/a.png')"),
+            ('.npy memmap', f"life_expectancy_figure(data={npy_folder!r})"
+                            f".savefig({tmp!r} + '/b.png')"),
+        ]
+        try:
+            feather_path = os.path.join(tmp, 'gapminder.feather')
+            df.to_feather(feather_path, compression='uncompressed')
+            cases.append(('Arrow IPC', f"life_expectancy_figure(data={feather_path!r})"
+                                       f".savefig({tmp!r} + '/c.png')"))
+        except ImportError:
+            print("(pyarrow not installed, skipping the Arrow input)")
+        del df
+
+        print(f"{len(CONTINENTS) * n_per_group:,} rows")
+        print(f"{'input':<14} {'time (s)':>9} {'peak RSS (MB)':>14}")
+        for name, body in cases:
+            elapsed, rss = _peak_rss(body)
+            print(f"{name:<14} {elapsed:9.3f} {rss:14.1f}")
+
+
+def _current_rss_mb():
+    """Resident set size of this process right now (peak RSS where /proc is missing)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _render_bars(fig, ax, i):
+    ax.bar(['a', 'b', 'c'], [i % 7, 3, 5], color='#4c72b0')
+    ax.set_title(f'render {i}')
+    fig.savefig(io.BytesIO(), format='png', dpi=20)
+
+
+def _soak(render, renders, samples=10):
+    """Run render(i) renders times; returns (seconds per render, RSS samples in MB)"""
+    rss = [_current_rss_mb()]
+    start = time.perf_counter()
+    for i in range(renders):
+        render(i)
+        if (i + 1) % max(1, renders // samples) == 0:
+            rss.append(_current_rss_mb())
+    return (time.perf_counter() - start) / renders, rss
+
+
+def bench_figure_pool(renders=100_000, unclosed_renders=1_000, max_growth_mb=20):
+    """Soak test: RSS over many small renders with FigurePool vs plt.subplots
+
+    Fails if the pooled run grows by more than max_growth_mb once warm. The
+    never-closed plt.subplots run shows the leak the pool prevents, so it
+    is kept short.
+    """
+    def pyplot_unclosed(i):
+        fig, ax = plt.subplots(figsize=(3, 2))
+        _render_bars(fig, ax, i)
+
+    def pyplot_closed(i):
+        fig, ax = plt.subplots(figsize=(3, 2))
+        _render_bars(fig, ax, i)
+        plt.close(fig)
+
+    with FigurePool() as pool:
+        def pooled(i):
+            with pool.borrow_subplots(figsize=(3, 2)) as (fig, ax):
+                _render_bars(fig, ax, i)
+
+        print(f"{'mode':<22} {'renders':>8} {'ms/render':>10} {'RSS start':>10} "
+              f"{'RSS warm':>9} {'RSS end':>8} {'growth':>7}")
+        growth = {}
+        for name, render, count in [('FigurePool', pooled, renders),
+                                    ('plt.subplots + close', pyplot_closed, renders),
+                                    ('plt.subplots, no close', pyplot_unclosed, unclosed_renders)]:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)  # too many open figures
+                per_render, rss = _soak(render, count)
+            # Measure growth after the first sample, once font and text caches are warm
+            growth[name] = rss[-1] - rss[1]
+            print(f"{name:<22} {count:>8,} {per_render * 1e3:10.2f} {rss[0]:10.1f} "
+                  f"{rss[1]:9.1f} {rss[-1]:8.1f} {growth[name]:+7.1f}")
+        plt.close('all')
+        print(pool.stats())
+    if growth['FigurePool'] > max_growth_mb:
+        raise SystemExit(f"pooled renders grew RSS by {growth['FigurePool']:.1f} MB, "
+                         f"over the {max_growth_mb} MB limit")
+
+
+def _deck06_mosaic(rng):
+    fig, axes = plt.subplot_mosaic([['ax1', 'ax3'], ['ax2', 'ax3']], figsize=(7, 4),
+                                   layout='constrained')
+    x = np.arange(50)
+    y = rng.integers(0, 100, 50)
+    axes['ax1'].scatter(x, y)
+    axes['ax2'].bar(x[:10], y[:10])
+    axes['ax3'].plot(x, y)
+    for ax in axes.values():
+        ax.set_ylim(0, 100)
+    axes['ax1'].set_xlabel('A Big Label', fontsize=18)
+    axes['ax2'].set_xlabel('Another Label', fontsize=18)
+    axes['ax3'].set_xlabel('Label 2: 2 Fast 2 Furious', fontsize=18)
+    return fig
+
+
+def _language_figure(rng):
+    stats = {'total': 500, 'centres_with_languages': 200, 'french_programs': 80,
+             'indigenous_programs': 20}
+    return FIGURE_BUILDERS['language_analysis'](stats=stats)
+
+
+def bench_layout_cache(renders=20, dpi=150):
+    """Repeated renders of identically labelled figures, with and without LayoutCache
+
+    The mosaic's data change between renders; with fixed limits its tick
+    labels, and so its layout, do not.
+    """
+    cases = [('deck-06 mosaic (constrained)', _deck06_mosaic),
+             ('language analysis (tight)', _language_figure)]
+    print(f"{'figure':<30} {'plain (ms)':>11} {'cached (ms)':>12} {'speedup':>8}  hits/misses")
+    for name, build in cases:
+        times = {}
+        for mode in ('plain', 'cached'):
+            cache = LayoutCache()
+            rng = np.random.default_rng(0)
+            start = time.perf_counter()
+            for _ in range(renders):
+                fig = build(rng)
+                if mode == 'plain':
+                    fig.savefig(io.BytesIO(), format='png', dpi=dpi, bbox_inches='tight')
+                else:
+                    cache.savefig(fig, io.BytesIO(), format='png', dpi=dpi, bbox_inches='tight')
+                plt.close(fig)
+            times[mode] = (time.perf_counter() - start) / renders * 1e3
+        stats = cache.stats()
+        print(f"{name:<30} {times['plain']:11.1f} {times['cached']:12.1f} "
+              f"{times['plain'] / times['cached']:7.1f}x  {stats['hits']}/{stats['misses']}")
+
+
+def bench_render_profile(names=('life_expectancy_gdp', 'sales_line_chart', 'campaign_costs',
+                                'simple_example'), dpi=150):
+    """Export overhead of render profiling, and the per-figure profile it records"""
+    import render_profile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profile_path = os.path.join(tmp, 'profile.jsonl')
+        off, _ = _timeit(export_all, names, tmp, dpi=dpi, workers=1)
+        run = render_profile.enable(profile_path)
+        try:
+            on, _ = _timeit(export_all, names, tmp, dpi=dpi, workers=1)
+        finally:
+            render_profile.disable()
+        print(f"export of {len(names)} figures: {off:.3f}s unprofiled, {on:.3f}s profiled "
+              f"({(on / off - 1) * 100:+.1f}%)\n")
+        # One record per figure per repeat; show the last repeat
+        render_profile.print_profile(render_profile.read_profile(profile_path, run)[-len(names):])
+
+
+# Data sizes per course example: what the slides draw, and a production-sized
+# input (rows per continent, samples per series, bars, EarlyON CSV rows)
+EXAMPLE_SIZES = {
+    'life_expectancy_gdp': {'slide': None, 'production': 200_000},
+    'sales_line_chart': {'slide': None, 'production': 100_000},
+    'aspect_ratio_comparison': {'slide': None},
+    'campaign_costs': {'slide': None, 'production': 1_000},
+    'language_analysis': {'slide': 100, 'production': 500_000},
+    'location_analysis': {'slide': 100, 'production': 500_000},
+}
+
+# Allowed growth over the baseline before a case counts as a regression
+REGRESSION_TOLERANCE = {'time_s': 0.25, 'peak_rss_mb': 0.10, 'bytes': 0.02}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'benchmark_baselines.json')
+
+
+def example_inputs(example, size, csv_path=None):
+    """Builder keyword arguments for an example at size (None = the slide's own data)"""
+    if example in EARLYON_FIGURES:
+        return {'input_file': csv_path}
+    if size is None:
+        return {}
+    rng = np.random.default_rng(0)
+    if example == 'life_expectancy_gdp':
+        return {'data': generate_gapminder_like(size)}
+    if example == 'sales_line_chart':
+        walks = np.abs(rng.normal(0, 1, (3, size)).cumsum(axis=1)) + 10
+        return {'data': {'month': np.arange(size), 'desktops': walks[0], 'laptops': walks[1],
+                         'tablets': walks[2]}}
+    if example == 'campaign_costs':
+        return {'data': {'year': [str(1972 + 2 * i) for i in range(size)],
+                         'cost': rng.integers(50, 300, size)}}
+    raise ValueError(f"{example} has no sized input")
+
+
+def run_example(example, inputs, path, dpi):
+    """Render one course example to path: build, save, close; returns seconds
+
+    The EarlyON builders load and aggregate the CSV themselves, so their
+    time includes the load.
+    """
+    start = time.perf_counter()
+    fig = FIGURE_BUILDERS[example](**inputs)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return time.perf_counter() - start
+
+
+_EXAMPLE_SCRIPT = """
+import os, resource, sys
+import matplotlib
+matplotlib.use('Agg')
+from benchmarks import example_inputs, run_example
+inputs = example_inputs({example!r}, {size!r}, {csv_path!r})
+best = min(run_example({example!r}, inputs, {path!r}, {dpi!r}) for _ in range({repeat}))
+print(best, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, os.path.getsize({path!r}))
+"""
+
+
+def _example_case(tmp, example, size, dpi, fmt, csv_path, repeat):
+    """(best seconds, peak RSS MB, output bytes) of one case, in a fresh interpreter"""
+    path = os.path.join(tmp, f'{example}.{fmt}')
+    script = _EXAMPLE_SCRIPT.format(example=example, size=size, csv_path=csv_path,
+                                    path=path, dpi=dpi, repeat=repeat)
+    result = subprocess.run([sys.executable, '-c', script],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            check=True, capture_output=True, text=True)
+    elapsed, max_rss_kb, size_bytes = result.stdout.split()[-3:]
+    return {'time_s': float(elapsed), 'peak_rss_mb': int(max_rss_kb) / 1e3,
+            'bytes': int(size_bytes)}
+
+
+def bench_examples(examples=None, dpis=(100, 300), formats=('png', 'svg'),
+                   repeat=2):
+    """The course examples over data size, dpi and format: time, peak RSS, file size
+
+    Each case runs in its own interpreter, so peak RSS is that case's
+    alone (imports included). Returns {case: metrics} for the baseline
+    check in main().
+    """
+    results = {}
+    print(f"{'case':<46} {'time (s)':>9} {'peak RSS (MB)':>14} {'KB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_paths = {}
+        for example in examples or EXAMPLE_SIZES:
+            for size_name, size in EXAMPLE_SIZES[example].items():
+                csv_path = None
+                if example in EARLYON_FIGURES:
+                    csv_path = csv_paths.get(size) or write_earlyon_csv(
+                        os.path.join(tmp, f'earlyon_{size}.csv'), size)
+                    csv_paths[size] = csv_path
+                for dpi in dpis:
+                    for fmt in formats:
+                        case = f'{example}/{size_name}/{dpi}dpi/{fmt}'
+                        metrics = _example_case(tmp, example, size, dpi, fmt, csv_path, repeat)
+                        results[case] = metrics
+                        print(f"{case:<46} {metrics['time_s']:9.3f} "
+                              f"{metrics['peak_rss_mb']:14.1f} {metrics['bytes'] / 1e3:10.1f}")
+    return results
+
+
+def check_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Regression messages for results that exceed baseline by more than tolerance"""
+    regressions = []
+    for case, metrics in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            continue
+        for metric, allowed in tolerance.items():
+            if metric in metrics and metric in reference and reference[metric] > 0:
+                ratio = metrics[metric] / reference[metric]
+                if ratio > 1 + allowed:
+                    regressions.append(f"{case}: {metric} {metrics[metric]:.4g} vs baseline "
+                                       f"{reference[metric]:.4g} (+{(ratio - 1) * 100:.0f}%, "
+                                       f"allowed +{allowed * 100:.0f}%)")
+    return regressions
+
+
+def _save_batch(names, folder, saver=None, rounds=3):
+    """Build and save names rounds times; returns seconds the main thread was blocked in saves"""
+    blocked = 0.0
+    for _ in range(rounds):
+        for name in names:
+            fig = FIGURE_BUILDERS[name]()
+            start = time.perf_counter()
+            path = os.path.join(folder, f'{name}.png')
+            if saver is None:
+                fig.savefig(path, dpi=300, bbox_inches='tight')
+            else:
+                saver.savefig(fig, path, dpi=300, bbox_inches='tight')
+            blocked += time.perf_counter() - start
+            plt.close(fig)
+    return blocked
+
+
+def bench_async_save(rounds=3, levels=('fast', 'default', 'small')):
+    """Blocking savefig() vs AsyncSaver for the example PNGs, and PNG compression levels
+
+    Encoding only overlaps with building the next figure when there is a
+    spare core; the time the main thread spends blocked in saves shrinks
+    either way.
+    """
+    from async_save import COMPRESS_LEVELS, AsyncSaver
+
+    names = [name for name in FIGURE_BUILDERS if name not in EARLYON_FIGURES]
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_dir, async_dir = os.path.join(tmp, 'sync'), os.path.join(tmp, 'async')
+        os.makedirs(sync_dir)
+        os.makedirs(async_dir)
+        start = time.perf_counter()
+        sync_blocked = _save_batch(names, sync_dir, rounds=rounds)
+        sync_total = time.perf_counter() - start
+        start = time.perf_counter()
+        with AsyncSaver() as saver:
+            async_blocked = _save_batch(names, async_dir, saver, rounds=rounds)
+        async_total = time.perf_counter() - start
+        identical = _digests(sync_dir) == _digests(async_dir)
+    print(f"{len(names) * rounds} figures on {os.cpu_count()} CPUs, 300 dpi")
+    print(f"{'mode':<12} {'total (s)':>9} {'blocked in save (s)':>20}")
+    print(f"{'savefig':<12} {sync_total:9.2f} {sync_blocked:20.2f}")
+    print(f"{'AsyncSaver':<12} {async_total:9.2f} {async_blocked:20.2f}")
+    print(f"identical bytes: {identical}")
+
+    fig = FIGURE_BUILDERS['life_expectancy_gdp']()
+    print(f"\n{'level':<10} {'encode+write (s)':>16} {'KB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for level in levels:
+            path = os.path.join(tmp, f'{level}.png')
+            with AsyncSaver(workers=1, compress_level=level) as saver:
+                future = saver.savefig(fig, path, dpi=300, bbox_inches='tight')
+                # Time the worker's share alone: from submission to the file on disk
+                start = time.perf_counter()
+                future.result()
+                encode = time.perf_counter() - start
+            print(f"{level} ({COMPRESS_LEVELS[level]})".ljust(10)
+                  + f" {encode:16.3f} {os.path.getsize(path) / 1e3:9.1f}")
+    plt.close(fig)
+
+
+def bench_spatial_index(n_centres=(10_000, 100_000), n_queries=20_000, radius_km=2.0,
+                        brute_force_max=10_000):
+    """PointIndex radius and nearest queries vs brute-force pairwise distances
+
+    Brute force builds the full queries x centres distance matrix, so it
+    only runs up to brute_force_max centres (and checks the index gets the
+    same answers).
+    """
+    from geo_index import PointIndex, brute_force_nearest, brute_force_within, parse_points
+
+    rng = np.random.default_rng(0)
+    query_lon = rng.normal(-79.38, 0.12, n_queries)
+    query_lat = rng.normal(43.70, 0.07, n_queries)
+    print(f"{n_queries:,} queries, radius {radius_km:g} km")
+    print(f"{'centres':>10} {'parse (s)':>10} {'index (s)':>10} {'radius (s)':>11} "
+          f"{'nearest (s)':>12} {'brute radius':>13} {'brute nearest':>14} {'same':>5}")
+    for n in n_centres:
+        geometry = generate_earlyon_like(n)['geometry']
+        parse_time, (lon, lat) = _timeit(parse_points, geometry, repeat=1)
+        index_time, index = _timeit(PointIndex, lon, lat, repeat=1)
+        radius_time, counts = _timeit(index.count_within, query_lon, query_lat, radius_km)
+        nearest_time, (rows, distances) = _timeit(index.nearest, query_lon, query_lat)
+        brute = ['-', '-']
+        same = '-'
+        if n <= brute_force_max:
+            brute_radius, brute_counts = _timeit(brute_force_within, index, query_lon, query_lat,
+                                                 radius_km, repeat=1)
+            brute_nearest, (_, brute_distances) = _timeit(brute_force_nearest, index, query_lon,
+                                                          query_lat, repeat=1)
+            brute = [f'{brute_radius:.3f}', f'{brute_nearest:.3f}']
+            same = str(bool((counts == brute_counts).all()
+                            and np.allclose(distances, brute_distances)))
+        print(f"{n:>10,} {parse_time:10.3f} {index_time:10.3f} {radius_time:11.3f} "
+              f"{nearest_time:12.3f} {brute[0]:>13} {brute[1]:>14} {same:>5}")
+
+
+def _language_counts_loop(languages):
+    """Per-row split and count, as a plain Python loop would"""
+    counts = {}
+    for value in languages:
+        if isinstance(value, str):
+            for name in {normalize_language(name) for name in value.split(',')}:
+                if name:
+                    counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def bench_language_matrix(rows=(100_000, 1_000_000), loop_max=1_000_000, csv_rows=200_000):
+    """Vectorized languages tokenizing vs a row loop, and the cached matrix load"""
+    print(f"{'rows':>10} {'matrix (s)':>11} {'counts (s)':>11} {'co-occur (s)':>13} "
+          f"{'row loop (s)':>13} {'same':>5}")
+    for n in rows:
+        languages = generate_earlyon_like(n)['languages'].astype('category')
+        matrix_time, matrix = _timeit(language_matrix, languages, repeat=1)
+        counts_time, counts = _timeit(language_counts, matrix)
+        co_time, _ = _timeit(language_co_occurrence, matrix)
+        loop, same = '-', '-'
+        if n <= loop_max:
+            loop_time, loop_counts = _timeit(_language_counts_loop, languages, repeat=1)
+            loop = f'{loop_time:.3f}'
+            same = str(loop_counts == counts.to_dict())
+        print(f"{n:>10,} {matrix_time:11.3f} {counts_time:11.4f} {co_time:13.3f} {loop:>13} "
+              f"{same:>5}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_earlyon_csv(os.path.join(tmp, 'earlyon.csv'), csv_rows)
+        cold, _ = _timeit(load_language_matrix, path, repeat=1)
+        warm, _ = _timeit(load_language_matrix, path)
+    print(f"\n{csv_rows:,}-row CSV: first load {cold:.3f}s, from the sidecar {warm:.4f}s")
+
+
+def _fetch_all(base, paths, clients):
+    """GET every path from clients threads; returns the per-request seconds"""
+    latencies, lock = [], threading.Lock()
+    pending = list(paths)
+
+    def client():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                path = pending.pop()
+            start = time.perf_counter()
+            with urllib.request.urlopen(base + path) as response:
+                response.read()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies)
+
+
+def bench_render_server(csv_rows=50_000, requests=60, clients=4, workers=2, dpi=100):
+    """One figure per fresh process (export.py) vs requests to warm render_server workers"""
+    names = ['life_expectancy_gdp', 'campaign_costs', 'language_analysis', 'languages_offered']
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_earlyon_csv(os.path.join(tmp, 'earlyon.csv'), csv_rows)
+        print(f"{'figure':<22} {'cold process (s)':>17}")
+        for name in names:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, 'export.py', name, '--out', tmp, '--workers', '1',
+                            '--dpi', str(dpi), '--earlyon-csv', csv_path],
+                           check=True, capture_output=True)
+            print(f"{name:<22} {time.perf_counter() - start:17.2f}")
+
+        start = time.perf_counter()
+        with RenderPool(workers, csv_path) as pool:
+            startup = time.perf_counter() - start
+            server = serve(pool, port=0)
+            base = f'http://127.0.0.1:{server.server_address[1]}'
+            paths = [f'/render/{names[i % len(names)]}.png?dpi={dpi}' for i in range(requests)]
+            start = time.perf_counter()
+            latencies = _fetch_all(base, paths, clients)
+            wall = time.perf_counter() - start
+            with urllib.request.urlopen(base + '/metrics') as response:
+                metrics = json.load(response)
+            server.shutdown()
+        print(f"\n{workers} warm workers: ready in {startup:.1f}s; {requests} requests from "
+              f"{clients} clients in {wall:.2f}s ({requests / wall:.1f}/s), client p50 "
+              f"{latencies[len(latencies) // 2] * 1e3:.0f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e3:.0f} ms")
+        for name, latency in sorted(metrics['latency_ms'].items()):
+            print(f"  {name:<22} render p50 {latency['render_p50']:7.1f} ms  "
+                  f"p99 {latency['render_p99']:7.1f} ms  queued p99 {latency['queued_p99']:7.1f} ms")
+
+        # A cap below a warm worker's footprint recycles after every render
+        with RenderPool(1, csv_path, max_rss_mb=1, warm=False) as pool:
+            for _ in range(3):
+                pool.render('simple_example', dpi=dpi)
+        # After close(), which waits for the last replacement
+        print(f"\nmax_rss_mb=1: 3 renders, {pool.recycled} workers recycled")
+
+
+def bench_tiled_export(name='life_expectancy_gdp', dpis=(300, 1200), tile_size=512):
+    """Peak RSS and time of one savefig() vs streamed strips and a tile pyramid, serial"""
+    print(f"{'dpi':>5} {'output':<12} {'time (s)':>9} {'peak RSS (MB)':>14} {'MB written':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for dpi in dpis:
+            cases = [
+                ('savefig', f"life_expectancy_figure().savefig({tmp!r} + '/a.png', dpi={dpi}, "
+                            f"bbox_inches='tight')", [os.path.join(tmp, 'a.png')]),
+                ('png strips', f"from tiled_export import write_png_strips\n"
+                               f"write_png_strips({name!r}, {tmp!r} + '/b.png', {dpi}, "
+                               f"workers=1)", [os.path.join(tmp, 'b.png')]),
+                ('tiles', f"from tiled_export import export_tiles\n"
+                          f"export_tiles({name!r}, {tmp!r} + '/tiles', {dpi}, {tile_size}, "
+                          f"workers=1)", None),
+            ]
+            for label, body, paths in cases:
+                elapsed, rss = _peak_rss(body)
+                if paths is None:
+                    with open(os.path.join(tmp, 'tiles', 'manifest.json')) as f:
+                        written = json.load(f)['bytes']
+                else:
+                    written = sum(os.path.getsize(path) for path in paths)
+                print(f"{dpi:>5} {label:<12} {elapsed:9.2f} {rss:14.1f} {written / 1e6:11.1f}")
+
+
+def _starred_scatter(n, rng):
+    # Deck 02's scatter with marker='*', at n points
+    fig, ax = plt.subplots(figsize=(5, 3))
+    ax.scatter(rng.random(n), rng.random(n), marker='*', color='indigo')
+    return fig
+
+
+def _random_walk(n, rng):
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.plot(np.cumsum(rng.normal(size=n)), color='#7425b9', linewidth=1)
+    return fig
+
+
+def bench_vector_export(points=(20_000, 95_000), rasterize_above=10_000):
+    """Plain savefig vs vector_export.save_compact: SVG/PDF size, save time, SVG parse time
+
+    Parse time (xml.etree) stands in for how long a viewer takes to load
+    the SVG; there is no PDF parser here, so PDFs report size only.
+    """
+    import xml.etree.ElementTree as ET
+    from vector_export import save_compact
+
+    rng = np.random.default_rng(0)
+    figures = {
+        'bubbles': lambda n: FIGURE_BUILDERS['life_expectancy_gdp'](
+            data=generate_gapminder_like(n // len(CONTINENTS), CONTINENTS, seed=42)),
+        'stars': lambda n: _starred_scatter(n, rng),
+        'line': lambda n: _random_walk(n * 10, rng),
+    }
+    writers = {
+        'savefig': lambda fig, path: fig.savefig(path),
+        'compact': lambda fig, path: save_compact(fig, path),
+        'compact+raster': lambda fig, path: save_compact(fig, path,
+                                                         rasterize_above=rasterize_above),
+    }
+    print(f"{'figure':<8} {'elements':>9} {'output':<15} {'SVG MB':>7} {'save (s)':>9} "
+          f"{'parse (s)':>10} {'PDF MB':>7} {'save (s)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, build in figures.items():
+            for n in points:
+                fig = build(n)
+                elements = n * 10 if name == 'line' else n
+                for label, write in writers.items():
+                    svg, pdf = os.path.join(tmp, 'out.svg'), os.path.join(tmp, 'out.pdf')
+                    svg_time, _ = _timeit(write, fig, svg, repeat=1)
+                    parse_time, _ = _timeit(ET.parse, svg, repeat=1)
+                    pdf_time, _ = _timeit(write, fig, pdf, repeat=1)
+                    print(f"{name:<8} {elements:>9,} {label:<15} {os.path.getsize(svg) / 1e6:7.2f} "
+                          f"{svg_time:9.2f} {parse_time:10.3f} {os.path.getsize(pdf) / 1e6:7.2f} "
+                          f"{pdf_time:9.2f}")
+                plt.close(fig)
+
+
+BENCHMARKS = {
+    'sample_data': bench_sample_data,
+    'grouped_scatter': bench_grouped_scatter,
+    'aggregate_scatter': bench_aggregate_scatter,
+    'batch_export': bench_batch_export,
+    'earlyon_load': bench_earlyon_load,
+    'earlyon_stream': bench_earlyon_stream,
+    'earlyon_parallel': bench_earlyon_parallel,
+    'incremental_update': bench_incremental_update,
+    'startup': bench_startup,
+    'image_fetch': bench_image_fetch,
+    'inset_image': bench_inset_image,
+    'bar_labels': bench_bar_labels,
+    'lod_line': bench_lod_line,
+    'column_inputs': bench_column_inputs,
+    'figure_pool': bench_figure_pool,
+    'layout_cache': bench_layout_cache,
+    'render_profile': bench_render_profile,
+    'examples': bench_examples,
+    'async_save': bench_async_save,
+    'spatial_index': bench_spatial_index,
+    'language_matrix': bench_language_matrix,
+    'render_server': bench_render_server,
+    'tiled_export': bench_tiled_export,
+    'vector_export': bench_vector_export,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the course example helpers')
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='JSON baselines to compare against (benchmarks that return '
+                             'results, such as examples)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='record this run as the new baseline instead of comparing')
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    try:
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+    regressions = []
+    for name in args.names or BENCHMARKS:
+        print(f"\n== {name} ==")
+        results = BENCHMARKS[name]()
+        if not isinstance(results, dict):
+            continue
+        if args.save_baseline:
+            baselines[name] = results
+        elif name in baselines:
+            regressions += check_baseline(results, baselines[name])
+        else:
+            print(f"(no baseline for {name}; record one with --save-baseline)")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+    if regressions:
+        print("\nRegressions:")
+        for message in regressions:
+            print(f"  {message}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# Zero-copy column inputs for the figure builders
+#
+# Builders take their data as a mapping of column name -> 1-D array.
+# open_columns() produces that mapping from the formats we keep large
+# extracts in, without copying the column buffers: memory-mapped .npy files
+# (one structured array, or a folder with one <column>.npy per column),
+# Arrow IPC/Feather files memory-mapped through pyarrow, pyarrow Tables and
+# DataFrames. matplotlib then reads the same buffers, so a figure no longer
+# needs the parsed table and a second copy of every column at once.
+
+import os
+from collections.abc import Mapping
+
+from startup import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+
+# Folder layout: <column>.npy, plus <column>.categories.npy for categoricals
+_CATEGORIES_SUFFIX = '.categories.npy'
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as exc:
+        raise ImportError("reading Arrow/Feather files needs pyarrow "
+                          "(pip install pyarrow)") from exc
+    return pyarrow
+
+
+def _arrow_column(column):
+    """1-D NumPy view of an Arrow column (a Categorical for dictionary columns)
+
+    Single-chunk numeric columns without nulls are zero-copy. Nulls become
+    NaN, which needs a float copy, as does joining several chunks.
+    """
+    pa = _require_pyarrow()
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+    if pa.types.is_dictionary(column.type):
+        codes = column.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+        return pd.Categorical.from_codes(codes, categories=column.dictionary.to_pylist())
+    if column.null_count == 0 and (pa.types.is_integer(column.type)
+                                   or pa.types.is_floating(column.type)):
+        return column.to_numpy(zero_copy_only=True)
+    return column.to_numpy(zero_copy_only=False)
+
+
+def _series_values(series):
+    """The array behind a Series: categoricals stay Categorical, numbers are not copied"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array
+    return series.to_numpy(copy=False)
+
+
+def _select(columns, wanted):
+    if wanted is None:
+        return columns
+    missing = [name for name in wanted if name not in columns]
+    if missing:
+        raise KeyError(f"missing column(s): {', '.join(missing)}")
+    return {name: columns[name] for name in wanted}
+
+
+def open_columns(source, columns=None):
+    """Mapping column name -> 1-D array over source, without copying the data
+
+    source is a path (.npy file, folder of <column>.npy files, or
+    .arrow/.feather file), a structured NumPy array, a pyarrow Table, a
+    DataFrame or an existing mapping. columns restricts (and checks) the
+    names returned; for Arrow files only those columns are mapped.
+    """
+    if isinstance(source, pd.DataFrame):
+        return {name: _series_values(source[name]) for name in (columns or source.columns)}
+    if isinstance(source, Mapping):
+        return _select(dict(source), columns)
+    if isinstance(source, np.ndarray):
+        if not source.dtype.names:
+            raise ValueError("a NumPy source must be a structured array with named fields")
+        return _select({name: source[name] for name in source.dtype.names}, columns)
+    if hasattr(source, 'schema') and hasattr(source, 'column'):
+        names = columns or source.schema.names
+        return {name: _arrow_column(source.column(name)) for name in names}
+
+    path = os.fspath(source)
+    if os.path.isdir(path):
+        available = {os.path.splitext(entry)[0]: os.path.join(path, entry)
+                     for entry in os.listdir(path)
+                     if entry.endswith('.npy') and not entry.endswith(_CATEGORIES_SUFFIX)}
+        return {name: _load_npy_column(file_path)
+                for name, file_path in _select(available, columns).items()}
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        return open_columns(np.load(path, mmap_mode='r'), columns)
+    if extension in ARROW_EXTENSIONS:
+        pa = _require_pyarrow()
+        # Uncompressed files map straight onto the column buffers
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        return open_columns(table, columns)
+    raise ValueError(f"unsupported column source: {path}")
+
+
+def _load_npy_column(path):
+    """Memory-map one column file; categoricals come back as codes + categories"""
+    codes = np.load(path, mmap_mode='r')
+    categories_path = path[:-len('.npy')] + _CATEGORIES_SUFFIX
+    if not os.path.exists(categories_path):
+        return codes
+    return pd.Categorical.from_codes(codes, categories=np.load(categories_path), validate=False)
+
+
+def save_npy_columns(data, folder):
+    """Write each column of a DataFrame or mapping to <folder>/<column>.npy
+
+    Categorical columns are stored as their integer codes plus a small
+    <column>.categories.npy, other text as fixed-width unicode, so every
+    file can be memory-mapped back with open_columns(folder).
+    """
+    os.makedirs(folder, exist_ok=True)
+    names = data.columns if isinstance(data, pd.DataFrame) else list(data)
+    for name in names:
+        values = data[name]
+        base = os.path.join(folder, name)
+        if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+            values = pd.Categorical(values)
+            np.save(base + _CATEGORIES_SUFFIX, np.asarray(values.categories, dtype=str))
+            values = values.codes
+        values = np.asarray(values)
+        if values.dtype == object:
+            values = values.astype(str)
+        np.save(base + '.npy', values)
+    return folder
@@ -0,0 +1,628 @@
+# Loading the EarlyON Child and Family Centres CSV
+#
+# The open-data extract has 35 columns, including a large GeoJSON geometry
+# column, while the language analysis only needs three of them. This module
+# reads just the requested columns with explicit dtypes and keeps a
+# columnar sidecar next to the CSV so later runs skip parsing entirely.
+# The sidecar is a folder of .npy files, one per column (see
+# column_sources), so loading it never unpickles anything.
+
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from column_sources import ARROW_EXTENSIONS, open_columns, save_npy_columns
+from render_cache import file_digest
+from startup import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+LANGUAGE_COLUMNS = ('languages', 'french_language_program', 'indigenous_program')
+# Read with geometry=True for the location analysis
+LOCATION_COLUMNS = ('city', 'school_location')
+GEOMETRY_COLUMN = 'geometry'
+
+# Explicit dtypes for the columns we know; repeated strings become
+# categoricals. Columns not listed here are read as strings and turned
+# into categoricals when they repeat a lot (see _compact).
+COLUMN_DTYPES = {
+    '_id': 'int64',
+    'loc_id': 'Int64',
+    'ward': 'Int64',
+    'languages': 'category',
+    'french_language_program': 'category',
+    'indigenous_program': 'category',
+    'agency': 'category',
+    'city': 'category',
+    'ward_name': 'category',
+    'serving_area': 'category',
+    'school_location': 'category',
+    GEOMETRY_COLUMN: 'string',
+}
+
+
+def _compact(df):
+    """Turn repetitive string columns into categoricals"""
+    for column in df.columns:
+        if column in COLUMN_DTYPES or isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_string_dtype(df[column]) and df[column].nunique() < 0.5 * len(df):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def read_earlyon_csv(path, columns=LANGUAGE_COLUMNS, geometry=False, **read_csv_kwargs):
+    """Read only the given columns (plus geometry when asked) from the CSV"""
+    columns = list(columns)
+    if geometry and GEOMETRY_COLUMN not in columns:
+        columns.append(GEOMETRY_COLUMN)
+    dtype = {column: COLUMN_DTYPES[column] for column in columns if column in COLUMN_DTYPES}
+    df = pd.read_csv(path, usecols=columns, dtype=dtype, **read_csv_kwargs)
+    return _compact(df[columns])
+
+
+def _sidecar_paths(path, columns, geometry, cache_dir):
+    """Data and metadata file names for one column selection of path"""
+    selection = hashlib.sha256(json.dumps([sorted(columns), geometry]).encode()).hexdigest()[:12]
+    folder = cache_dir or os.path.dirname(os.path.abspath(path))
+    stem = os.path.join(folder, f'.{os.path.basename(path)}.{selection}')
+    return f'{stem}.columns', f'{stem}.json'
+
+
+def _write_sidecar(df, folder):
+    """Save df as one .npy file per column; returns the dtypes _read_sidecar() restores
+
+    Text columns are stored as categoricals, whose -1 code keeps missing
+    values apart from the string 'nan'; nullable integers as floats with NaN.
+    """
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if not pd.api.types.is_numeric_dtype(values) or isinstance(values.dtype,
+                                                                  pd.CategoricalDtype):
+            columns[name] = pd.Categorical(values)
+        elif values.hasnans:
+            columns[name] = values.to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            columns[name] = values.to_numpy()
+    save_npy_columns(columns, folder)
+    return {name: str(dtype) for name, dtype in df.dtypes.items()}
+
+
+def _read_sidecar(folder, dtypes):
+    columns = open_columns(folder, list(dtypes))
+    # Copied out of the memory maps, so the files can be rewritten while df is alive
+    df = pd.DataFrame({
+        name: (pd.Categorical.from_codes(np.array(values.codes), dtype=values.dtype)
+               if isinstance(values, pd.Categorical) else np.array(values))
+        for name, values in columns.items()})
+    for name, dtype in dtypes.items():
+        if dtype != 'category':
+            df[name] = df[name].astype(dtype)
+    return df
+
+
+def _source_state(path):
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _sidecar_is_fresh(path, meta_path):
+    """True while the source file is unchanged since the sidecar was written
+
+    An unchanged mtime and size is trusted as is; if the mtime moved (e.g.
+    the file was copied or touched) the contents hash decides.
+    """
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    state = _source_state(path)
+    if state == meta['source']:
+        return True
+    if state['size'] != meta['source']['size'] or file_digest(path) != meta['sha256']:
+        return False
+    meta['source'] = state
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return True
+
+
+def load_earlyon(path, columns=LANGUAGE_COLUMNS, geometry=False, cache=True, cache_dir=None):
+    """Load the EarlyON centres table, reusing a columnar sidecar when possible
+
+    Only columns (and the geometry column if geometry=True) are read. With
+    cache=True the parsed frame is written as a sidecar of .npy columns
+    next to the CSV, or in cache_dir, and reused for as long as the CSV is
+    unchanged. Arrow/Feather extracts are read directly, without a sidecar.
+    """
+    columns = list(columns)
+    if str(path).lower().endswith(ARROW_EXTENSIONS):
+        # Already columnar: only these columns are read (fully, into Arrow-backed columns)
+        return pd.read_feather(path, columns=columns + [GEOMETRY_COLUMN] * geometry,
+                               dtype_backend='pyarrow')
+    if not cache:
+        return read_earlyon_csv(path, columns, geometry)
+
+    data_path, meta_path = _sidecar_paths(path, columns, geometry, cache_dir)
+    if os.path.isdir(data_path) and _sidecar_is_fresh(path, meta_path):
+        with open(meta_path) as f:
+            return _read_sidecar(data_path, json.load(f)['dtypes'])
+
+    # Record the source before parsing so a concurrent rewrite invalidates it
+    meta = {'source': _source_state(path), 'sha256': file_digest(path),
+            'columns': columns, 'geometry': geometry}
+    df = read_earlyon_csv(path, columns, geometry)
+    try:
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        meta['dtypes'] = _write_sidecar(df, data_path)
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+    except OSError as exc:
+        # A read-only data folder just means no sidecar
+        print(f"Could not write EarlyON sidecar ({exc}); continuing without it")
+    return df
+
+
+# Streaming aggregation
+#
+# The language analysis only needs four counts, and counts from separate
+# pieces of the file simply add up. That lets us aggregate files far larger
+# than memory one chunk at a time.
+
+STATS_KEYS = ('total', 'centres_with_languages', 'french_programs', 'indigenous_programs')
+
+
+def language_stats(df):
+    """Counts behind the language analysis figure"""
+    return {
+        'total': len(df),
+        'centres_with_languages': int(df['languages'].notna().sum()),
+        'french_programs': int(df['french_language_program'].notna().sum()),
+        'indigenous_programs': int(df['indigenous_program'].notna().sum()),
+    }
+
+
+def empty_stats():
+    return dict.fromkeys(STATS_KEYS, 0)
+
+
+def merge_stats(*partials):
+    """Add up partial language_stats() results"""
+    merged = empty_stats()
+    for partial in partials:
+        for key in STATS_KEYS:
+            merged[key] += partial[key]
+    return merged
+
+
+def iter_earlyon_chunks(path, columns=LANGUAGE_COLUMNS, chunksize=100_000):
+    """Read the CSV as DataFrames of chunksize rows, only the given columns"""
+    columns = list(columns)
+    dtype = {column: COLUMN_DTYPES[column] for column in columns if column in COLUMN_DTYPES}
+    # Plain strings per chunk: categories would differ from chunk to chunk
+    dtype = {column: ('string' if kind == 'category' else kind) for column, kind in dtype.items()}
+    with pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunksize) as reader:
+        yield from reader
+
+
+def stream_language_stats(source, chunksize=100_000):
+    """language_stats() over a CSV path or an iterable of DataFrame chunks
+
+    Only one chunk is held in memory at a time, so peak memory depends on
+    chunksize and not on the size of the input.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        source = iter_earlyon_chunks(source, chunksize=chunksize)
+    stats = empty_stats()
+    for chunk in source:
+        stats = merge_stats(stats, language_stats(chunk))
+    return stats
+
+
+def grouped_language_stats(df, by):
+    """language_stats() per value of the by column(s), as a DataFrame"""
+    keys = [df[column] for column in ([by] if isinstance(by, str) else by)]
+    flags = pd.DataFrame({
+        'total': 1,
+        'centres_with_languages': df['languages'].notna(),
+        'french_programs': df['french_language_program'].notna(),
+        'indigenous_programs': df['indigenous_program'].notna(),
+    }, index=df.index)
+    return flags.groupby(keys, observed=True, dropna=False).sum().astype('int64')
+
+
+def merge_grouped_stats(partials):
+    """Add up partial grouped_language_stats() frames"""
+    partials = list(partials)
+    if not partials:
+        return pd.DataFrame(columns=list(STATS_KEYS), dtype='int64')
+    combined = pd.concat(partials)
+    return combined.groupby(level=list(range(combined.index.nlevels)), dropna=False).sum()
+
+
+# Parallel aggregation
+#
+# The file is cut into one byte range per worker. Cuts are moved forward to
+# the next record boundary, i.e. a newline outside a quoted field, so
+# multi-line quoted values are never split. Quote parity at each raw cut
+# comes from a first parallel pass that just counts '"' bytes.
+
+_READ_BLOCK = 1 << 22
+
+
+def _count_quotes(path, start, end):
+    count = 0
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(_READ_BLOCK, remaining))
+            if not block:
+                break
+            count += block.count(b'"')
+            remaining -= len(block)
+    return count
+
+
+def _record_boundary(path, offset, in_quotes):
+    """First offset at or after offset that starts a new CSV record
+
+    in_quotes is the quote parity of everything before offset.
+    """
+    with open(path, 'rb') as f:
+        if offset > 0:
+            f.seek(offset - 1)
+            if f.read(1) == b'\n' and not in_quotes:
+                return offset
+        f.seek(offset)
+        position = offset
+        while True:
+            block = f.read(_READ_BLOCK)
+            if not block:
+                return position
+            start = 0
+            while True:
+                newline = block.find(b'\n', start)
+                segment_end = len(block) if newline < 0 else newline
+                in_quotes ^= block.count(b'"', start, segment_end) % 2 == 1
+                if newline < 0:
+                    break
+                if not in_quotes:
+                    return position + newline + 1
+                start = newline + 1
+            position += len(block)
+
+
+class _RangeReader(io.RawIOBase):
+    """Binary file object that only exposes bytes [start, end) of path"""
+
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def read_header(path):
+    """Column names from the first line of the CSV"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f))
+
+
+def _iter_range_chunks(path, first, last, header, columns, chunksize):
+    """DataFrame chunks for the complete records in bytes [first, last)"""
+    if last <= first:
+        return
+    with io.BufferedReader(_RangeReader(path, first, last)) as raw:
+        text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        with pd.read_csv(text, header=None, names=header, usecols=columns,
+                         dtype=str, chunksize=chunksize) as reader:
+            yield from reader
+
+
+def _range_stats(path, start, end, in_quotes_start, in_quotes_end, header, group_by,
+                 chunksize):
+    """Partial aggregate for the records that begin inside [start, end)"""
+    first = _record_boundary(path, start, in_quotes_start)
+    last = _record_boundary(path, end, in_quotes_end) if end < os.path.getsize(path) else end
+    columns = list(LANGUAGE_COLUMNS)
+    if group_by is not None:
+        columns += [group_by] if isinstance(group_by, str) else list(group_by)
+    chunks = _iter_range_chunks(path, first, last, header, columns, chunksize)
+    if group_by is None:
+        return stream_language_stats(chunks)
+    return merge_grouped_stats(grouped_language_stats(chunk, group_by) for chunk in chunks)
+
+
+def parallel_language_stats(path, workers=None, group_by=None, chunksize=100_000):
+    """language_stats() computed across a process pool
+
+    Each worker aggregates one byte range of the CSV and the partial counts
+    are added up. With group_by (a column name or list of names) the result
+    is a DataFrame of counts per group, e.g. per city or agency; otherwise
+    the same dict as language_stats().
+    """
+    workers = workers or os.cpu_count() or 1
+    header = read_header(path)
+    with open(path, 'rb') as f:
+        data_start = len(f.readline())
+    size = os.path.getsize(path)
+    cuts = [data_start + (size - data_start) * i // workers for i in range(workers + 1)]
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        quote_counts = list(pool.map(_count_quotes, [path] * workers, cuts[:-1], cuts[1:]))
+        in_quotes = [sum(quote_counts[:i]) % 2 == 1 for i in range(workers + 1)]
+        futures = [pool.submit(_range_stats, path, cuts[i], cuts[i + 1], in_quotes[i],
+                               in_quotes[i + 1], header, group_by, chunksize)
+                   for i in range(workers)]
+        partials = [future.result() for future in futures]
+
+    if group_by is None:
+        return merge_stats(*partials)
+    return merge_grouped_stats(partials)
+
+
+# Incremental updates
+#
+# The EarlyON feed is append-mostly. update_language_stats() keeps the counts
+# together with a high-water mark (the byte offset just past the last
+# complete record already counted) and only parses what was appended since.
+# A hash of every byte before the mark tells an append from an edit or a
+# rewrite. A last record without a trailing newline is counted but stays past the
+# mark, so the next update parses it again in case the append continues it.
+
+
+def _last_record_end(path, start):
+    """(offset just past the last newline-terminated record at or after start, EOF offset)
+
+    The EOF offset is where a final record without a trailing newline
+    ends, or the first offset when there is no such record (or it is
+    still inside a quoted field).
+    """
+    last = start
+    in_quotes = False
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        while True:
+            block = f.read(_READ_BLOCK)
+            if not block:
+                return last, (position if position > last and not in_quotes else last)
+            offset = 0
+            while True:
+                newline = block.find(b'\n', offset)
+                segment_end = len(block) if newline < 0 else newline
+                in_quotes ^= block.count(b'"', offset, segment_end) % 2 == 1
+                if newline < 0:
+                    break
+                if not in_quotes:
+                    last = position + newline + 1
+                offset = newline + 1
+            position += len(block)
+
+
+def _hash_range(path, start, end, digest):
+    """Feed bytes [start, end) of path into digest; returns digest"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(_READ_BLOCK, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def default_state_path(path):
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, f'.{name}.language_state.json')
+
+
+def update_language_stats(path, state_path=None, chunksize=100_000):
+    """language_stats() for a growing CSV, parsing only newly appended rows
+
+    The previous counts and high-water mark are kept in state_path (a JSON
+    file next to the CSV by default). If anything before the mark was
+    truncated, edited or rewritten rather than appended to, everything is
+    recounted. A last line without a trailing newline is counted and
+    checked again on the next update. Returns (stats, new_rows).
+    """
+    state_path = state_path or default_state_path(path)
+    header = read_header(path)
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = None
+
+    size = os.path.getsize(path)
+    prefix = None
+    if state is not None and state['header'] == header and state['offset'] <= size:
+        prefix = _hash_range(path, 0, state['offset'], hashlib.sha256())
+    if prefix is None or prefix.hexdigest() != state.get('prefix_sha256'):
+        with open(path, 'rb') as f:
+            offset = len(f.readline())
+        prefix = _hash_range(path, 0, offset, hashlib.sha256())
+        stats = empty_stats()
+        reported = 0
+    else:
+        offset = state['offset']
+        stats = state['stats']
+        reported = state['reported_total']
+
+    end, eof_end = _last_record_end(path, offset)
+    columns = list(LANGUAGE_COLUMNS)
+    stats = merge_stats(stats, stream_language_stats(
+        _iter_range_chunks(path, offset, end, header, columns, chunksize)))
+    unterminated = stream_language_stats(
+        _iter_range_chunks(path, end, eof_end, header, columns, chunksize))
+    result = merge_stats(stats, unterminated)
+
+    prefix = _hash_range(path, offset, end, prefix)
+    state = {'header': header, 'offset': end, 'prefix_sha256': prefix.hexdigest(),
+             'stats': stats, 'reported_total': result['total']}
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+    return result, result['total'] - reported
+
+
+# Per-language counts
+#
+# The languages column is free text: comma-separated lists such as
+# "French, Arabic" with uneven spacing and case. Only a few hundred
+# distinct lists occur however many centres there are, so each distinct
+# list is tokenized once and the centre x language matrix is assembled
+# from the category codes with array operations, without a row loop.
+
+# Separators between the languages of one centre ("and" in any case)
+_LANGUAGE_SEPARATORS = re.compile(r'\s*(?:[,;/|&]|\band\b)\s*', re.IGNORECASE)
+
+# Rows per block when co-occurrence counts are accumulated
+_CO_OCCURRENCE_BLOCK = 100_000
+
+
+def normalize_language(name):
+    """One spelling per language: single spaces, words capitalized, acronyms (ASL) kept"""
+    return ' '.join(word if len(word) <= 3 and word.isupper() else word.capitalize()
+                    for word in name.split())
+
+
+def language_matrix(languages):
+    """Sparse centre x language indicator matrix of a languages column
+
+    Returns {'vocabulary', 'indptr', 'indices'}: CSR arrays in which
+    centre i offers vocabulary[indices[indptr[i]:indptr[i + 1]]].
+    Missing values give empty rows, and a language named twice in one
+    list counts once.
+    """
+    values = pd.Series(languages)
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    codes = values.cat.codes.to_numpy()
+
+    # Tokenize the distinct lists only
+    tokens = (pd.Series(values.cat.categories.astype(str))
+              .str.split(_LANGUAGE_SEPARATORS, regex=True).explode())
+    names = tokens.map(normalize_language)
+    names = names[names != '']
+    if names.empty:
+        # No centre names a language: every row is empty
+        return {'vocabulary': np.array([], dtype=str),
+                'indptr': np.zeros(len(codes) + 1, dtype=np.int64),
+                'indices': np.array([], dtype=np.int32)}
+    vocabulary, language = np.unique(names.to_numpy(dtype=str), return_inverse=True)
+    pairs = np.unique(np.stack([names.index.to_numpy(), language.ravel()]), axis=1)
+    # Category c offers pairs[1, category_ptr[c]:category_ptr[c + 1]]
+    category_ptr = np.searchsorted(pairs[0], np.arange(len(values.cat.categories) + 1))
+
+    present = codes >= 0
+    lengths = np.where(present, np.diff(category_ptr)[np.where(present, codes, 0)], 0)
+    indptr = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    starts = category_ptr[np.where(present, codes, 0)]
+    positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+    return {'vocabulary': vocabulary, 'indptr': indptr,
+            'indices': pairs[1][positions].astype(np.int32)}
+
+
+def language_counts(matrix):
+    """Centres offering each language, most offered first"""
+    counts = np.bincount(matrix['indices'], minlength=len(matrix['vocabulary']))
+    return (pd.Series(counts, index=pd.Index(matrix['vocabulary'], name='language'),
+                      name='centres')
+            .sort_values(ascending=False, kind='stable'))
+
+
+def language_co_occurrence(matrix, languages=None):
+    """Centres offering both languages, for every pair (the diagonal is language_counts)
+
+    languages limits the result to those vocabulary entries, in that
+    order. Accumulated a block of rows at a time as block.T @ block, with
+    block a centre x language indicator slice, giving language x language.
+    """
+    vocabulary = matrix['vocabulary']
+    languages = vocabulary if languages is None else np.asarray(languages, dtype=str)
+    position = np.searchsorted(vocabulary, languages).clip(max=max(len(vocabulary) - 1, 0))
+    unknown = [name for name, found in zip(languages, vocabulary[position]) if name != found]
+    if unknown:
+        raise KeyError(f"not in the vocabulary: {', '.join(unknown)}")
+    column = np.full(len(vocabulary), -1)
+    column[position] = np.arange(len(languages))
+    indptr, indices = matrix['indptr'], column[matrix['indices']]
+    counts = np.zeros((len(languages), len(languages)))
+    for first in range(0, len(indptr) - 1, _CO_OCCURRENCE_BLOCK):
+        last = min(first + _CO_OCCURRENCE_BLOCK, len(indptr) - 1)
+        block = np.zeros((last - first, len(languages)), dtype=np.float32)
+        lo, hi = indptr[first], indptr[last]
+        rows = np.repeat(np.arange(last - first), np.diff(indptr[first:last + 1]))
+        keep = indices[lo:hi] >= 0
+        block[rows[keep], indices[lo:hi][keep]] = 1
+        counts += block.T @ block
+    index = pd.Index(languages, name='language')
+    return pd.DataFrame(counts.astype(np.int64), index=index, columns=index)
+
+
+# Part of the sidecar name; bump it when tokenizing changes so old matrices are not reused
+_MATRIX_VERSION = 2
+
+
+def _matrix_paths(path, cache_dir):
+    folder = cache_dir or os.path.dirname(os.path.abspath(path))
+    stem = os.path.join(folder, f'.{os.path.basename(path)}.languages.v{_MATRIX_VERSION}')
+    return f'{stem}.npz', f'{stem}.json'
+
+
+def load_language_matrix(path, cache=True, cache_dir=None):
+    """language_matrix() of the file's languages column, cached next to the CSV
+
+    Like load_earlyon(), the arrays are kept in an .npz sidecar (in
+    cache_dir if given) and reused while the CSV is unchanged. Arrow/Feather
+    extracts are parsed directly.
+    """
+    columnar = str(path).lower().endswith(ARROW_EXTENSIONS)
+    data_path, meta_path = _matrix_paths(path, cache_dir)
+    if cache and not columnar and os.path.exists(data_path) and _sidecar_is_fresh(path, meta_path):
+        with np.load(data_path) as data:
+            return {name: data[name] for name in ('vocabulary', 'indptr', 'indices')}
+
+    meta = None if columnar or not cache else {'source': _source_state(path),
+                                                'sha256': file_digest(path)}
+    df = load_earlyon(path, columns=('languages',), cache=cache, cache_dir=cache_dir)
+    matrix = language_matrix(df['languages'])
+    if meta is not None:
+        try:
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            np.savez(data_path, **matrix)
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+        except OSError as exc:
+            print(f"Could not write language matrix sidecar ({exc}); continuing without it")
+    return matrix
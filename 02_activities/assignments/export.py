@@ -0,0 +1,250 @@
+# Batch export of the course figures
+#
+# Renders every registered figure builder (see figures.py) with the Agg
+# backend across a process pool and writes PNG/SVG/PDF files, never calling
+# show(). Run from this folder:
+#     python export.py --out figures_out --formats png svg pdf
+#     python export.py life_expectancy_gdp campaign_costs --workers 1
+#     python export.py --formats svg pdf --compact   # smaller vector files
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+DEFAULT_FORMATS = ('png',)
+
+# Strip timestamps from vector outputs so parallel and serial runs (and
+# reruns) write byte-identical files.
+_FORMAT_METADATA = {
+    'pdf': {'CreationDate': None},
+    'svg': {'Date': None},
+    'png': {},
+}
+
+
+# Formats the compact vector backend writes
+_COMPACT_FORMATS = ('svg', 'pdf')
+
+# Fixed SVG id salt; the default is random per process
+_DETERMINISTIC_RC = {'svg.hashsalt': 'visualization'}
+
+
+def _use_agg():
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+
+def export_figure(name, output_dir='.', formats=DEFAULT_FORMATS, dpi=300, params=None,
+                  style=None, compact=False):
+    """Build one registered figure and save it in every format
+
+    style is an rcParams dict to render with (default: the current one).
+    compact=True writes SVG and PDF through vector_export's compact backend.
+    Returns a timing record: build and per-format save seconds plus the
+    bytes written for each file. Errors are reported in the record instead
+    of raised, so one broken figure does not stop a batch.
+    """
+    _use_agg()
+    import matplotlib.pyplot as plt
+    from figures import FIGURE_BUILDERS, LAYOUT_CACHE
+    from render_profile import phase, profile_figure
+
+    record = {'name': name, 'files': {}, 'save_s': {}, 'cached': [], 'error': None}
+    start = time.perf_counter()
+    try:
+        with (profile_figure(name, formats=list(formats), dpi=dpi),
+              plt.rc_context(style), plt.rc_context(_DETERMINISTIC_RC)):
+            with phase('build'):
+                fig = FIGURE_BUILDERS[name](**(params or {}))
+            record['build_s'] = time.perf_counter() - start
+            for fmt in formats:
+                path = _output_path(output_dir, name, fmt)
+                save_start = time.perf_counter()
+                with phase('save', fig=fig, target=path):
+                    LAYOUT_CACHE.savefig(fig, path, format=fmt, dpi=dpi, bbox_inches='tight',
+                                         metadata=_FORMAT_METADATA.get(fmt),
+                                         **_compact_kwargs(fmt, compact))
+                record['save_s'][fmt] = time.perf_counter() - save_start
+                record['files'][path] = os.path.getsize(path)
+        plt.close(fig)
+    except Exception as exc:
+        record['error'] = f'{type(exc).__name__}: {exc}'
+        plt.close('all')
+    record['total_s'] = time.perf_counter() - start
+    return record
+
+
+def _compact_kwargs(fmt, compact):
+    if not compact or fmt not in _COMPACT_FORMATS:
+        return {}
+    from vector_export import COMPACT_BACKEND
+    return {'backend': COMPACT_BACKEND}
+
+
+def _cache_format(fmt, compact):
+    # Compact and plain files of one format are different cache entries
+    return f'{fmt}+compact' if compact and fmt in _COMPACT_FORMATS else fmt
+
+
+def _output_path(output_dir, name, fmt):
+    return os.path.join(output_dir, f'{name}.{fmt}')
+
+
+def _fetch_cached(cache, name, output_dir, formats, dpi, params, style, code, compact=False):
+    """Copy cached files into place; returns (record, formats still to render)"""
+    from render_cache import render_key
+
+    record = {'name': name, 'files': {}, 'save_s': {}, 'cached': [], 'error': None,
+              'build_s': 0.0, 'total_s': 0.0, 'keys': {}}
+    missing = []
+    for fmt in formats:
+        key = render_key(name, params, _cache_format(fmt, compact), dpi, style, code)
+        record['keys'][fmt] = key
+        path = _output_path(output_dir, name, fmt)
+        if cache.fetch(key, path):
+            record['cached'].append(fmt)
+            record['files'][path] = os.path.getsize(path)
+        else:
+            missing.append(fmt)
+    return record, missing
+
+
+def _merge_rendered(cache, output_dir, cached, rendered):
+    """Fold a fresh render into its cache record and store the new files"""
+    for fmt, key in cached.pop('keys').items():
+        path = _output_path(output_dir, rendered['name'], fmt)
+        if path in rendered['files'] and not rendered['error']:
+            cache.store(key, path)
+    rendered['files'].update(cached['files'])
+    rendered['cached'] = cached['cached']
+    return rendered
+
+
+def export_all(names=None, output_dir='.', formats=DEFAULT_FORMATS, dpi=300,
+               workers=None, params=None, cache=None, compact=False):
+    """Export figures concurrently, one figure per task
+
+    names defaults to every registered builder. params maps a figure name
+    to keyword arguments for its builder. workers=1 renders serially in
+    this process (same bytes, handy for debugging). With a RenderCache,
+    files whose inputs, code and style are unchanged are copied from the
+    cache and only the missing formats are rendered. compact is passed to
+    export_figure(). Returns the timing records in the order of names.
+    """
+    from figures import FIGURE_BUILDERS
+    from render_cache import active_style, code_digest
+
+    names = list(names or FIGURE_BUILDERS)
+    unknown = [name for name in names if name not in FIGURE_BUILDERS]
+    if unknown:
+        raise KeyError(f"unknown figure(s): {', '.join(unknown)}")
+    params = params or {}
+    os.makedirs(output_dir, exist_ok=True)
+    # Workers render with the caller's style, so serial and parallel runs match
+    style = active_style()
+
+    todo = {name: list(formats) for name in names}
+    cached = {}
+    if cache is not None:
+        code = code_digest()
+        for name in names:
+            cached[name], todo[name] = _fetch_cached(cache, name, output_dir, formats, dpi,
+                                                     params.get(name), style, code, compact)
+
+    rendered = {}
+    if workers == 1:
+        for name in names:
+            if todo[name]:
+                rendered[name] = export_figure(name, output_dir, todo[name], dpi,
+                                               params.get(name), style, compact)
+    elif any(todo.values()):
+        # spawn gives each worker a clean pyplot state, whatever the parent imported
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                                 initializer=_use_agg) as pool:
+            futures = {name: pool.submit(export_figure, name, output_dir, todo[name], dpi,
+                                         params.get(name), style, compact)
+                       for name in names if todo[name]}
+            rendered = {name: future.result() for name, future in futures.items()}
+
+    records = []
+    for name in names:
+        if name not in rendered:
+            cached[name].pop('keys')
+            records.append(cached[name])
+        elif name in cached:
+            records.append(_merge_rendered(cache, output_dir, cached[name], rendered[name]))
+        else:
+            records.append(rendered[name])
+    return records
+
+
+def print_report(records):
+    """Per-figure timing table"""
+    print(f"{'figure':<26} {'build (s)':>9} {'save (s)':>9} {'total (s)':>9} {'KB':>9}")
+    for record in records:
+        if record['error']:
+            print(f"{record['name']:<26} FAILED {record['error']}")
+            continue
+        kilobytes = sum(record['files'].values()) / 1e3
+        cached = f"  (cached: {', '.join(record['cached'])})" if record['cached'] else ''
+        print(f"{record['name']:<26} {record['build_s']:9.3f} {sum(record['save_s'].values()):9.3f} "
+              f"{record['total_s']:9.3f} {kilobytes:9.1f}{cached}")
+
+
+def main():
+    from figures import EARLYON_CSV, EARLYON_FIGURES, FIGURE_BUILDERS
+
+    parser = argparse.ArgumentParser(description='Export the course figures in parallel')
+    parser.add_argument('names', nargs='*', metavar='figure',
+                        help=f"figures to export (default: all of {', '.join(FIGURE_BUILDERS)})")
+    parser.add_argument('--out', default='.', help='output folder')
+    parser.add_argument('--formats', nargs='+', default=list(DEFAULT_FORMATS),
+                        choices=sorted(_FORMAT_METADATA))
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes to use (default: one per CPU, 1 = serial)')
+    parser.add_argument('--earlyon-csv', default=EARLYON_CSV,
+                        help='EarlyON centres CSV for the language and location analysis figures')
+    parser.add_argument('--compact', action='store_true',
+                        help='write SVG/PDF with shared marker symbols, rounded coordinates '
+                             'and simplified lines (vector_export.py)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='reuse unchanged figures from this render cache')
+    parser.add_argument('--cache-mb', type=float, default=500,
+                        help='render cache size limit in MB')
+    parser.add_argument('--profile', metavar='JSONL',
+                        help='append a per-figure timing record (phases, counters) to this file')
+    parser.add_argument('--cprofile', metavar='DIR',
+                        help='with --profile, also write a cProfile dump per figure here')
+    args = parser.parse_args()
+
+    run = None
+    if args.profile:
+        from render_profile import enable
+        run = enable(args.profile, args.cprofile)
+
+    cache = None
+    if args.cache_dir:
+        from render_cache import RenderCache
+        cache = RenderCache(args.cache_dir, max_bytes=int(args.cache_mb * 1e6))
+
+    params = {name: {'input_file': args.earlyon_csv} for name in EARLYON_FIGURES}
+    start = time.perf_counter()
+    records = export_all(args.names, args.out, args.formats, args.dpi, args.workers, params,
+                         cache, args.compact)
+    print_report(records)
+    print(f"\nExported {len(records)} figures in {time.perf_counter() - start:.2f}s")
+    if cache is not None:
+        print("Render cache: " + ', '.join(f'{k}={v}' for k, v in cache.stats().items()))
+    if run is not None:
+        from render_profile import print_profile, read_profile
+        print(f"\nProfile ({args.profile}):")
+        print_profile(read_profile(args.profile, run))
+    if any(record['error'] for record in records):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
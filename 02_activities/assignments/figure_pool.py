@@ -0,0 +1,209 @@
+# Recycled figures for repeated small multiples
+#
+# plt.subplots() in a loop allocates a new Figure, canvas and Axes every
+# time, and pyplot keeps each one alive until it is closed. FigurePool
+# hands out cleared figures of a given size and layout instead, resets
+# them when they are released and closes them deterministically, so a
+# long-running renderer holds a fixed number of figures.
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from matplotlib.figure import Figure
+
+# Figure attributes holding suptitle/supxlabel/supylabel; cleared on reset
+# so the next suptitle() creates a fresh Text
+_SUPLABELS = ('_suptitle', '_supxlabel', '_supylabel')
+
+
+class FigurePool:
+    """Hands out cleared figures of a given size and layout, reusing released ones
+
+    Figures are plain matplotlib Figures that pyplot does not track, so
+    pyplot's open-figure warning never fires and nothing but the pool and
+    the caller keeps them alive. Save them with fig.savefig(). Give a
+    figure back with release(fig), or use the borrow_* context managers;
+    close() (or leaving a `with FigurePool() as pool:` block) frees them all.
+
+    Reset clears every pooled Axes and restores what Axes.clear() keeps
+    (position, aspect, facecolor, ...), removes anything added on top
+    (extra axes such as colorbars and twins, suptitles, figure legends and
+    texts), and restores the figure size, dpi, colors and subplot
+    parameters. A figure whose pooled axes were removed, or that gained
+    subfigures, is closed instead of reused. Sharing set up after checkout
+    with ax.sharex() cannot be undone, so do not pool such figures.
+    """
+
+    def __init__(self, max_idle_per_layout=4):
+        self.max_idle_per_layout = max_idle_per_layout
+        self._idle = defaultdict(list)
+        self._in_use = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def subplots(self, nrows=1, ncols=1, figsize=None, dpi=None, layout=None, **kwargs):
+        """Like plt.subplots(): returns (fig, ax or array of axes)"""
+        key = ('subplots', nrows, ncols, figsize, dpi, layout, repr(sorted(kwargs.items())))
+        return self._acquire(key, figsize, dpi, layout,
+                             lambda fig: fig.subplots(nrows, ncols, **kwargs))
+
+    def subplot_mosaic(self, mosaic, figsize=None, dpi=None, layout=None, **kwargs):
+        """Like plt.subplot_mosaic(): returns (fig, {label: ax})"""
+        key = ('mosaic', repr(mosaic), figsize, dpi, layout, repr(sorted(kwargs.items())))
+        return self._acquire(key, figsize, dpi, layout,
+                             lambda fig: fig.subplot_mosaic(mosaic, **kwargs))
+
+    def _acquire(self, key, figsize, dpi, layout, make_axes):
+        with self._lock:
+            idle = self._idle[key]
+            entry = idle.pop() if idle else None
+            if entry is not None:
+                self.reused += 1
+        if entry is None:
+            fig = Figure(figsize=figsize, dpi=dpi, layout=layout)
+            axes = make_axes(fig)
+            entry = {'key': key, 'fig': fig, 'axes': axes, 'pooled': list(fig.axes),
+                     'state': _figure_state(fig)}
+            with self._lock:
+                self.created += 1
+        with self._lock:
+            self._in_use[id(entry['fig'])] = entry
+        return entry['fig'], entry['axes']
+
+    def release(self, fig):
+        """Reset fig and keep it for the next caller with the same layout"""
+        with self._lock:
+            entry = self._in_use.pop(id(fig), None)
+        if entry is None:
+            raise ValueError("figure was not handed out by this pool")
+        with self._lock:
+            full = len(self._idle[entry['key']]) >= self.max_idle_per_layout
+        if full or not _reset(entry):
+            with self._lock:
+                self.discarded += 1
+            _close(fig)
+            return
+        with self._lock:
+            self._idle[entry['key']].append(entry)
+
+    @contextmanager
+    def borrow_subplots(self, *args, **kwargs):
+        """`with pool.borrow_subplots(...) as (fig, ax):`, released on exit"""
+        fig, axes = self.subplots(*args, **kwargs)
+        try:
+            yield fig, axes
+        finally:
+            self.release(fig)
+
+    @contextmanager
+    def borrow_mosaic(self, *args, **kwargs):
+        """`with pool.borrow_mosaic(...) as (fig, axes):`, released on exit"""
+        fig, axes = self.subplot_mosaic(*args, **kwargs)
+        try:
+            yield fig, axes
+        finally:
+            self.release(fig)
+
+    def close(self):
+        """Close every figure the pool knows about, idle or handed out"""
+        with self._lock:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            entries += self._in_use.values()
+            self._idle.clear()
+            self._in_use.clear()
+        for entry in entries:
+            _close(entry['fig'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def stats(self):
+        with self._lock:
+            return {'created': self.created, 'reused': self.reused, 'discarded': self.discarded,
+                    'idle': sum(len(idle) for idle in self._idle.values()),
+                    'in_use': len(self._in_use)}
+
+
+def _figure_state(fig):
+    params = fig.subplotpars
+    return {
+        'size': tuple(fig.get_size_inches()),
+        'dpi': fig.get_dpi(),
+        'facecolor': fig.get_facecolor(),
+        'edgecolor': fig.get_edgecolor(),
+        'layout': fig.get_layout_engine(),
+        'subplotpars': {name: getattr(params, name)
+                        for name in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')},
+        'axes': [_axes_state(ax) for ax in fig.axes],
+    }
+
+
+def _axes_state(ax):
+    # What Axes.clear() leaves alone
+    return {
+        'position': ax.get_position(original=True).frozen(),
+        'subplotspec': ax.get_subplotspec(),
+        'aspect': ax.get_aspect(),
+        'adjustable': ax.get_adjustable(),
+        'anchor': ax.get_anchor(),
+        'box_aspect': ax.get_box_aspect(),
+        'facecolor': ax.get_facecolor(),
+        'frame_on': ax.get_frame_on(),
+        'visible': ax.get_visible(),
+        'in_layout': ax.get_in_layout(),
+        'zorder': ax.get_zorder(),
+        'locator': ax.get_axes_locator(),
+    }
+
+
+def _reset(entry):
+    """Bring a released figure back to its freshly created state; False if it can't be"""
+    fig, pooled, state = entry['fig'], entry['pooled'], entry['state']
+    if fig.subfigs or any(ax not in fig.axes for ax in pooled):
+        return False
+
+    for ax in list(fig.axes):
+        if ax not in pooled:
+            ax.remove()
+    for artists in (fig.texts, fig.legends, fig.lines, fig.patches, fig.images, fig.artists):
+        for artist in list(artists):
+            artist.remove()
+    for name in _SUPLABELS:
+        if hasattr(fig, name):
+            setattr(fig, name, None)
+
+    fig.set_size_inches(state['size'], forward=False)
+    fig.set_dpi(state['dpi'])
+    fig.set_facecolor(state['facecolor'])
+    fig.set_edgecolor(state['edgecolor'])
+    fig.set_layout_engine(state['layout'])
+    engine = fig.get_layout_engine()
+    if engine is None or engine.adjust_compatible:
+        fig.subplots_adjust(**state['subplotpars'])
+    for ax, saved in zip(pooled, state['axes']):
+        ax.clear()
+        if saved['subplotspec'] is not None:
+            ax.set_subplotspec(saved['subplotspec'])
+        # set_position() also takes the axes out of constrained layout
+        ax.set_position(saved['position'])
+        ax.set_in_layout(saved['in_layout'])
+        ax.set_aspect(saved['aspect'], adjustable=saved['adjustable'], anchor=saved['anchor'])
+        ax.set_box_aspect(saved['box_aspect'])
+        ax.set_facecolor(saved['facecolor'])
+        ax.set_frame_on(saved['frame_on'])
+        ax.set_visible(saved['visible'])
+        ax.set_zorder(saved['zorder'])
+        ax.set_axes_locator(saved['locator'])
+    return True
+
+
+def _close(fig):
+    # Break the figure's reference cycles now rather than at the next GC pass
+    fig.clear()
+    fig.canvas.figure = None
@@ -0,0 +1,468 @@
+# Figure builders for the course examples
+#
+# Each builder creates and returns one matplotlib Figure without saving or
+# showing it, so the same figure can be drawn by the example scripts, the
+# batch exporter (export.py) or anything else that needs it.
+
+import os
+
+from column_sources import open_columns
+from earlyon_data import (LOCATION_COLUMNS, language_co_occurrence, language_counts,
+                          language_stats, load_earlyon, load_language_matrix)
+from geo_index import PointIndex, parse_points
+from layout_cache import LayoutCache
+from render_profile import phase
+from sample_data import CONTINENTS, CONTINENT_COLORS, generate_gapminder_like
+from startup import lazy_import
+
+# Imported on first use, so importing the registry stays cheap
+np = lazy_import('numpy')
+plt = lazy_import('matplotlib.pyplot')
+
+EARLYON_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'EarlyON_Child_and_Family_Centres_Locations_-_geometry_-_4326.csv')
+
+# Columns life_expectancy_figure() reads from its data source
+LIFE_EXPECTANCY_COLUMNS = ('gdp_per_capita', 'life_expectancy', 'continent', 'population')
+
+# Solved layouts shared by every builder (and save) in this process, so
+# rebuilding a figure with the same labels skips the tight_layout() solve
+LAYOUT_CACHE = LayoutCache()
+
+# Builders that read the EarlyON centres CSV (their input_file argument)
+EARLYON_FIGURES = ('language_analysis', 'location_analysis', 'languages_offered')
+
+# name -> builder; exported files are written as <name>.<format>
+FIGURE_BUILDERS = {}
+
+
+def figure_builder(name):
+    """Register a builder under name; the output file is <name>.<format>"""
+    def register(builder):
+        FIGURE_BUILDERS[name] = builder
+        return builder
+    return register
+
+
+@figure_builder('life_expectancy_gdp')
+def life_expectancy_figure(seed=42, data=None):
+    """Example 1: Life expectancy vs GDP bubble scatter
+
+    data is any source open_columns() accepts (a .npy folder, an Arrow
+    file, a DataFrame, ...) with the LIFE_EXPECTANCY_COLUMNS; by default
+    sample data is generated from seed.
+    """
+    from plot_helpers import adaptive_scatter
+
+    if data is None:
+        # Create sample data similar to the life expectancy example
+        # (20-39 countries per continent, one batched draw per column)
+        n_countries = np.random.default_rng(seed).integers(20, 40, len(CONTINENTS))
+        data = generate_gapminder_like(n_countries, CONTINENTS, seed=seed,
+                                       colors=CONTINENT_COLORS)
+    columns = open_columns(data, LIFE_EXPECTANCY_COLUMNS)
+
+    # All continents in one scatter, one legend entry each; above
+    # AGGREGATE_THRESHOLD points this becomes a density raster instead
+    fig, ax = plt.subplots(figsize=(12, 8))
+    ax.set_xscale('log')
+    scatter, continent_handles = adaptive_scatter(
+        ax,
+        columns['gdp_per_capita'],
+        columns['life_expectancy'],
+        columns['continent'],
+        colors=CONTINENT_COLORS,
+        categories=CONTINENTS,
+        s=columns['population'] / 1e6,
+        alpha=0.6,
+        edgecolors='white',
+        linewidth=0.5
+    )
+
+    ax.set_xlabel('GDP per capita (2000 dollars)', fontsize=12)
+    ax.set_ylabel('Life Expectancy (years)', fontsize=12)
+    ax.set_title('Life Expectancy v. Per Capita GDP, 2007', fontsize=14, fontweight='bold')
+    ax.legend(handles=continent_handles, title='Continent', loc='lower right')
+    ax.grid(True, alpha=0.3)
+    LAYOUT_CACHE.tight_layout(fig)
+    return fig
+
+
+@figure_builder('sales_line_chart')
+def sales_line_figure(data=None):
+    """Example 2: Line chart with multiple series
+
+    data is an open_columns() source with month, desktops, laptops and
+    tablets columns; by default the slide's sample sales are used.
+    """
+    if data is None:
+        # Create sample sales data
+        months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
+        desktops = [80, 45, 25, 20, 10, 5]
+        laptops = [30, 25, 35, 50, 45, 55]
+        tablets = [10, 15, 20, 35, 60, 95]
+    else:
+        months, desktops, laptops, tablets = open_columns(
+            data, ('month', 'desktops', 'laptops', 'tablets')).values()
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(months, desktops, marker='o', linewidth=2, label='Desktops')
+    ax.plot(months, laptops, marker='o', linewidth=2, label='Laptops')
+    ax.plot(months, tablets, marker='o', linewidth=2, label='Tablets')
+
+    ax.set_xlabel('Month', fontsize=12)
+    ax.set_ylabel('Units Sold', fontsize=12)
+    ax.set_title('Product Sales by Month', fontsize=14, fontweight='bold')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    LAYOUT_CACHE.tight_layout(fig)
+    return fig
+
+
+@figure_builder('aspect_ratio_comparison')
+def aspect_ratio_figure():
+    """Example 3: Demonstrating aspect ratio effects (from slide 21)"""
+    # Generate exponential data
+    x = np.linspace(0, 8, 100)
+    y = np.exp(x / 2)
+
+    # Create two plots with different aspect ratios
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+
+    # Tall, narrow plot
+    ax1.plot(x, y, linewidth=2, color='#2c3e50')
+    ax1.set_xlabel('x', fontsize=11)
+    ax1.set_ylabel('Value', fontsize=11)
+    ax1.set_title('Narrow Aspect Ratio\n(Emphasizes steepness)', fontsize=12)
+    ax1.grid(True, alpha=0.3)
+    ax1.set_aspect(0.002)
+
+    # Wide plot
+    ax2.plot(x, y, linewidth=2, color='#2c3e50')
+    ax2.set_xlabel('x', fontsize=11)
+    ax2.set_ylabel('Value', fontsize=11)
+    ax2.set_title('Wide Aspect Ratio\n(De-emphasizes steepness)', fontsize=12)
+    ax2.grid(True, alpha=0.3)
+
+    LAYOUT_CACHE.tight_layout(fig)
+    return fig
+
+
+@figure_builder('campaign_costs')
+def campaign_costs_figure(data=None):
+    """Example 4: Bar chart with value labels
+
+    data is an open_columns() source with year and cost columns; by
+    default the slide's figures are used.
+    """
+    from plot_helpers import label_bars
+
+    if data is None:
+        years = ['1972', '1974', '1976', '1978', '1980', '1982 est.']
+        costs = [50, 75, 125, 175, 250, 300]
+    else:
+        years, costs = open_columns(data, ('year', 'cost')).values()
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    bars = ax.bar(years, costs, color='#c0392b', alpha=0.7, edgecolor='black')
+    ax.set_xlabel('Year', fontsize=12)
+    ax.set_ylabel('Total Campaign Expenditures (millions)', fontsize=12)
+    ax.set_title('House and Senate Campaign Costs', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3, axis='y')
+
+    # Add value labels on bars
+    label_bars(ax, bars, fmt='$%dM', fontsize=10)
+
+    LAYOUT_CACHE.tight_layout(fig)
+    return fig
+
+
+@figure_builder('simple_example')
+def simple_example_figure():
+    """Example 5: Creating a basic plot with customization (teaching example)"""
+    # Simple example for beginners
+    x = [1, 2, 3, 4, 5]
+    y = [2, 4, 6, 8, 10]
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.plot(x, y, marker='o', linestyle='-', color='blue', linewidth=2, markersize=8)
+    ax.set_xlabel('X Values', fontsize=12)
+    ax.set_ylabel('Y Values', fontsize=12)
+    ax.set_title('Simple Line Plot Example', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    LAYOUT_CACHE.tight_layout(fig)
+    return fig
+
+
+@figure_builder('language_analysis')
+def language_analysis_figure(stats=None, input_file=EARLYON_CSV):
+    """Language services bar + pie chart for the EarlyON centres
+
+    Draws from the counts returned by language_stats(); when stats is None
+    they are computed from input_file.
+    """
+    if stats is None:
+        with phase('load'):
+            stats = language_stats(load_earlyon(input_file))
+    return LanguageAnalysisView(stats).fig
+
+
+def _program_counts(stats):
+    return {
+        'Multiple Languages': stats['centres_with_languages'],
+        'French Programs': stats['french_programs'],
+        'Indigenous Programs': stats['indigenous_programs']
+    }
+
+
+def _service_percentages(stats):
+    total = stats['total']
+    centres_with_languages = stats['centres_with_languages']
+    return {
+        'Multilingual\nSupport': (centres_with_languages / total * 100),
+        'French\nPrograms': (stats['french_programs'] / total * 100),
+        'Indigenous\nPrograms': (stats['indigenous_programs'] / total * 100),
+        'English\nOnly': ((total - centres_with_languages) / total * 100)
+    }
+
+
+class LanguageAnalysisView:
+    """The language analysis figure, kept alive so new counts can be shown in place
+
+    update() only touches the artists whose values depend on the counts
+    (bar heights, value labels, pie wedges and their labels) instead of
+    rebuilding the whole figure.
+    """
+
+    PIE_START_ANGLE = 90
+    LABEL_DISTANCE = 1.1
+    PCT_DISTANCE = 0.6
+
+    def __init__(self, stats):
+        import seaborn as sns
+
+        with plt.style.context('seaborn-v0_8-whitegrid'), sns.color_palette('husl'):
+            self._draw(stats)
+        self.stats = dict(stats)
+
+    def _draw(self, stats):
+        from plot_helpers import label_bars
+
+        fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+        self.fig = fig
+
+        # 1. Language program availability (Bar Chart)
+        ax1 = self.bar_ax = axes[0]
+        program_counts = _program_counts(stats)
+        colors = ['#3498db', '#e74c3c', '#2ecc71']
+        self.bars = ax1.bar(program_counts.keys(), program_counts.values(),
+                            color=colors, edgecolor='black', linewidth=1.5)
+        ax1.set_ylabel('Number of Centres', fontsize=12, fontweight='bold')
+        ax1.set_title('Language Program Availability', fontsize=14, fontweight='bold', pad=15)
+        ax1.grid(axis='y', alpha=0.3, linestyle='--')
+
+        # Add value labels on bars
+        self.bar_labels = label_bars(ax1, self.bars, fmt='%d', fontsize=12, fontweight='bold')
+
+        # 2. Percentage breakdown (Pie Chart)
+        ax2 = axes[1]
+        percentages = _service_percentages(stats)
+        colors_pie = ['#3498db', '#e74c3c', '#2ecc71', '#95a5a6']
+        self.wedges, self.pie_labels, self.autotexts = ax2.pie(
+            percentages.values(),
+            labels=percentages.keys(),
+            autopct='%1.1f%%',
+            startangle=self.PIE_START_ANGLE,
+            labeldistance=self.LABEL_DISTANCE,
+            pctdistance=self.PCT_DISTANCE,
+            colors=colors_pie,
+            textprops={'fontsize': 10})
+
+        # Make percentage text more visible
+        for autotext in self.autotexts:
+            autotext.set_color('white')
+            autotext.set_fontweight('bold')
+            autotext.set_fontsize(11)
+
+        ax2.set_title('Language Service Distribution', fontsize=14, fontweight='bold', pad=15)
+
+        fig.suptitle('EarlyON Child and Family Centres - Language Services Analysis',
+                     fontsize=16, fontweight='bold', y=1.02)
+
+        LAYOUT_CACHE.tight_layout(fig)
+
+    def update(self, stats):
+        """Show new counts; returns the artists that changed"""
+        changed = []
+        if stats == self.stats:
+            return changed
+
+        for bar, height in zip(self.bars, _program_counts(stats).values()):
+            if bar.get_height() != height:
+                bar.set_height(height)
+                changed.append(bar)
+        if changed:
+            self.bar_labels.set_bars(self.bars)
+            changed.append(self.bar_labels)
+            self.bar_ax.relim()
+            self.bar_ax.autoscale_view()
+
+        # Same geometry as Axes.pie: counter-clockwise from the start angle
+        values = np.asarray(list(_service_percentages(stats).values()), dtype=float)
+        fractions = values / values.sum()
+        theta1 = self.PIE_START_ANGLE
+        for wedge, label, autotext, fraction in zip(self.wedges, self.pie_labels,
+                                                    self.autotexts, fractions):
+            theta2 = theta1 + 360 * fraction
+            if (wedge.theta1, wedge.theta2) != (theta1, theta2):
+                wedge.set_theta1(theta1)
+                wedge.set_theta2(theta2)
+                middle = np.deg2rad((theta1 + theta2) / 2)
+                x, y = np.cos(middle), np.sin(middle)
+                label.set_position((self.LABEL_DISTANCE * x, self.LABEL_DISTANCE * y))
+                label.set_horizontalalignment('left' if x > 0 else 'right')
+                autotext.set_position((self.PCT_DISTANCE * x, self.PCT_DISTANCE * y))
+                autotext.set_text(f'{fraction * 100:1.1f}%')
+                changed += [wedge, label, autotext]
+            theta1 = theta2
+
+        self.stats = dict(stats)
+        return changed
+
+
+# Radius for the "centres nearby" coverage measure, and the hexagon size of the map
+COVERAGE_RADIUS_KM = 2.0
+HEX_SIZE_KM = 1.0
+
+
+def location_stats(centres, radius_km=COVERAGE_RADIUS_KM, hex_km=HEX_SIZE_KM):
+    """Per-city counts, local coverage and hex-bin density from a centres frame
+
+    centres has the LOCATION_COLUMNS and the geometry column. Returns the
+    per-city frame (school, community, total, nearby = mean number of
+    other centres within radius_km) sorted by total, and the hexagons
+    and counts for the map.
+    """
+    lon, lat = parse_points(centres['geometry'])
+    index = PointIndex(lon, lat)
+    located = np.isfinite(lon) & np.isfinite(lat)
+    # Every located centre finds itself
+    nearby = np.where(located, index.count_within(lon, lat, radius_km) - 1, np.nan)
+    school = (centres['school_location'] == 'Yes').to_numpy()
+    by_city = (centres.assign(school=school, community=~school, total=1, nearby=nearby)
+               .groupby('city', observed=True)[['school', 'community', 'total', 'nearby']]
+               .agg({'school': 'sum', 'community': 'sum', 'total': 'sum', 'nearby': 'mean'})
+               .sort_values('total', ascending=False))
+    hexagons, counts = index.hex_bins(hex_km)
+    return {'by_city': by_city, 'hexagons': hexagons, 'hex_counts': counts,
+            'lat0': index.lat0, 'radius_km': radius_km}
+
+
+@figure_builder('location_analysis')
+def location_analysis_figure(stats=None, input_file=EARLYON_CSV):
+    """Centres per city, a hex-bin map of where they are, and centres nearby per city
+
+    Draws from location_stats(); when stats is None the centres are
+    loaded from input_file.
+    """
+    from matplotlib.collections import PolyCollection
+    from plot_helpers import label_bars
+
+    if stats is None:
+        with phase('load'):
+            centres = load_earlyon(input_file, columns=LOCATION_COLUMNS, geometry=True)
+        with phase('aggregate'):
+            stats = location_stats(centres)
+    by_city = stats['by_city']
+    cities = by_city.index.astype(str).tolist()
+    positions = np.arange(len(cities))
+
+    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(20, 6))
+
+    # 1. School-based vs community centres per city
+    width = 0.4
+    school_bars = ax1.bar(positions - width / 2, by_city['school'], width, color='#3498db',
+                          edgecolor='black', label='School')
+    community_bars = ax1.bar(positions + width / 2, by_city['community'], width,
+                             color='#e67e22', edgecolor='black', label='Community')
+    label_bars(ax1, school_bars, fmt='%d', fontsize=10)
+    label_bars(ax1, community_bars, fmt='%d', fontsize=10)
+    ax1.set_xticks(positions, cities, rotation=30, ha='right')
+    ax1.set_ylabel('Number of Centres', fontsize=12, fontweight='bold')
+    ax1.set_title('Centres by City and Location Type', fontsize=14, fontweight='bold', pad=15)
+    # Headroom for the legend above the tallest bars
+    ax1.margins(y=0.15)
+    ax1.legend(ncols=2, loc='upper center')
+    ax1.grid(axis='y', alpha=0.3, linestyle='--')
+
+    # 2. Where the centres are: count per hexagon
+    hexagons = PolyCollection(stats['hexagons'], array=stats['hex_counts'], cmap='viridis',
+                              edgecolors='face')
+    ax2.add_collection(hexagons)
+    ax2.autoscale_view()
+    # Degrees of longitude are shorter than degrees of latitude
+    ax2.set_aspect(1 / np.cos(np.deg2rad(stats['lat0'])))
+    fig.colorbar(hexagons, ax=ax2, label='Centres per hexagon')
+    ax2.set_xlabel('Longitude', fontsize=12)
+    ax2.set_ylabel('Latitude', fontsize=12)
+    ax2.set_title('Centre Density', fontsize=14, fontweight='bold', pad=15)
+
+    # 3. Local coverage: other centres within the radius, averaged per city
+    bars = ax3.bar(positions, by_city['nearby'], color='#2ecc71', edgecolor='black')
+    label_bars(ax3, bars, fmt='%.1f', fontsize=10)
+    ax3.set_xticks(positions, cities, rotation=30, ha='right')
+    ax3.set_ylabel(f"Other Centres Within {stats['radius_km']:g} km", fontsize=12,
+                   fontweight='bold')
+    ax3.set_title('Average Centres Nearby', fontsize=14, fontweight='bold', pad=15)
+    ax3.grid(axis='y', alpha=0.3, linestyle='--')
+
+    fig.suptitle('EarlyON Child and Family Centres - Location Analysis',
+                 fontsize=16, fontweight='bold', y=1.02)
+    LAYOUT_CACHE.tight_layout(fig)
+    return fig
+
+
+# Languages shown in the languages_offered figure
+TOP_LANGUAGES = 10
+
+
+@figure_builder('languages_offered')
+def languages_offered_figure(matrix=None, input_file=EARLYON_CSV, top_n=TOP_LANGUAGES):
+    """Top languages offered by the centres, and which of them are offered together
+
+    Draws from a language_matrix(); when matrix is None it is loaded (or
+    read from its cache) from input_file.
+    """
+    from plot_helpers import label_bars
+
+    if matrix is None:
+        with phase('load'):
+            matrix = load_language_matrix(input_file)
+    with phase('aggregate'):
+        counts = language_counts(matrix).head(top_n)
+        both = language_co_occurrence(matrix, counts.index).to_numpy(dtype=float, copy=True)
+    names = counts.index.tolist()
+    positions = np.arange(len(names))
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 7), width_ratios=(1.2, 1))
+
+    # 1. Centres offering each of the top languages
+    bars = ax1.bar(positions, counts.to_numpy(), color='#3498db', edgecolor='black')
+    label_bars(ax1, bars, fmt='%d', fontsize=10)
+    ax1.set_xticks(positions, names, rotation=30, ha='right')
+    ax1.set_ylabel('Number of Centres', fontsize=12, fontweight='bold')
+    ax1.set_title(f'Top {len(names)} Languages Offered', fontsize=14, fontweight='bold', pad=15)
+    ax1.grid(axis='y', alpha=0.3, linestyle='--')
+
+    # 2. Pairs offered at the same centre; the diagonal would only repeat the bars
+    np.fill_diagonal(both, np.nan)
+    image = ax2.imshow(both, cmap='Blues')
+    ax2.set_xticks(positions, names, rotation=45, ha='right')
+    ax2.set_yticks(positions, names)
+    fig.colorbar(image, ax=ax2, label='Centres offering both')
+    ax2.set_title('Languages Offered Together', fontsize=14, fontweight='bold', pad=15)
+
+    fig.suptitle('EarlyON Child and Family Centres - Languages Offered',
+                 fontsize=16, fontweight='bold', y=1.02)
+    LAYOUT_CACHE.tight_layout(fig)
+    return fig
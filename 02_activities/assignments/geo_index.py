@@ -0,0 +1,268 @@
+# Spatial queries over the EarlyON centre locations
+#
+# The geometry column holds each centre as GeoJSON text in WGS84 (EPSG:4326).
+# parse_points() pulls the coordinates out once into float64 arrays, and
+# PointIndex buckets them into a uniform grid of square cells in a local
+# kilometre projection. Radius, nearest-centre and hex-bin queries then run
+# on whole arrays of query locations at once, only measuring distances to
+# the points in nearby cells instead of to every centre.
+
+from startup import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+EARTH_RADIUS_KM = 6371.0088
+
+# The first [x, y] pair of a GeoJSON Point or MultiPoint
+_COORDINATE_PAIR = (r'\[\s*(-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)\s*,'
+                    r'\s*(-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)')
+
+# Default grid density
+POINTS_PER_CELL = 2
+
+# Cells past this many per point mean the cell size is far too small for
+# how spread out the points are; it is scaled up instead
+_MAX_CELLS_PER_POINT = 16
+
+# Size of the temporary (query, cell) arrays per pass
+_PAIRS_PER_CHUNK = 1 << 21
+
+
+def parse_points(geometry):
+    """(lon, lat) float64 arrays from GeoJSON point text; NaN where there is none
+
+    A MultiPoint contributes its first point (EarlyON centres have one).
+    """
+    pairs = pd.Series(geometry, dtype='string').str.extract(_COORDINATE_PAIR)
+    return tuple(pd.to_numeric(pairs[i]).to_numpy(dtype='float64', na_value=np.nan)
+                 for i in (0, 1))
+
+
+class PointIndex:
+    """Grid index over lon/lat points for bulk radius, nearest and hex-bin queries
+
+    Coordinates are projected to kilometres with an equirectangular
+    projection about the points' mean latitude, which is within 0.1% of
+    great-circle distance across a city. Rows with missing coordinates are
+    left out; results refer to positions in the arrays passed in. Query
+    methods take arrays of lon/lat (e.g. postal code centroids, or the
+    centres themselves) and never loop over queries in Python. cell_km
+    defaults to a size holding about POINTS_PER_CELL points per cell.
+    """
+
+    def __init__(self, lon, lat, cell_km=None):
+        lon, lat = np.asarray(lon, dtype='float64'), np.asarray(lat, dtype='float64')
+        rows = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+        self.lat0 = float(lat[rows].mean()) if len(rows) else 0.0
+        x, y = self.project(lon[rows], lat[rows])
+        self.origin = (x.min(), y.min()) if len(rows) else (0.0, 0.0)
+        extent = (np.ptp(x), np.ptp(y)) if len(rows) else (0.0, 0.0)
+        if cell_km is None:
+            # About POINTS_PER_CELL points per cell over the bounding box
+            area = max((extent[0] + 1e-3) * (extent[1] + 1e-3), 1e-6)
+            cell_km = float(np.sqrt(area * POINTS_PER_CELL / max(len(rows), 1)))
+        cells = (extent[0] / cell_km + 1) * (extent[1] / cell_km + 1)
+        limit = _MAX_CELLS_PER_POINT * max(len(rows), 1)
+        if cells > limit:
+            cell_km *= np.sqrt(cells / limit)
+        self.cell_km = cell_km
+        self.shape = (int(extent[0] // cell_km) + 1, int(extent[1] // cell_km) + 1)
+
+        # Points sorted by cell; cell c holds points starts[c]:starts[c + 1]
+        cx, cy = self._cell(x, y)
+        cell = cx * self.shape[1] + cy
+        order = np.argsort(cell, kind='stable')
+        self.rows, self.x, self.y = rows[order], x[order], y[order]
+        self.starts = np.searchsorted(cell[order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def project(self, lon, lat):
+        """lon/lat degrees to the index's kilometre plane"""
+        scale = np.deg2rad(EARTH_RADIUS_KM)
+        return (np.asarray(lon) * scale * np.cos(np.deg2rad(self.lat0)),
+                np.asarray(lat) * scale)
+
+    def unproject(self, x, y):
+        scale = np.deg2rad(EARTH_RADIUS_KM)
+        return np.asarray(x) / (scale * np.cos(np.deg2rad(self.lat0))), np.asarray(y) / scale
+
+    def _cell(self, x, y):
+        """Grid cell of each point, clamped into the grid
+
+        A query outside the grid searches from the nearest edge cell, which
+        still covers every cell within its reach.
+        """
+        cx = np.floor((x - self.origin[0]) / self.cell_km)
+        cy = np.floor((y - self.origin[1]) / self.cell_km)
+        return (np.clip(np.nan_to_num(cx), 0, self.shape[0] - 1).astype(np.int64),
+                np.clip(np.nan_to_num(cy), 0, self.shape[1] - 1).astype(np.int64))
+
+    def _queries(self, lon, lat):
+        x, y = self.project(np.asarray(lon, dtype='float64'), np.asarray(lat, dtype='float64'))
+        valid = np.isfinite(x) & np.isfinite(y)
+        cx, cy = self._cell(x, y)
+        return x, y, cx, cy, np.flatnonzero(valid)
+
+    def _neighbours(self, x, y, cx, cy, queries, offsets):
+        """Every (query, cell) at the (dx, dy) offsets, with the cell's nearest and farthest distance
+
+        Offsets falling outside the grid are dropped. Pairs come out grouped
+        by query, in the order of queries.
+        """
+        dx, dy = np.asarray(offsets, dtype=np.int64).reshape(-1, 2).T
+        q = np.repeat(queries, len(dx))
+        nx, ny = cx[q] + np.tile(dx, len(queries)), cy[q] + np.tile(dy, len(queries))
+        inside = (nx >= 0) & (nx < self.shape[0]) & (ny >= 0) & (ny < self.shape[1])
+        q, nx, ny = q[inside], nx[inside], ny[inside]
+        # Per axis: gap to the cell's near edge (0 inside it) and to its far edge
+        left = self.origin[0] + nx * self.cell_km - x[q]
+        bottom = self.origin[1] + ny * self.cell_km - y[q]
+        right, top = left + self.cell_km, bottom + self.cell_km
+        near = np.hypot(np.maximum(np.maximum(left, -right), 0),
+                        np.maximum(np.maximum(bottom, -top), 0))
+        far = np.hypot(np.maximum(np.abs(left), np.abs(right)),
+                       np.maximum(np.abs(bottom), np.abs(top)))
+        return q, nx * self.shape[1] + ny, near, far
+
+    def _points(self, queries, cells):
+        """(query, point) pairs for every point in cells[i], paired with queries[i]"""
+        start, counts = self.starts[cells], self.starts[cells + 1] - self.starts[cells]
+        first = np.cumsum(counts) - counts
+        points = np.repeat(start - first, counts) + np.arange(counts.sum())
+        return np.repeat(queries, counts), points
+
+    def _distances(self, x, y, queries, points):
+        return np.hypot(self.x[points] - x[queries], self.y[points] - y[queries])
+
+    def _reach(self, radius_km):
+        reach = range(-int(np.ceil(radius_km / self.cell_km)),
+                      int(np.ceil(radius_km / self.cell_km)) + 1)
+        return [(dx, dy) for dx in reach for dy in reach]
+
+    def _chunks(self, queries, offsets):
+        # Bounds the (query, cell) arrays to about _PAIRS_PER_CHUNK entries
+        step = max(1, _PAIRS_PER_CHUNK // len(offsets))
+        for start in range(0, len(queries), step):
+            yield queries[start:start + step]
+
+    def query_radius(self, lon, lat, radius_km):
+        """Every (query, row, distance_km) with the point within radius_km, grouped by query"""
+        x, y, cx, cy, queries = self._queries(lon, lat)
+        offsets = self._reach(radius_km)
+        found = []
+        for chunk in self._chunks(queries, offsets):
+            q, cells, near, _ = self._neighbours(x, y, cx, cy, chunk, offsets)
+            keep = near <= radius_km
+            q, p = self._points(q[keep], cells[keep])
+            distance = self._distances(x, y, q, p)
+            within = distance <= radius_km
+            found.append((q[within], self.rows[p[within]], distance[within]))
+        if not found:
+            return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+        return tuple(np.concatenate(parts) for parts in zip(*found))
+
+    def count_within(self, lon, lat, radius_km):
+        """Number of points within radius_km of each query
+
+        Cells entirely inside the radius are counted whole; only points in
+        cells the circle cuts through are measured.
+        """
+        x, y, cx, cy, queries = self._queries(lon, lat)
+        offsets = self._reach(radius_km)
+        counts = np.zeros(np.size(x), dtype=np.int64)
+        for chunk in self._chunks(queries, offsets):
+            q, cells, near, far = self._neighbours(x, y, cx, cy, chunk, offsets)
+            whole = far <= radius_km
+            counts += np.bincount(q[whole], weights=self.starts[cells[whole] + 1]
+                                  - self.starts[cells[whole]], minlength=len(counts)).astype(np.int64)
+            cut = ~whole & (near <= radius_km)
+            q, p = self._points(q[cut], cells[cut])
+            counts += np.bincount(q[self._distances(x, y, q, p) <= radius_km],
+                                  minlength=len(counts))
+        return counts
+
+    def nearest(self, lon, lat):
+        """(row, distance_km) of the closest point to each query; -1 and NaN when none
+
+        Searches rings of cells outward from each query's cell until the
+        closest point found is nearer than any cell not searched yet.
+        """
+        x, y, cx, cy, pending = self._queries(lon, lat)
+        best_point = np.full(np.size(x), -1, dtype=np.int64)
+        best = np.full(np.size(x), np.inf)
+        if not len(self):
+            return best_point, np.full(np.size(x), np.nan)
+        for ring in range(max(self.shape)):
+            offsets = [(dx, dy) for dx in range(-ring, ring + 1) for dy in range(-ring, ring + 1)
+                       if max(abs(dx), abs(dy)) == ring]
+            for chunk in self._chunks(pending, offsets):
+                q, cells, near, _ = self._neighbours(x, y, cx, cy, chunk, offsets)
+                keep = near < best[q]
+                q, p = self._points(q[keep], cells[keep])
+                if not len(q):
+                    continue
+                distance = self._distances(x, y, q, p)
+                # Closest candidate per query (q is grouped)
+                starts = np.flatnonzero(np.r_[True, q[1:] != q[:-1]])
+                closest = np.minimum.reduceat(distance, starts)
+                group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(q)]))
+                hits = np.flatnonzero(distance == closest[group])
+                hits = hits[np.r_[True, group[hits[1:]] != group[hits[:-1]]]]
+                q, p, distance = q[hits], p[hits], distance[hits]
+                closer = distance < best[q]
+                best[q[closer]] = distance[closer]
+                best_point[q[closer]] = p[closer]
+            # Cells ring + 1 or more away are at least ring cell widths off
+            pending = pending[best[pending] > ring * self.cell_km]
+            if not len(pending):
+                break
+        found = best_point >= 0
+        best_point[found] = self.rows[best_point[found]]
+        valid = np.isfinite(x) & np.isfinite(y)
+        return best_point, np.where(valid, best, np.nan)
+
+    def hex_bins(self, size_km, weights=None):
+        """Point counts per hexagon of circumradius size_km: (vertices, counts)
+
+        vertices is an (n, 6, 2) lon/lat array of the non-empty hexagons,
+        ready for a matplotlib PolyCollection; counts sums weights (1 per
+        point by default).
+        """
+        # Pointy-top axial coordinates, rounded through cube coordinates
+        q = (np.sqrt(3) / 3 * self.x - self.y / 3) / size_km
+        r = (2 / 3 * self.y) / size_km
+        s = -q - r
+        rq, rr, rs = np.round(q), np.round(r), np.round(s)
+        dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+        fix_q = (dq > dr) & (dq > ds)
+        fix_r = ~fix_q & (dr > ds)
+        rq = np.where(fix_q, -rr - rs, rq)
+        rr = np.where(fix_r, -rq - rs, rr)
+
+        cells, inverse = np.unique(np.stack([rq, rr], axis=1), axis=0, return_inverse=True)
+        weights = None if weights is None else np.asarray(weights, dtype='float64')[self.rows]
+        counts = np.bincount(inverse.ravel(), weights=weights, minlength=len(cells))
+        centre_x = size_km * np.sqrt(3) * (cells[:, 0] + cells[:, 1] / 2)
+        centre_y = size_km * 1.5 * cells[:, 1]
+        angles = np.deg2rad(30 + 60 * np.arange(6))
+        lon, lat = self.unproject(centre_x[:, None] + size_km * np.cos(angles),
+                                  centre_y[:, None] + size_km * np.sin(angles))
+        return np.stack([lon, lat], axis=-1), counts
+
+
+def brute_force_within(index, lon, lat, radius_km):
+    """count_within() by measuring every query-point pair; for checking the index"""
+    x, y = index.project(np.asarray(lon, dtype='float64'), np.asarray(lat, dtype='float64'))
+    distance = np.hypot(x[:, None] - index.x[None, :], y[:, None] - index.y[None, :])
+    return (distance <= radius_km).sum(axis=1)
+
+
+def brute_force_nearest(index, lon, lat):
+    """nearest() by measuring every query-point pair; for checking the index"""
+    x, y = index.project(np.asarray(lon, dtype='float64'), np.asarray(lat, dtype='float64'))
+    distance = np.hypot(x[:, None] - index.x[None, :], y[:, None] - index.y[None, :])
+    closest = distance.argmin(axis=1)
+    return index.rows[closest], distance[np.arange(len(x)), closest]
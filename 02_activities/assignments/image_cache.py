@@ -0,0 +1,338 @@
+# Cached image fetching for figure overlays
+#
+# Downloaded images are kept on disk, keyed by URL, together with their
+# ETag/Last-Modified validators. Later runs revalidate with a conditional
+# GET (a 304 costs no body) or, within max_age, skip the network entirely.
+# Decoded RGBA arrays, already shrunk to the pixel size of the axes they are
+# drawn into, are kept in a bounded in-memory LRU together with the
+# power-of-two pyramid levels they were cut from. inset_image() draws an
+# image into a small inset and picks the level matching each render's dpi.
+
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from matplotlib.image import AxesImage
+
+from startup import lazy_import
+
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(HERE, '.image_cache')
+
+# Some hosts (Wikimedia among them) reject requests without a user agent
+USER_AGENT = 'visualization-course/1.0 (image overlay cache)'
+
+# Rows of a decoded image converted to RGBA at once while a pyramid level is reduced
+_BAND_ROWS = 256
+
+
+def _open_session(pool_size):
+    """A requests.Session with a connection pool, or None to fall back to urllib"""
+    if importlib.util.find_spec('requests') is None:
+        return None
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _http_get(session, url, headers, timeout):
+    """GET url; returns (status, response headers, body), status is 200 or 304"""
+    if session is not None:
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response.status_code, response.headers, response.content
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304:
+            return 304, exc.headers, b''
+        raise
+
+
+def axes_pixel_size(ax, dpi=None):
+    """(width, height) in pixels that ax covers when the figure is drawn at dpi"""
+    fig = ax.get_figure()
+    box = ax.get_position()
+    width, height = fig.get_size_inches()
+    dpi = dpi or fig.dpi
+    return (max(1, int(np.ceil(box.width * width * dpi))),
+            max(1, int(np.ceil(box.height * height * dpi))))
+
+
+class ImageCache:
+    """Disk cache of downloaded images plus an LRU of decoded, downscaled arrays
+
+    max_age is how many seconds a download is trusted before it is
+    revalidated; when the server cannot be reached a cached copy is used
+    however old it is. Safe to share between threads.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_memory_bytes=256_000_000,
+                 max_age=3600, workers=8, timeout=30):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_age = max_age
+        self.workers = workers
+        self.timeout = timeout
+        self.session = _open_session(workers)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._arrays = OrderedDict()
+        self._array_bytes = 0
+        self.downloads = 0
+        self.revalidated = 0
+        self.fresh = 0
+        self.stale = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + '.body', base + '.json'
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, data, mode='wb'):
+        # Unique temp name, so threads fetching the same URL do not collide
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def fetch(self, url):
+        """Path of an up-to-date local copy of url, downloading only when needed
+
+        Returns (path, meta), where meta holds the validators and the time
+        the body was last downloaded.
+        """
+        body_path, meta_path = self._paths(url)
+        meta = self._read_meta(meta_path)
+        if meta is not None and not os.path.exists(body_path):
+            meta = None
+        if meta is not None and time.time() - meta['checked'] < self.max_age:
+            self._count('fresh')
+            return body_path, meta
+
+        headers = {'User-Agent': USER_AGENT}
+        if meta is not None and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta is not None and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        try:
+            status, response_headers, body = _http_get(self.session, url, headers, self.timeout)
+        except OSError:
+            # Offline or server error: a cached copy beats no image at all
+            if meta is None:
+                raise
+            self._count('stale')
+            return body_path, meta
+
+        now = time.time()
+        if status == 304:
+            meta['checked'] = now
+            self._count('revalidated')
+        else:
+            self._write(body_path, body)
+            meta = {'url': url, 'etag': response_headers.get('ETag'),
+                    'last_modified': response_headers.get('Last-Modified'),
+                    'size': len(body), 'downloaded': now, 'checked': now}
+            self._count('downloads')
+        self._write(meta_path, json.dumps(meta), mode='w')
+        return body_path, meta
+
+    def prefetch(self, urls):
+        """Fetch several URLs concurrently over the pooled session"""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return [path for path, _ in pool.map(self.fetch, urls)]
+
+    def get_image(self, source):
+        """The image at a URL (read from the disk cache) or file, as a PIL Image"""
+        path, _ = self._resolve(source)
+        return Image.open(path)
+
+    def _resolve(self, source):
+        """(local path, version) of a URL or local file; version changes with the bytes"""
+        if source.startswith(('http://', 'https://')):
+            path, meta = self.fetch(source)
+            return path, meta['downloaded']
+        return source, os.stat(source).st_mtime_ns
+
+    def image_size(self, source):
+        """(width, height) of the full-resolution image, read from its header"""
+        path, _ = self._resolve(source)
+        with Image.open(path) as image:
+            return image.size
+
+    def _remember(self, key, array):
+        array.flags.writeable = False
+        with self._lock:
+            if key not in self._arrays:
+                self._arrays[key] = array
+                self._array_bytes += array.nbytes
+                self._evict()
+            return self._arrays[key]
+
+    def _lookup(self, key):
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is not None:
+                self._arrays.move_to_end(key)
+            return array
+
+    def _pyramid_level(self, path, version, level):
+        """RGBA array of the image shrunk by 2**level, from the cache when possible
+
+        A finer level already in memory is box-reduced. Otherwise the file
+        is decoded with draft(), which only JPEG honours (it decodes at 1/2,
+        1/4 or 1/8 scale directly). Other formats such as PNG are decoded at
+        full size in the file's own mode, 1 to 4 bytes per pixel. That
+        decode is then converted to RGBA and reduced _BAND_ROWS rows at a
+        time, so a full-size RGBA copy is never held.
+        """
+        key = (path, version, 'level', level)
+        array = self._lookup(key)
+        if array is not None:
+            return array
+
+        for finer_level in range(level - 1, -1, -1):
+            finer = self._lookup((path, version, 'level', finer_level))
+            if finer is not None:
+                factor = 2 ** (level - finer_level)
+                image = Image.fromarray(finer).reduce(factor)
+                break
+        else:
+            with Image.open(path) as source:
+                full_width = source.width
+                source.draft('RGB', (source.width // 2 ** level, source.height // 2 ** level))
+                factor = max(1, 2 ** level * source.width // full_width)
+                image = _reduced_rgba(source, factor)
+        return self._remember(key, np.asarray(image))
+
+    def get_array(self, source, size=None):
+        """RGBA uint8 array of an image URL or file, shrunk to fit size=(width, height)
+
+        Pass axes_pixel_size(ax, dpi) as size to decode no more pixels than
+        the axes can show. The aspect ratio is kept and images are never
+        enlarged. Each size is cut from a power-of-two pyramid level, so
+        renders at other dpis reuse the decode. Arrays are shared between
+        callers, so they are read-only.
+        """
+        path, version = self._resolve(source)
+        if not size:
+            return self._pyramid_level(path, version, 0)
+        key = (path, version, tuple(size))
+        array = self._lookup(key)
+        if array is not None:
+            with self._lock:
+                self.hits += 1
+            return array
+        with self._lock:
+            self.misses += 1
+
+        width, height = self.image_size(path)
+        scale = min(1.0, size[0] / width, size[1] / height)
+        level = int(np.floor(np.log2(1 / scale)))
+        image = Image.fromarray(self._pyramid_level(path, version, level))
+        image.thumbnail((max(1, round(width * scale)), max(1, round(height * scale))),
+                        Image.Resampling.LANCZOS)
+        return self._remember(key, np.asarray(image))
+
+    def _evict(self):
+        while self._array_bytes > self.max_memory_bytes and len(self._arrays) > 1:
+            _, array = self._arrays.popitem(last=False)
+            self._array_bytes -= array.nbytes
+
+    def stats(self):
+        return {'downloads': self.downloads, 'revalidated': self.revalidated,
+                'fresh': self.fresh, 'stale': self.stale, 'hits': self.hits,
+                'misses': self.misses, 'arrays': len(self._arrays),
+                'array_bytes': self._array_bytes}
+
+
+def _reduced_rgba(image, factor):
+    """image converted to RGBA and box-reduced by factor, a band of rows at a time"""
+    if factor == 1:
+        return image.convert('RGBA')
+    band = max(1, _BAND_ROWS // factor) * factor
+    reduced = Image.new('RGBA', (-(-image.width // factor), -(-image.height // factor)))
+    for top in range(0, image.height, band):
+        rows = image.crop((0, top, image.width, min(top + band, image.height)))
+        reduced.paste(rows.convert('RGBA').reduce(factor), (0, top // factor))
+    return reduced
+
+
+class PyramidImage(AxesImage):
+    """AxesImage that draws the pyramid level matching each render's pixel size
+
+    The extent stays that of the full-resolution image, so limits, aspect
+    and any annotations placed in image pixels are unaffected by which
+    level is shown.
+    """
+
+    def __init__(self, ax, cache, source, **kwargs):
+        super().__init__(ax, **kwargs)
+        self.cache = cache
+        self.source = source
+        self._size = None
+
+    def draw(self, renderer):
+        box = self.axes.get_window_extent(renderer)
+        size = (max(1, int(np.ceil(box.width))), max(1, int(np.ceil(box.height))))
+        if size != self._size:
+            self._size = size
+            self.set_data(self.cache.get_array(self.source, size))
+        super().draw(renderer)
+
+
+def inset_image(fig, rect, source, cache=None, **kwargs):
+    """Add an inset axes at rect (figure fraction) showing an image URL or file
+
+    Only as many pixels as the inset covers at the drawing dpi are decoded
+    and kept; saving the figure at another dpi picks another level. Extra
+    keyword arguments go to the image artist (interpolation, alpha, ...).
+    Returns (inset axes, PyramidImage).
+    """
+    cache = cache or ImageCache()
+    ax = fig.add_axes(rect)
+    width, height = cache.image_size(source)
+    extent = (-0.5, width - 0.5, height - 0.5, -0.5)
+    image = PyramidImage(ax, cache, source, extent=extent, **kwargs)
+    ax.add_image(image)
+    ax.set_xlim(extent[:2])
+    ax.set_ylim(extent[2:])
+    ax.set_aspect('equal')
+    ax.axis('off')
+    # Size the first level for the box left once the aspect is applied
+    ax.apply_aspect()
+    image._size = axes_pixel_size(ax)
+    image.set_data(cache.get_array(source, image._size))
+    return ax, image
@@ -0,0 +1,234 @@
+# Reusing solved layouts across renders
+#
+# tight_layout(), constrained layout and savefig(bbox_inches='tight') all
+# measure every label on the figure and solve for axes positions again on
+# each render, even when the figure has the same grid, the same labels and
+# the same fonts as the last one. A save with a layout engine or a tight
+# bbox also costs a full extra (dry) draw. LayoutCache keys the solved
+# positions and tight bbox on what the solve depends on (figure size and
+# dpi, the grid each axes sits in, tick parameters, and how far tick
+# labels, titles, legends and other unclipped artists stick out of each
+# axes), so a hit skips both the solve and the dry draw, while a label or
+# font change that moves a margin is a miss.
+
+import os
+import threading
+from collections import OrderedDict
+
+from render_profile import phase
+from startup import lazy_import
+
+mpl = lazy_import('matplotlib')
+maxes = lazy_import('matplotlib.axes')
+maxis = lazy_import('matplotlib.axis')
+layout_engine = lazy_import('matplotlib.layout_engine')
+spines = lazy_import('matplotlib.spines')
+
+# savefig formats drawn by Agg, whose text metrics the key is measured with
+_RASTER_FORMATS = {'png', 'jpg', 'jpeg', 'webp', 'tif', 'tiff', 'raw', 'rgba'}
+
+_SUBPLOT_PARAMS = ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+
+
+def _extent(artist, renderer):
+    return tuple(round(value, 2) for value in artist.get_window_extent(renderer).bounds)
+
+
+def _overhang_extents(ax, renderer):
+    """Extents of everything around ax a layout solve measures"""
+    for child in ax.get_children():
+        if child is ax.patch or not child.get_visible():
+            continue
+        if isinstance(child, maxis.Axis):
+            # Ticks, in-view tick labels, axis label and offset text
+            yield child.get_tightbbox(renderer)
+        elif isinstance(child, (spines.Spine, maxes.Axes)):
+            yield child.get_window_extent(renderer)
+        elif child.get_in_layout() and not child.get_clip_on():
+            # Titles, texts, legends and anything else allowed to spill out
+            yield child.get_window_extent(renderer)
+
+
+def _grid_spacing(gridspec):
+    if gridspec is None:
+        return None
+    # Nested grids (e.g. the one a colorbar splits off) keep theirs private
+    return tuple(getattr(gridspec, name, getattr(gridspec, '_' + name, None))
+                 for name in ('wspace', 'hspace'))
+
+
+def _axes_key(ax, renderer):
+    """Grid slot, tick parameters and how far ax's decorations stick out of it
+
+    The solvers only use the overhang, so new data or label text that
+    leaves it unchanged (the same margins) keeps the same key.
+    """
+    spec = ax.get_subplotspec()
+    gridspec = spec.get_gridspec() if spec is not None else None
+    key = [repr(spec), ax.get_visible(), ax.get_in_layout(),
+           _grid_spacing(gridspec),
+           ax.get_position(original=True).bounds if spec is None else None]
+    for axis in (ax.xaxis, ax.yaxis):
+        key.append((axis.get_tick_params(which='major'), axis.get_tick_params(which='minor'),
+                    axis.get_label_position(), axis.get_ticks_position()))
+    box = ax.get_window_extent(renderer)
+    x0, y0, x1, y1 = box.x0, box.y0, box.x1, box.y1
+    for extent in _overhang_extents(ax, renderer):
+        if extent is not None and (extent.width or extent.height):
+            x0, y0 = min(x0, extent.x0), min(y0, extent.y0)
+            x1, y1 = max(x1, extent.x1), max(y1, extent.y1)
+    key.append(tuple(round(float(value), 2) for value in
+                     (box.x0 - x0, box.y0 - y0, x1 - box.x1, y1 - box.y1)))
+    return key
+
+
+def layout_key(fig, renderer):
+    """Hashable summary of everything a layout solve of fig measures"""
+    key = [tuple(fig.get_size_inches()), fig.dpi]
+    for ax in fig.axes:
+        key.append(tuple(_axes_key(ax, renderer)))
+    for artist in fig.texts + fig.legends:
+        if artist.get_visible() and artist.get_in_layout():
+            key.append((type(artist).__name__, _extent(artist, renderer)))
+    return repr(key)
+
+
+def _snapshot(fig):
+    """What a layout solve changes: axes and figure text positions, subplot params"""
+    return {
+        'axes': [(ax.get_position(original=True).frozen(), ax.get_position().frozen())
+                 for ax in fig.axes],
+        'texts': [text.get_position() for text in fig.texts],
+        'subplotpars': {name: getattr(fig.subplotpars, name) for name in _SUBPLOT_PARAMS},
+    }
+
+
+def _restore(fig, snapshot):
+    fig.subplotpars.update(**snapshot['subplotpars'])
+    for ax, (original, active) in zip(fig.axes, snapshot['axes']):
+        # set_position() takes the axes out of the layout; keep its flag
+        in_layout = ax.get_in_layout()
+        ax.set_position(original, which='original')
+        ax.set_position(active, which='active')
+        ax.set_in_layout(in_layout)
+    for text, position in zip(fig.texts, snapshot['texts']):
+        text.set_position(position)
+
+
+class LayoutCache:
+    """Solved layouts and tight bounding boxes, reused while the labels stay the same
+
+    Use cache.tight_layout(fig) for fig.tight_layout() and
+    cache.savefig(fig, fname, ...) for fig.savefig(fname, ...). Output is
+    identical to the uncached calls. Entries are kept in an LRU of
+    max_entries layouts. Safe to share between threads.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def tight_layout(self, fig, **kwargs):
+        """fig.tight_layout(**kwargs), reusing the result for an identical layout"""
+        with phase('layout'):
+            self._tight_layout(fig, **kwargs)
+
+    def _tight_layout(self, fig, **kwargs):
+        engine = fig.get_layout_engine()
+        if engine is not None and not engine.adjust_compatible:
+            fig.tight_layout(**kwargs)
+            return
+        # The renderer tight_layout() itself measures with
+        key = ('tight_layout', repr(sorted(kwargs.items())), layout_key(fig, fig._get_renderer()))
+        entry = self._get(key)
+        if entry is None:
+            fig.tight_layout(**kwargs)
+            self._put(key, _snapshot(fig))
+        else:
+            fig.subplots_adjust(**entry['subplotpars'])
+
+    def savefig(self, fig, fname, *, dpi=None, bbox_inches=None, pad_inches=None,
+                bbox_extra_artists=None, **kwargs):
+        """fig.savefig(), reusing the layout solve and tight bbox of an identical figure
+
+        Only raster formats go through the cache; other formats and
+        bbox_extra_artists are passed straight to fig.savefig().
+        """
+        if bbox_inches is None:
+            bbox_inches = mpl.rcParams['savefig.bbox']
+        fmt = kwargs.get('format') or (os.path.splitext(os.fspath(fname))[1][1:]
+                                       if isinstance(fname, (str, os.PathLike)) else None)
+        fmt = (fmt or mpl.rcParams['savefig.format']).lower()
+        engine = fig.get_layout_engine()
+        if (fmt not in _RASTER_FORMATS or bbox_extra_artists is not None
+                or (engine is None and bbox_inches != 'tight')):
+            fig.savefig(fname, dpi=dpi, bbox_inches=bbox_inches, pad_inches=pad_inches,
+                        bbox_extra_artists=bbox_extra_artists, **kwargs)
+            return
+        if dpi is None:
+            dpi = mpl.rcParams['savefig.dpi']
+        if dpi == 'figure':
+            dpi = getattr(fig, '_original_dpi', fig.dpi)
+
+        original_dpi = fig.dpi
+        fig.set_dpi(dpi)
+        try:
+            renderer = fig._get_renderer()
+            key = ('savefig', type(engine).__name__, repr(engine.get()) if engine else None,
+                   bbox_inches == 'tight', pad_inches, layout_key(fig, renderer))
+            entry = self._get(key)
+            if entry is None:
+                # The dry draw savefig() would do: solves the layout, then measures
+                fig.draw_without_rendering()
+                entry = _snapshot(fig)
+                entry['bbox'] = (_padded_tight_bbox(fig, renderer, engine, pad_inches)
+                                 if bbox_inches == 'tight' else bbox_inches)
+                self._put(key, entry)
+            else:
+                _restore(fig, entry)
+        finally:
+            fig.set_dpi(original_dpi)
+
+        # The layout is in place, so savefig() must not solve it (or dry-draw) again
+        if engine is not None:
+            fig.set_layout_engine(None)
+        try:
+            fig.savefig(fname, dpi=dpi, bbox_inches=entry['bbox'], **kwargs)
+        finally:
+            if engine is not None:
+                fig.set_layout_engine(engine)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+def _padded_tight_bbox(fig, renderer, engine, pad_inches):
+    """The bbox savefig(bbox_inches='tight', pad_inches=...) crops to"""
+    bbox = fig.get_tightbbox(renderer)
+    if pad_inches == 'layout' and isinstance(engine, layout_engine.ConstrainedLayoutEngine):
+        h_pad, w_pad = engine.get()['h_pad'], engine.get()['w_pad']
+    else:
+        if pad_inches in (None, 'layout'):
+            pad_inches = mpl.rcParams['savefig.pad_inches']
+        h_pad = w_pad = pad_inches
+    return bbox.padded(w_pad, h_pad)
@@ -0,0 +1,536 @@
+# Plotting helpers shared by the course examples
+#
+# These wrap the plain matplotlib calls used in the slides so the same
+# figures still render quickly when the data grows to millions of rows.
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.artist import Artist
+from matplotlib.colors import to_rgba_array
+from matplotlib.image import AxesImage
+from matplotlib.lines import Line2D
+from matplotlib.text import Text
+from matplotlib.transforms import Bbox
+
+
+def _group_codes(groups, categories=None):
+    """Factorize the group labels once, returning (codes, categories)"""
+    if categories is not None:
+        categories = list(categories)
+        codes = pd.Categorical(groups, categories=categories).codes
+    elif isinstance(getattr(groups, 'dtype', None), pd.CategoricalDtype):
+        groups = pd.Categorical(groups)
+        codes, categories = groups.codes, list(groups.categories)
+    else:
+        codes, uniques = pd.factorize(np.asarray(groups))
+        categories = list(uniques)
+    return np.asarray(codes), categories
+
+
+def _group_palette(colors, categories):
+    """One RGBA row per category"""
+    if colors is None:
+        cycle = plt.rcParams['axes.prop_cycle'].by_key().get('color', ['C0'])
+        if len(categories) <= len(cycle):
+            colors = cycle[:len(categories)]
+        else:
+            colors = plt.get_cmap('hsv')(np.linspace(0, 1, len(categories), endpoint=False))
+    elif isinstance(colors, dict):
+        colors = [colors[category] for category in categories]
+    palette = to_rgba_array(colors)
+    if len(palette) < len(categories):
+        raise ValueError(f"need {len(categories)} colors, got {len(palette)}")
+    return palette
+
+
+def grouped_scatter(ax, x, y, groups, colors=None, categories=None, s=None,
+                    alpha=None, marker='o', **kwargs):
+    """Scatter every group in one PathCollection with a per-point color array
+
+    Replaces the `for group: ax.scatter(df[df[col] == group], ...)` pattern.
+    The group column is factorized once and points are stably sorted by
+    group, so groups are drawn in the same order (later ones on top) as the
+    loop would draw them. Returns (collection, legend_handles); pass the
+    handles to ax.legend(handles=...) for one legend entry per group.
+    """
+    codes, categories = _group_codes(groups, categories)
+    keep = codes >= 0
+    order = np.argsort(codes[keep], kind='stable')
+    index = np.flatnonzero(keep)[order]
+
+    x = np.asarray(x)[index]
+    y = np.asarray(y)[index]
+    if s is not None and np.ndim(s) > 0:
+        s = np.asarray(s)[index]
+
+    palette = _group_palette(colors, categories)
+    # alpha goes to the collection, which fades faces and edges alike, as the
+    # per-group ax.scatter(..., alpha=alpha) calls did
+    collection = ax.scatter(x, y, s=s, c=palette[codes[index]], marker=marker, alpha=alpha,
+                            **kwargs)
+
+    edgecolor = kwargs.get('edgecolors', kwargs.get('edgecolor', 'none'))
+    handles = [
+        Line2D([], [], linestyle='', marker=marker, markersize=8, alpha=alpha,
+               markerfacecolor=color, markeredgecolor=edgecolor, label=str(category))
+        for category, color in zip(categories, palette)
+    ]
+    return collection, handles
+
+
+def grouped_scatter_loop(ax, x, y, groups, colors=None, categories=None, s=None, **kwargs):
+    """Original per-group boolean-mask loop, kept as the benchmark reference"""
+    df = pd.DataFrame({'x': x, 'y': y, 'group': groups})
+    if s is not None:
+        df['s'] = s
+    if categories is None:
+        categories = pd.unique(df['group'])
+    palette = _group_palette(colors, list(categories))
+    for category, color in zip(categories, palette):
+        group_data = df[df['group'] == category]
+        ax.scatter(group_data['x'], group_data['y'],
+                   s=group_data['s'] if s is not None else None,
+                   c=[color], label=category, **kwargs)
+
+
+# Above this many points adaptive_scatter draws a binned raster instead of
+# one vector marker per point.
+AGGREGATE_THRESHOLD = 100_000
+
+
+def _raster_shape(ax, dpi=None, max_side=4096):
+    """Output pixel size (height, width) of ax when saved at dpi"""
+    fig = ax.figure
+    if dpi is None:
+        dpi = plt.rcParams['savefig.dpi']
+        dpi = fig.dpi if dpi == 'figure' else dpi
+    width, height = fig.get_size_inches() * ax.get_position().size * dpi
+    return (int(np.clip(round(height), 1, max_side)), int(np.clip(round(width), 1, max_side)))
+
+
+def _bin_edges(low, high, n_bins, scale):
+    """Bin edges spanning [low, high], spaced evenly in the axis scale"""
+    if scale == 'log':
+        low, high = np.log10(low), np.log10(high)
+    if high <= low:
+        high = low + 1
+    edges = np.linspace(low, high, n_bins + 1)
+    return (10 ** edges if scale == 'log' else edges), low, high
+
+
+def _bin_index(values, low, high, n_bins, scale):
+    if scale == 'log':
+        values = np.log10(values)
+    index = ((values - low) * (n_bins / (high - low))).astype(np.intp)
+    return np.clip(index, 0, n_bins - 1, out=index)
+
+
+# Points binned per pass of aggregate_raster; bounds its temporary arrays
+AGGREGATE_CHUNK = 1 << 20
+
+
+def _drawable_chunks(x, y, codes, xscale, yscale, weights=None, chunk=AGGREGATE_CHUNK):
+    """Yield (x, y, codes, weights) slices holding only the points that can be drawn"""
+    x, y = np.asarray(x), np.asarray(y)
+    for start in range(0, len(x), chunk):
+        xs = np.asarray(x[start:start + chunk], dtype=float)
+        ys = np.asarray(y[start:start + chunk], dtype=float)
+        cs = None if codes is None else np.asarray(codes[start:start + chunk])
+        ws = None if weights is None else np.asarray(weights[start:start + chunk], dtype=float)
+        keep = np.isfinite(xs) & np.isfinite(ys)
+        if xscale == 'log':
+            keep &= xs > 0
+        if yscale == 'log':
+            keep &= ys > 0
+        if cs is not None:
+            keep &= cs >= 0
+        if ws is not None:
+            keep &= np.isfinite(ws)
+        if not keep.all():
+            xs, ys = xs[keep], ys[keep]
+            cs = None if cs is None else cs[keep]
+            ws = None if ws is None else ws[keep]
+        if len(xs):
+            yield xs, ys, cs, ws
+
+
+def aggregate_raster(x, y, shape, codes=None, palette=None, xscale='linear', yscale='linear',
+                     min_alpha=0.25, weights=None):
+    """Bin points into an RGBA raster of the given (height, width)
+
+    Without codes, every non-empty pixel gets the first palette color with an
+    opacity proportional to log point density. With per-point category codes,
+    each pixel is colored by the count-weighted mean of its categories'
+    colors. Per-point weights (e.g. marker areas) count a point weights[i]
+    times instead of once. The points are read AGGREGATE_CHUNK at a time
+    (two passes), so memory is O(height * width) however many points there
+    are, and x/y may be memory-mapped. Returns (rgba, x_edges, y_edges).
+    """
+    height, width = shape
+    rgba = np.zeros((height, width, 4))
+
+    # Pass 1: the range of the drawable points
+    x_low = y_low = np.inf
+    x_high = y_high = -np.inf
+    for xs, ys, _, _ in _drawable_chunks(x, y, codes, xscale, yscale, weights):
+        x_low, x_high = min(x_low, xs.min()), max(x_high, xs.max())
+        y_low, y_high = min(y_low, ys.min()), max(y_high, ys.max())
+    if x_low > x_high:
+        return rgba, np.linspace(0, 1, width + 1), np.linspace(0, 1, height + 1)
+    x_edges, x_low, x_high = _bin_edges(x_low, x_high, width, xscale)
+    y_edges, y_low, y_high = _bin_edges(y_low, y_high, height, yscale)
+
+    # Pass 2: per-pixel counts and per-channel color sums
+    if palette is None:
+        palette = to_rgba_array(['C0'])
+    n_pixels = height * width
+    counts = np.zeros(n_pixels)
+    summed = np.zeros((3, n_pixels))
+    for xs, ys, cs, ws in _drawable_chunks(x, y, codes, xscale, yscale, weights):
+        pixel = (_bin_index(ys, y_low, y_high, height, yscale) * width
+                 + _bin_index(xs, x_low, x_high, width, xscale))
+        counts += np.bincount(pixel, weights=ws, minlength=n_pixels)
+        if cs is not None:
+            for channel in range(3):
+                channel_weights = palette[cs, channel] if ws is None else palette[cs, channel] * ws
+                summed[channel] += np.bincount(pixel, weights=channel_weights,
+                                               minlength=n_pixels)
+
+    filled = counts > 0
+    if codes is None:
+        rgba[..., :3] = palette[0, :3]
+    else:
+        for channel in range(3):
+            rgba[..., channel].flat[filled] = summed[channel, filled] / counts[filled]
+
+    density = np.log1p(counts) / np.log1p(counts.max()) if counts.max() > 0 else counts
+    alpha = np.where(filled, min_alpha + (1 - min_alpha) * density, 0)
+    rgba[..., 3] = alpha.reshape(height, width)
+    return rgba, x_edges, y_edges
+
+
+# Keywords that only style marker outlines, which the aggregate raster has none of
+_OUTLINE_KEYWORDS = {'edgecolors', 'edgecolor', 'linewidths', 'linewidth', 'lw'}
+
+
+def adaptive_scatter(ax, x, y, groups=None, colors=None, categories=None, s=None,
+                     max_points=AGGREGATE_THRESHOLD, dpi=None, **kwargs):
+    """Scatter plot that switches to a binned raster above max_points
+
+    Small inputs are drawn exactly like grouped_scatter (or a plain
+    ax.scatter when groups is None). Larger inputs are binned into a density
+    or category-count raster sized to the axes at the output dpi, in log
+    space for log-scaled axes, so render time and file size depend on output
+    pixels rather than on the number of points. In the raster, array s
+    weights each point's share of the density and alpha scales the
+    opacity; marker outline keywords (edgecolors, linewidths) only apply to
+    the markers and are dropped, and any other keyword raises TypeError.
+    Set the axis scales before calling. Returns (artist, legend_handles).
+    """
+    if len(x) <= max_points:
+        if groups is not None:
+            return grouped_scatter(ax, x, y, groups, colors=colors, categories=categories,
+                                   s=s, **kwargs)
+        return ax.scatter(x, y, s=s, c=colors, **kwargs), []
+
+    alpha = kwargs.pop('alpha', None)
+    unsupported = set(kwargs) - _OUTLINE_KEYWORDS
+    if unsupported:
+        raise TypeError(f"aggregate mode does not support {', '.join(sorted(unsupported))}")
+    shape = _raster_shape(ax, dpi)
+    xscale, yscale = ax.get_xscale(), ax.get_yscale()
+    if not {xscale, yscale} <= {'linear', 'log'}:
+        raise ValueError(f"aggregate mode supports linear and log axes, not {xscale}/{yscale}")
+    handles = []
+    codes = palette = None
+    if groups is not None:
+        codes, categories = _group_codes(groups, categories)
+        palette = _group_palette(colors, categories)
+        handles = [
+            Line2D([], [], linestyle='', marker='o', markersize=8, alpha=alpha,
+                   markerfacecolor=color, markeredgecolor='none', label=str(category))
+            for category, color in zip(categories, palette)
+        ]
+    elif colors is not None:
+        palette = to_rgba_array(colors)
+    weights = s if s is not None and np.ndim(s) > 0 else None
+    rgba, x_edges, y_edges = aggregate_raster(x, y, shape, codes, palette, xscale, yscale,
+                                              weights=weights)
+    if alpha is not None:
+        rgba[..., 3] *= alpha
+
+    # The bins are uniform in scaled (e.g. log10) space, so place the image
+    # there: transData without its scale step is still a cheap affine map.
+    extent = (*ax.xaxis.get_transform().transform(x_edges[[0, -1]]),
+              *ax.yaxis.get_transform().transform(y_edges[[0, -1]]))
+    image = AxesImage(ax, origin='lower', interpolation='nearest', extent=extent,
+                      transform=ax.transLimits + ax.transAxes)
+    image.set_data(rgba)
+    ax.add_image(image)
+    ax.update_datalim([(x_edges[0], y_edges[0]), (x_edges[-1], y_edges[-1])])
+    ax.autoscale_view()
+    return image, handles
+
+
+class BarLabels(Artist):
+    """Value labels for a whole bar chart in one artist
+
+    Positions and strings are kept as arrays. At draw time the labels are
+    placed in pixel space, labels on bars narrower than min_bar_px or
+    outside the view are dropped, and overlapping labels are thinned left
+    to right. Survivors are stamped with a single reusable Text, so they
+    look exactly like ax.text labels while only one artist takes part in
+    layout and tight bounding boxes.
+    """
+
+    zorder = 3
+
+    def __init__(self, ax, bars, fmt='%g', min_bar_px=4, padding_px=2, **text_kw):
+        super().__init__()
+        self.axes = ax
+        self.set_figure(ax.get_figure(root=False))
+        self.set_transform(ax.transData)
+        self.fmt = fmt
+        self.min_bar_px = min_bar_px
+        self.padding_px = padding_px
+        self._stamp = Text(0, 0, '', ha='center', va='bottom', **text_kw)
+        self._stamp.set_figure(self.get_figure(root=False))
+        self._stamp.set_transform(ax.transData)
+        self.set_bars(bars)
+
+    def set_bars(self, bars):
+        """Re-read positions and values from a BarContainer (after set_height etc.)"""
+        values = np.array([bar.get_height() for bar in bars], dtype=float)
+        self._x = np.array([bar.get_x() + bar.get_width() / 2 for bar in bars], dtype=float)
+        self._y = np.array([bar.get_y() for bar in bars], dtype=float) + values
+        self._widths = np.array([bar.get_width() for bar in bars], dtype=float)
+        self._below = values < 0
+        self._labels = np.char.mod(self.fmt, values) if len(values) else np.array([], dtype=str)
+        self._label_px = {}
+        self.stale = True
+
+    def _label_widths(self, renderer):
+        """Approximate pixel width of every label: the sum of its glyph advances"""
+        dpi = self.get_figure(root=True).dpi
+        if dpi not in self._label_px:
+            n, length = len(self._labels), self._labels.dtype.itemsize // 4
+            codes = self._labels.view(np.uint32).reshape(n, length) if n and length else \
+                np.zeros((n, 0), np.uint32)
+            uniques, inverse = np.unique(codes, return_inverse=True)
+            prop = self._stamp.get_fontproperties()
+            glyph_px = np.array([renderer.get_text_width_height_descent(chr(code), prop, False)[0]
+                                 if code else 0.0 for code in uniques.tolist()])
+            self._label_px[dpi] = glyph_px[inverse].reshape(codes.shape).sum(axis=1)
+        return self._label_px[dpi]
+
+    def visible_labels(self, renderer):
+        """Indices of the labels that survive culling, left to right"""
+        trans = self.get_transform()
+        centres = trans.transform(np.column_stack([self._x, self._y]))
+        edges = trans.transform(np.column_stack([self._x + self._widths / 2, self._y]))[:, 0]
+        bar_px = 2 * np.abs(edges - centres[:, 0])
+        view = self.axes.bbox
+        keep = (np.isfinite(centres).all(axis=1) & (bar_px >= self.min_bar_px)
+                & (centres[:, 0] >= view.x0) & (centres[:, 0] <= view.x1))
+        candidates = np.flatnonzero(keep)
+        order = candidates[np.argsort(centres[candidates, 0], kind='stable')]
+        half = self._label_widths(renderer)[order] / 2 + self.padding_px / 2
+        left, right = centres[order, 0] - half, centres[order, 0] + half
+        if (left[1:] >= right[:-1]).all():
+            return order
+
+        # Greedy thinning over the (already sorted) candidates
+        kept, last_right = [], -np.inf
+        for index, lo, hi in zip(order.tolist(), left.tolist(), right.tolist()):
+            if lo >= last_right:
+                kept.append(index)
+                last_right = hi
+        return np.array(kept, dtype=int)
+
+    def _stamped(self, renderer):
+        """Yield the stamp Text positioned for each visible label"""
+        stamp = self._stamp
+        for index in self.visible_labels(renderer).tolist():
+            stamp.set_position((self._x[index], self._y[index]))
+            stamp.set_verticalalignment('top' if self._below[index] else 'bottom')
+            stamp.set_text(self._labels[index])
+            yield stamp
+
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        renderer.open_group('bar_labels', self.get_gid())
+        for stamp in self._stamped(renderer):
+            stamp.draw(renderer)
+        renderer.close_group('bar_labels')
+        self.stale = False
+
+    def get_window_extent(self, renderer=None):
+        if renderer is None:
+            renderer = self.get_figure(root=True)._get_renderer()
+        boxes = [stamp.get_window_extent(renderer) for stamp in self._stamped(renderer)]
+        return Bbox.union(boxes) if boxes else Bbox.null()
+
+    def get_texts(self):
+        """The visible label strings, left to right (needs a drawn figure)"""
+        renderer = self.get_figure(root=True)._get_renderer()
+        return self._labels[self.visible_labels(renderer)].tolist()
+
+
+def label_bars(ax, bars, fmt='%g', min_bar_px=4, padding_px=2, **text_kw):
+    """Label every bar of ax.bar(...) with its value, formatted with printf-style fmt
+
+    Replaces the per-bar ax.text loop: the strings are formatted in one
+    vectorized call and the labels are drawn by a single BarLabels artist
+    that culls what would not be readable. text_kw (fontsize, fontweight,
+    color, ...) is passed to the label Text. Returns the BarLabels.
+    """
+    artist = BarLabels(ax, bars, fmt, min_bar_px, padding_px, **text_kw)
+    ax.add_artist(artist)
+    return artist
+
+
+def label_bars_loop(ax, bars, fmt='%g', **text_kw):
+    """One ax.text per bar, as in the slides (reference for benchmarks.py)"""
+    return [ax.text(bar.get_x() + bar.get_width() / 2., bar.get_height(), fmt % value,
+                    ha='center', va='bottom', **text_kw)
+            for bar, value in zip(bars, bars.datavalues)]
+
+
+# Samples per block in LODLine's precomputed min/max index
+LOD_BLOCK = 4096
+
+
+def _grouped_argextreme(values, group, argfunc):
+    """argfunc (np.argmin/np.argmax) over consecutive groups of group values
+
+    The last group may be shorter. Returns positions into values.
+    """
+    full = len(values) // group * group
+    positions = argfunc(values[:full].reshape(-1, group), axis=1) + np.arange(0, full, group)
+    if full < len(values):
+        positions = np.append(positions, full + argfunc(values[full:]))
+    return positions
+
+
+def minmax_indices(y, start, stop, n_bins, max_block=1 << 22):
+    """Indices of the min and max sample in each of n_bins bins of y[start:stop]
+
+    Every local extreme survives, so peaks are never lost. The indices are
+    sorted. y may be a np.memmap: it is read max_block samples at a time,
+    so memory stays bounded however long the series is.
+    """
+    if stop - start <= 2 * n_bins:
+        return np.arange(start, stop)
+    per_bin = -(-(stop - start) // n_bins)
+    step = max(1, max_block // per_bin) * per_bin
+    chunks = []
+    for block_start in range(start, stop, step):
+        values = np.asarray(y[block_start:min(block_start + step, stop)])
+        chunks.append(_grouped_argextreme(values, per_bin, np.argmin) + block_start)
+        chunks.append(_grouped_argextreme(values, per_bin, np.argmax) + block_start)
+    return np.unique(np.concatenate(chunks))
+
+
+class LODLine(Line2D):
+    """Line2D that draws a min/max envelope of a long series instead of every sample
+
+    At each draw the visible x range and the axes width in pixels decide
+    the bins (points_per_px points per horizontal pixel), so zooming,
+    panning and saving at another dpi recompute the envelope lazily. The
+    per-block extrema of y are computed once (one streaming pass), so views
+    spanning many blocks are decimated from those without touching y.
+    x must be sorted ascending, or None for the sample index; both x and y
+    may be memory-mapped.
+    """
+
+    def __init__(self, x, y, points_per_px=2, block=LOD_BLOCK, **kwargs):
+        super().__init__([], [], **kwargs)
+        self.full_x = x
+        self.full_y = y
+        self.points_per_px = points_per_px
+        self.block = block
+        self._view = None
+
+        # Per-block argmin/argmax (absolute indices) and their values
+        block_min, block_max = [], []
+        step = max(1, (1 << 22) // block) * block
+        for start in range(0, len(y), step):
+            values = np.asarray(y[start:start + step])
+            block_min.append(_grouped_argextreme(values, block, np.argmin) + start)
+            block_max.append(_grouped_argextreme(values, block, np.argmax) + start)
+        self._block_min = np.concatenate(block_min) if block_min else np.empty(0, int)
+        self._block_max = np.concatenate(block_max) if block_max else np.empty(0, int)
+        self._block_min_y = np.asarray(y[self._block_min], dtype=float)
+        self._block_max_y = np.asarray(y[self._block_max], dtype=float)
+
+    def data_limits(self):
+        """((x0, x1), (y0, y1)) of the whole series, or None if y has no finite value"""
+        n = len(self.full_y)
+        if not n or np.isnan(self._block_min_y).all():
+            return None
+        x0, x1 = (0, n - 1) if self.full_x is None else (self.full_x[0], self.full_x[n - 1])
+        return (x0, x1), (np.nanmin(self._block_min_y), np.nanmax(self._block_max_y))
+
+    def _index_range(self, low, high):
+        """[start, stop) of the samples in view, plus one neighbour each side"""
+        n = len(self.full_y)
+        if self.full_x is None:
+            start, stop = int(np.floor(low)), int(np.ceil(high)) + 1
+        else:
+            start = int(np.searchsorted(self.full_x, low, side='left'))
+            stop = int(np.searchsorted(self.full_x, high, side='right'))
+        return max(start - 1, 0), min(stop + 1, n)
+
+    def _envelope(self, start, stop, n_bins):
+        per_bin = -(-(stop - start) // n_bins)
+        if per_bin < 2 * self.block:
+            return minmax_indices(self.full_y, start, stop, n_bins)
+        # Bins of whole blocks, taken from the per-block extrema
+        first, last = start // self.block, -(-stop // self.block)
+        group = per_bin // self.block
+        lows = _grouped_argextreme(self._block_min_y[first:last], group, np.argmin) + first
+        highs = _grouped_argextreme(self._block_max_y[first:last], group, np.argmax) + first
+        return np.unique(np.concatenate([self._block_min[lows], self._block_max[highs]]))
+
+    def refresh(self, xlim=None, width_px=None):
+        """Recompute the envelope for xlim and an axes width_px (default: current view)"""
+        xlim = tuple(sorted(self.axes.get_xlim())) if xlim is None else tuple(sorted(xlim))
+        width_px = self.axes.bbox.width if width_px is None else width_px
+        n_bins = max(1, int(width_px * self.points_per_px / 2))
+        view = (xlim, n_bins)
+        if view == self._view:
+            return False
+        self._view = view
+        indices = self._envelope(*self._index_range(*xlim), n_bins)
+        x = indices if self.full_x is None else np.asarray(self.full_x[indices])
+        self.set_data(x, np.asarray(self.full_y[indices]))
+        return True
+
+    def draw(self, renderer):
+        self.refresh()
+        super().draw(renderer)
+
+
+def lod_plot(ax, x, y, points_per_px=2, block=LOD_BLOCK, **kwargs):
+    """ax.plot(x, y) for series too long to draw sample by sample
+
+    Draws an LODLine (see above): about points_per_px points per pixel of
+    axes width, with every peak kept. Pass x=None to plot against the
+    sample index without materializing it. Other keyword arguments go to
+    Line2D. Returns the line.
+    """
+    if 'color' not in kwargs and 'c' not in kwargs:
+        # The next color of the property cycle, counting the lines already drawn
+        cycle = plt.rcParams['axes.prop_cycle'].by_key().get('color', ['C0'])
+        kwargs['color'] = cycle[len(ax.get_lines()) % len(cycle)]
+    line = LODLine(x, y, points_per_px=points_per_px, block=block, **kwargs)
+    ax.add_line(line)
+    limits = line.data_limits()
+    if limits is not None:
+        (x0, x1), (y0, y1) = limits
+        ax.update_datalim([(x0, y0), (x1, y1)])
+        ax.autoscale_view()
+    line.refresh()
+    return line
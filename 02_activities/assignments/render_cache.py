@@ -0,0 +1,207 @@
+# Content-addressed cache of rendered figure files
+#
+# A cache key is a hash of everything that can change the output bytes:
+# the figure name, its builder parameters (including the contents of any
+# input files and DataFrames), the plotting code, the active matplotlib
+# style and the output format/dpi. Parameters left at the builder's
+# defaults are keyed too, so a default input file is hashed like a passed
+# one. On a hit the stored file is copied to the output path and
+# matplotlib is never touched.
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import time
+
+from startup import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose source decides what a figure looks like (export.py holds the
+# save options and metadata)
+CODE_MODULES = ('figures.py', 'plot_helpers.py', 'sample_data.py', 'earlyon_data.py',
+                'geo_index.py', 'vector_export.py', 'layout_cache.py', 'column_sources.py',
+                'image_cache.py', 'export.py')
+
+# rcParams that do not affect the saved file
+_IGNORED_RC = {'backend', 'backend_fallback', 'interactive', 'figure.max_open_warning',
+               'webagg.port', 'webagg.address', 'webagg.port_retries', 'webagg.open_in_browser',
+               'savefig.directory', 'tk.window_focus'}
+
+_FILE_CHUNK = 1 << 20
+
+
+def file_digest(path):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_FILE_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fingerprint(value, digest):
+    """Feed a stable representation of value into digest"""
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(f'{value.dtype}{value.shape}'.encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode())
+            _fingerprint(value[key], digest)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}{len(value)}'.encode())
+        for item in value:
+            _fingerprint(item, digest)
+    elif isinstance(value, (str, os.PathLike)) and os.path.isfile(value):
+        # Input files are keyed on their contents, not their name
+        digest.update(b'file:' + file_digest(value).encode())
+    elif isinstance(value, (str, os.PathLike)) and os.path.isdir(value):
+        # Column folders (see column_sources) are keyed on every file in them
+        for entry in sorted(os.listdir(value)):
+            digest.update(entry.encode())
+            _fingerprint(os.path.join(value, entry), digest)
+    else:
+        digest.update(pickle.dumps(value, protocol=4))
+
+
+def active_style():
+    """The current rcParams that affect rendering (plt.style.use, sns.set_palette, ...)"""
+    import matplotlib
+    return {key: value for key, value in matplotlib.rcParams.items() if key not in _IGNORED_RC}
+
+
+def code_digest(modules=CODE_MODULES):
+    digest = hashlib.sha256()
+    for name in modules:
+        digest.update(name.encode())
+        digest.update(file_digest(os.path.join(HERE, name)).encode())
+    return digest.hexdigest()
+
+
+def builder_arguments(builder, params):
+    """Every argument builder(**params) runs with, defaults included"""
+    try:
+        bound = inspect.signature(builder).bind_partial(**(params or {}))
+    except TypeError:
+        # The builder call itself will report the bad parameter
+        return params or {}
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+def render_key(name, params, fmt, dpi, style=None, code=None, builder=None):
+    """Cache key for one figure file
+
+    builder defaults to the one registered under name in figures.py.
+    """
+    if builder is None:
+        from figures import FIGURE_BUILDERS
+        builder = FIGURE_BUILDERS.get(name)
+    digest = hashlib.sha256()
+    digest.update(f'{name}|{fmt}|{dpi}|'.encode())
+    digest.update((code or code_digest()).encode())
+    _fingerprint(params or {} if builder is None else builder_arguments(builder, params),
+                 digest)
+    style = active_style() if style is None else style
+    digest.update(repr(sorted(style.items())).encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Size-bounded LRU store of rendered files, keyed by render_key()
+
+    Not safe for several writers at once: export.py only touches it from
+    the parent process.
+    """
+
+    def __init__(self, cache_dir, max_bytes=500_000_000):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Drop entries whose file has gone missing
+        return {key: entry for key, entry in index.items()
+                if os.path.exists(self._path(key, entry['ext']))}
+
+    def _save_index(self):
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, f'{key}.{ext}')
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def total_bytes(self):
+        return sum(entry['size'] for entry in self._index.values())
+
+    def fetch(self, key, output_path):
+        """Copy the cached file for key to output_path; False on a miss"""
+        entry = self._index.get(key)
+        if entry is None:
+            self.misses += 1
+            return False
+        shutil.copyfile(self._path(key, entry['ext']), output_path)
+        entry['last_used'] = time.time()
+        self.hits += 1
+        self._save_index()
+        return True
+
+    def store(self, key, source_path):
+        """Add a rendered file to the cache, evicting old entries if needed"""
+        ext = os.path.splitext(source_path)[1].lstrip('.') or 'bin'
+        shutil.copyfile(source_path, self._path(key, ext))
+        self._index[key] = {'ext': ext, 'size': os.path.getsize(source_path),
+                            'last_used': time.time()}
+        self._evict()
+        self._save_index()
+
+    def _evict(self):
+        total = self.total_bytes
+        for key in sorted(self._index, key=lambda k: self._index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            entry = self._index.pop(key)
+            os.remove(self._path(key, entry['ext']))
+            total -= entry['size']
+            self.evictions += 1
+
+    def clear(self):
+        for key, entry in self._index.items():
+            os.remove(self._path(key, entry['ext']))
+        self._index = {}
+        self._save_index()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self), 'bytes': self.total_bytes}
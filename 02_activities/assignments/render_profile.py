@@ -0,0 +1,251 @@
+# Opt-in render profiling
+#
+# profile_figure(name) times one figure from data load to file on disk and
+# appends a JSON line to the file named by $RENDER_PROFILE:
+#     {"figure": "language_analysis", "total_s": 1.93,
+#      "phases": {"load": 0.41, "build": 0.22, "layout": 0.05,
+#                 "draw": 0.71, "encode": 0.48, "other": 0.02},
+#      "counters": {"artists": 412, "texts": 61, "pixels": 14342400,
+#                   "bytes_written": 301877}, ...}
+# Phases are exclusive (build does not include the layout it triggers) and
+# time outside any phase is booked as "other", so they add up to total_s.
+# With $RENDER_PROFILE_CPROFILE set to a folder, a cProfile dump
+# <figure>.prof is written there as well, for pstats, snakeviz or
+# flameprof. Both are environment variables so processes spawned by
+# export.py profile too. Saves that finish in the background
+# (async_save) are registered with background_save(); the record waits for
+# them and books their encode time and file size. When profiling is off,
+# phase() and profile_figure() cost a dictionary lookup.
+
+import cProfile
+import json
+import os
+import threading
+import time
+from concurrent.futures import wait
+from contextlib import contextmanager
+
+PROFILE_ENV = 'RENDER_PROFILE'
+CPROFILE_ENV = 'RENDER_PROFILE_CPROFILE'
+# Tags the records of one enable() call, so a report can pick out its run
+RUN_ENV = 'RENDER_PROFILE_RUN'
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def enable(output, cprofile_dir=None):
+    """Append a record per profiled figure to output (JSON lines)
+
+    Set in the environment, so worker processes started afterwards inherit
+    it. Returns the run id the records are tagged with.
+    """
+    os.environ[PROFILE_ENV] = os.path.abspath(output)
+    os.environ[RUN_ENV] = f'{os.getpid()}-{time.time():.0f}'
+    if cprofile_dir:
+        os.makedirs(cprofile_dir, exist_ok=True)
+        os.environ[CPROFILE_ENV] = os.path.abspath(cprofile_dir)
+    return os.environ[RUN_ENV]
+
+
+def disable():
+    os.environ.pop(PROFILE_ENV, None)
+    os.environ.pop(CPROFILE_ENV, None)
+    os.environ.pop(RUN_ENV, None)
+
+
+def enabled():
+    return bool(os.environ.get(PROFILE_ENV))
+
+
+@contextmanager
+def profile_figure(name, **fields):
+    """Time everything inside as one figure; yields the record (None when off)
+
+    fields are extra JSON values for the record (input file, dpi, ...).
+    """
+    output = os.environ.get(PROFILE_ENV)
+    if not output:
+        yield None
+        return
+
+    record = {'figure': name, 'run': os.environ.get(RUN_ENV), **fields,
+              'phases': {}, 'counters': {}}
+    outer = getattr(_local, 'record', None)
+    outer_stack = getattr(_local, 'stack', None)
+    _local.record, _local.stack = record, []
+    cprofile_dir = os.environ.get(CPROFILE_ENV)
+    profiler = cProfile.Profile() if cprofile_dir and outer is None else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    except BaseException as exc:
+        record['error'] = f'{type(exc).__name__}: {exc}'
+        raise
+    finally:
+        for future, target in record.pop('_background', ()):
+            _book_background(record, future, target)
+        if profiler is not None:
+            profiler.disable()
+        record['total_s'] = time.perf_counter() - start
+        record['phases']['other'] = record['total_s'] - sum(record['phases'].values())
+        _local.record, _local.stack = outer, outer_stack
+        fig = record.pop('_fig', None)
+        if fig is not None:
+            _count_artists(fig, record['counters'])
+        if profiler is not None:
+            path = os.path.join(cprofile_dir, f'{name}.prof')
+            profiler.dump_stats(path)
+            record['cprofile'] = path
+        _write(output, record)
+
+
+@contextmanager
+def phase(name, fig=None, target=None):
+    """Time the block as phase name of the current figure record
+
+    Pass the Figure (and the file or buffer written) around a savefig()
+    call to split it into layout, draw and encode, and to count the pixels
+    rasterized and bytes written. Does nothing outside profile_figure().
+    """
+    record = getattr(_local, 'record', None)
+    if record is None:
+        yield
+        return
+
+    stack = _local.stack
+    frame = [0.0]  # time spent in nested phases
+    stack.append(frame)
+    draws = []
+    callback = None
+    if fig is not None:
+        record['_fig'] = fig
+        callback = fig.canvas.mpl_connect(
+            'draw_event', lambda event: draws.append((time.perf_counter(), event.renderer)))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+        elapsed = end - start
+        if stack:
+            stack[-1][0] += elapsed
+        own = elapsed - frame[0]
+        if callback is not None:
+            fig.canvas.mpl_disconnect(callback)
+            # Booked as layout / draw / encode instead, when the figure was drawn
+            own -= _split_save(record, start, end, draws, target)
+        if draws and abs(own) < 1e-6:
+            return
+        phases = record['phases']
+        phases[name] = phases.get(name, 0.0) + own
+
+
+def _split_save(record, start, end, draws, target):
+    """Book a savefig() as layout / draw / encode from its draw events; returns the time booked
+
+    savefig() draws once, after a dry draw that runs the layout engine
+    and measures the tight bbox when it needs one. Whatever follows the
+    last draw is PNG/JPEG encoding (or vector output) and the file write.
+    """
+    if not draws:
+        return 0.0
+    times = [start] + [when for when, _ in draws]
+    split = {'layout': times[-2] - start, 'draw': times[-1] - times[-2],
+             'encode': end - times[-1]}
+    phases, counters = record['phases'], record['counters']
+    for name, seconds in split.items():
+        phases[name] = phases.get(name, 0.0) + seconds
+    renderer = draws[-1][1]
+    if hasattr(renderer, 'buffer_rgba'):
+        counters['pixels'] = counters.get('pixels', 0) + renderer.width * renderer.height
+    written = _bytes_written(target)
+    if written is not None:
+        counters['bytes_written'] = counters.get('bytes_written', 0) + written
+    return sum(split.values())
+
+
+def background_save(future, target=None):
+    """Book a save still running in the background (an AsyncSaver Future) in the current figure
+
+    profile_figure() waits for it before closing the record, then adds the
+    worker's encode and write time to encode and the size of target to
+    bytes_written. Does nothing outside profile_figure().
+    """
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record.setdefault('_background', []).append((future, target))
+
+
+def _book_background(record, future, target):
+    # A failed save is raised by the saver's flush(), not here
+    wait([future])
+    if future.exception() is not None:
+        return
+    seconds = getattr(future, 'timing', {}).get('seconds', 0.0)
+    record['phases']['encode'] = record['phases'].get('encode', 0.0) + seconds
+    written = _bytes_written(target)
+    if written is not None:
+        counters = record['counters']
+        counters['bytes_written'] = counters.get('bytes_written', 0) + written
+
+
+def _bytes_written(target):
+    if isinstance(target, (str, os.PathLike)):
+        try:
+            return os.path.getsize(target)
+        except OSError:
+            return None
+    if hasattr(target, 'getbuffer'):
+        return target.getbuffer().nbytes
+    return None
+
+
+def _count_artists(fig, counters):
+    from matplotlib.text import Text
+
+    counters['axes'] = len(fig.axes)
+    counters['artists'] = len(fig.findobj())
+    counters['texts'] = len(fig.findobj(Text))
+
+
+def _write(output, record):
+    # One write per line, so records from parallel workers do not interleave
+    line = json.dumps(record, default=str) + '\n'
+    with _write_lock, open(output, 'a') as f:
+        f.write(line)
+
+
+def read_profile(path, run=None):
+    """The records of a JSON-lines profile (only those of run, if given)"""
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [record for record in records if run is None or record.get('run') == run]
+
+
+def print_profile(records):
+    """Per-figure phase table, slowest figure first"""
+    order = ['load', 'aggregate', 'build', 'update', 'layout', 'draw', 'encode', 'other']
+    seen = {name for record in records for name in record['phases']}
+    phases = [name for name in order if name in seen] + sorted(seen - set(order))
+    print(f"{'figure':<26} {'total (s)':>9} " + ' '.join(f'{name:>8}' for name in phases)
+          + f" {'artists':>8} {'Mpx':>7} {'KB':>8}")
+    for record in sorted(records, key=lambda record: record['total_s'], reverse=True):
+        if record.get('error'):
+            print(f"{record['figure']:<26} FAILED {record['error']}")
+            continue
+        counters = record['counters']
+        print(f"{record['figure']:<26} {record['total_s']:9.3f} "
+              + ' '.join(f"{record['phases'].get(name, 0.0):8.3f}" for name in phases)
+              + f" {counters.get('artists', 0):8} {counters.get('pixels', 0) / 1e6:7.1f}"
+              f" {counters.get('bytes_written', 0) / 1e3:8.1f}")
+
+
+if __name__ == "__main__":
+    # python render_profile.py render_profile.jsonl
+    import sys
+
+    print_profile(read_profile(sys.argv[1]))
@@ -0,0 +1,527 @@
+# On-demand chart rendering from warm worker processes
+#
+# Running a script per chart pays for interpreter startup, the pandas,
+# matplotlib and seaborn imports, style setup and the CSV load before
+# anything is drawn. RenderPool keeps worker processes that have done all
+# of that once (the EarlyON data is loaded and aggregated at startup) and
+# hands them render jobs from a bounded queue. Workers over their memory
+# cap or job limit are replaced after the job that crossed it. The HTTP
+# front end serves the figures.py builders as PNG/SVG/PDF. Run from this
+# folder:
+#     python render_server.py --port 8765 --earlyon-csv centres.csv
+#     curl -o chart.png 'http://127.0.0.1:8765/render/life_expectancy_gdp.png?dpi=150&seed=7'
+#     curl http://127.0.0.1:8765/metrics
+
+import argparse
+import io
+import json
+import math
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from urllib.parse import parse_qsl, urlsplit
+
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml', 'pdf': 'application/pdf'}
+
+MAX_DPI = 600
+
+# Builder arguments the server fills in itself (data, files); never taken from a request
+_SERVER_ARGUMENTS = {'data', 'stats', 'matrix', 'input_file', 'centres'}
+
+# Latencies kept per figure for the percentiles
+_LATENCY_WINDOW = 10_000
+
+
+class RenderError(Exception):
+    """A render failed in the worker (bad parameters, builder error)"""
+
+
+class QueueFull(Exception):
+    """More requests are waiting than the pool's queue_size"""
+
+
+def _rss_mb():
+    """Resident memory of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        # Not Linux: the peak is the best we have
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+# Worker process
+
+def _preload(earlyon_csv):
+    """Builder arguments with the EarlyON data loaded and aggregated, per figure"""
+    from earlyon_data import LOCATION_COLUMNS, language_stats, load_earlyon, load_language_matrix
+    from figures import location_stats
+
+    if not earlyon_csv or not os.path.exists(earlyon_csv):
+        return {}, {}
+    loaders = {
+        'language_analysis': lambda: {'stats': language_stats(load_earlyon(earlyon_csv))},
+        'location_analysis': lambda: {'stats': location_stats(
+            load_earlyon(earlyon_csv, columns=LOCATION_COLUMNS, geometry=True))},
+        'languages_offered': lambda: {'matrix': load_language_matrix(earlyon_csv)},
+    }
+    preloaded, unavailable = {}, {}
+    for name, load in loaders.items():
+        try:
+            preloaded[name] = load()
+        except Exception as exc:
+            # e.g. an extract without the geometry column
+            unavailable[name] = f'{type(exc).__name__}: {exc}'
+    return preloaded, unavailable
+
+
+def _render(job, preloaded):
+    """PNG/SVG/PDF bytes of one figure"""
+    import matplotlib.pyplot as plt
+    from export import _DETERMINISTIC_RC, _FORMAT_METADATA
+    from figures import EARLYON_FIGURES, FIGURE_BUILDERS, LAYOUT_CACHE
+
+    name, fmt, dpi, params = job['name'], job['format'], job['dpi'], job['params']
+    if name in EARLYON_FIGURES and name not in preloaded:
+        raise RenderError(f"{name} is not available: its data was not loaded")
+    buffer = io.BytesIO()
+    with plt.rc_context(_DETERMINISTIC_RC):
+        try:
+            fig = FIGURE_BUILDERS[name](**params, **preloaded.get(name, {}))
+        except TypeError as exc:
+            raise RenderError(f'bad parameters for {name}: {exc}') from None
+        try:
+            LAYOUT_CACHE.savefig(fig, buffer, format=fmt, dpi=dpi, bbox_inches='tight',
+                                 metadata=_FORMAT_METADATA.get(fmt))
+        finally:
+            plt.close(fig)
+    return buffer.getvalue()
+
+
+def _worker_main(conn, earlyon_csv, max_rss_mb, max_jobs, warm):
+    """Worker loop: load everything once, then render jobs from conn until told to stop"""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import matplotlib.pyplot  # noqa: F401
+    import seaborn  # noqa: F401  (the language analysis style)
+
+    from figures import EARLYON_FIGURES, FIGURE_BUILDERS
+
+    preloaded, unavailable = _preload(earlyon_csv)
+    figures = [name for name in FIGURE_BUILDERS
+               if name not in EARLYON_FIGURES or name in preloaded]
+    if warm:
+        # Font caches, glyphs and solved layouts for the first real request
+        for name in figures:
+            try:
+                _render({'name': name, 'format': 'png', 'dpi': 72, 'params': {}}, preloaded)
+            except Exception:
+                pass
+    conn.send(('ready', {'pid': os.getpid(), 'figures': figures, 'unavailable': unavailable}))
+
+    jobs = 0
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        start = time.perf_counter()
+        try:
+            reply = ('ok', _render(job, preloaded))
+        except Exception as exc:
+            message = str(exc) if isinstance(exc, RenderError) else f'{type(exc).__name__}: {exc}'
+            reply = ('error', message)
+        jobs += 1
+        rss = _rss_mb()
+        recycle = bool((max_rss_mb and rss > max_rss_mb) or (max_jobs and jobs >= max_jobs))
+        conn.send((*reply, time.perf_counter() - start, rss, recycle))
+        if recycle:
+            break
+    conn.close()
+
+
+class _Worker:
+    """Parent-side handle of one worker process"""
+
+    def __init__(self, context, args, startup_timeout):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, *args), daemon=True)
+        self.process.start()
+        child.close()
+        if not self.conn.poll(startup_timeout):
+            self.kill()
+            raise RuntimeError(f"render worker did not start within {startup_timeout}s")
+        _, self.info = self.conn.recv()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.kill()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+
+
+# Metrics
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+class RenderMetrics:
+    """Request counts and latency percentiles, per figure and overall"""
+
+    def __init__(self, window=_LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latency = defaultdict(lambda: {key: deque(maxlen=window)
+                                             for key in ('total', 'queued', 'render')})
+        self.counts = defaultdict(int)
+
+    def record(self, name, total, queued, render, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+            if outcome == 'ok':
+                for key, seconds in (('total', total), ('queued', queued), ('render', render)):
+                    self._latency[name][key].append(seconds)
+                    self._latency['*'][key].append(seconds)
+
+    def count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def snapshot(self):
+        """{'requests': {...}, 'latency_ms': {figure: {total/queued/render: p50, p99}}}"""
+        with self._lock:
+            latency = {}
+            for name, series in self._latency.items():
+                latency[name] = {'count': len(series['total'])}
+                for key, values in series.items():
+                    ordered = sorted(values)
+                    for percent in (50, 99):
+                        value = _percentile(ordered, percent)
+                        latency[name][f'{key}_p{percent}'] = (None if value is None
+                                                              else round(value * 1e3, 2))
+            return {'requests': dict(self.counts), 'latency_ms': latency}
+
+
+# The pool
+
+class RenderPool:
+    """Warm worker processes rendering figures.py builders on request
+
+    Each worker imports the plotting libraries, loads and aggregates the
+    EarlyON CSV (when given) and, with warm=True, renders every figure
+    once before taking requests. Requests wait in a queue of queue_size;
+    submit() raises QueueFull beyond that. A worker whose resident memory
+    passes max_rss_mb, or that has served max_jobs renders, is replaced
+    after its reply; one that crashes or takes longer than timeout is
+    killed and replaced. Thread-safe.
+    """
+
+    def __init__(self, workers=2, earlyon_csv=None, max_rss_mb=1024, max_jobs=None,
+                 queue_size=64, timeout=60, warm=True, startup_timeout=300):
+        self.timeout = timeout
+        self.metrics = RenderMetrics()
+        self.recycled = 0
+        self._context = get_context('spawn')
+        self._worker_args = (earlyon_csv, max_rss_mb, max_jobs, warm)
+        self._startup_timeout = startup_timeout
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._workers = [None] * workers
+        # Workers start in parallel; each slot's thread then serves the queue
+        starters = [threading.Thread(target=self._start, args=(slot,)) for slot in range(workers)]
+        for thread in starters:
+            thread.start()
+        for thread in starters:
+            thread.join()
+        if not all(self._workers):
+            self.close()
+            raise RuntimeError("render workers failed to start")
+        self.info = self._workers[0].info
+        self._threads = [threading.Thread(target=self._serve, args=(slot,), daemon=True)
+                         for slot in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def figures(self):
+        return self.info['figures']
+
+    def _start(self, slot):
+        try:
+            worker = _Worker(self._context, self._worker_args, self._startup_timeout)
+        except Exception:
+            worker = None
+        with self._lock:
+            self._workers[slot] = worker
+        return worker
+
+    def _replace(self, slot, kill=False):
+        worker = self._workers[slot]
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        with self._lock:
+            self.recycled += 1
+        return self._start(slot)
+
+    def submit(self, name, format='png', dpi=100, params=None):
+        """Queue a render; returns a Future for the file's bytes"""
+        if name not in self.figures:
+            raise KeyError(name)
+        if format not in CONTENT_TYPES:
+            raise ValueError(f"format must be one of {', '.join(CONTENT_TYPES)}")
+        future = Future()
+        job = {'name': name, 'format': format, 'dpi': dpi, 'params': dict(params or {})}
+        try:
+            self._jobs.put_nowait((future, job, time.perf_counter()))
+        except queue.Full:
+            self.metrics.count('rejected')
+            raise QueueFull(f"{self._jobs.maxsize} requests already waiting") from None
+        return future
+
+    def render(self, name, format='png', dpi=100, params=None):
+        """Render and wait; returns the bytes
+
+        Raises QueueFull when the queue is full, TimeoutError when the render
+        takes longer than timeout (its worker is killed and restarted) and
+        RenderError when the builder fails or the worker dies.
+        """
+        return self.submit(name, format, dpi, params).result()
+
+    def _serve(self, slot):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            future, job, queued_at = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            worker = self._workers[slot]
+            started = time.perf_counter()
+            outcome, recycle = 'ok', False
+            try:
+                if worker is None:
+                    worker = self._start(slot)
+                    if worker is None:
+                        raise RenderError("render worker could not be restarted")
+                worker.conn.send(job)
+                if not worker.conn.poll(self.timeout):
+                    outcome = 'timeout'
+                    self._replace(slot, kill=True)
+                    raise TimeoutError(f"render took longer than {self.timeout}s")
+                status, payload, render_s, _, recycle = worker.conn.recv()
+                if status != 'ok':
+                    outcome = 'error'
+                    raise RenderError(payload)
+                future.set_result(payload)
+            except TimeoutError as exc:
+                # Before OSError, which TimeoutError subclasses; the worker was already replaced
+                render_s = time.perf_counter() - started
+                future.set_exception(exc)
+            except (EOFError, OSError) as exc:
+                # The worker died mid-job (crash, OOM kill)
+                outcome, render_s = 'crashed', time.perf_counter() - started
+                self._replace(slot, kill=True)
+                future.set_exception(RenderError(f"render worker died: {exc!r}"))
+            except Exception as exc:
+                outcome = 'error' if outcome == 'ok' else outcome
+                render_s = time.perf_counter() - started
+                future.set_exception(exc)
+            done = time.perf_counter()
+            self.metrics.record(job['name'], done - queued_at, started - queued_at, render_s,
+                                outcome)
+            if recycle:
+                self._replace(slot)
+
+    def stats(self):
+        with self._lock:
+            alive = sum(1 for worker in self._workers if worker and worker.process.is_alive())
+            pids = [worker.process.pid for worker in self._workers if worker]
+        return {'workers': len(self._workers), 'alive': alive, 'pids': pids,
+                'queued': self._jobs.qsize(), 'recycled': self.recycled}
+
+    def close(self):
+        """Finish queued requests, then stop the workers"""
+        for _ in getattr(self, '_threads', ()):
+            self._jobs.put(None)
+        for thread in getattr(self, '_threads', ()):
+            thread.join()
+        for worker in self._workers:
+            if worker is not None:
+                worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# HTTP front end
+
+def _parse_value(text):
+    """Query string value as JSON when it is (numbers, true/false, null), else text"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+class _RenderHandler(BaseHTTPRequestHandler):
+    """GET /render/<figure>.<format>?dpi=..&<builder argument>=..; /figures; /metrics; /healthz"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        pool = self.server.pool
+        if url.path == '/figures':
+            self._send_json({'figures': pool.figures, 'formats': list(CONTENT_TYPES),
+                             'unavailable': pool.info['unavailable']})
+        elif url.path == '/metrics':
+            self._send_json({**pool.metrics.snapshot(), 'pool': pool.stats()})
+        elif url.path == '/healthz':
+            stats = pool.stats()
+            self._send_json(stats, 200 if stats['alive'] else 503)
+        elif url.path.startswith('/render/'):
+            self._render(url)
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def _render(self, url):
+        pool = self.server.pool
+        name, _, fmt = url.path[len('/render/'):].rpartition('.')
+        params = {key: _parse_value(value) for key, value in parse_qsl(url.query)}
+        try:
+            dpi = int(params.pop('dpi', 100))
+        except (TypeError, ValueError):
+            self._send_json({'error': 'dpi must be a whole number'}, 400)
+            return
+        if not 1 <= dpi <= MAX_DPI:
+            self._send_json({'error': f'dpi must be between 1 and {MAX_DPI}'}, 400)
+            return
+        forbidden = _SERVER_ARGUMENTS & set(params)
+        if forbidden:
+            self._send_json({'error': f"not settable: {', '.join(sorted(forbidden))}"}, 400)
+            return
+        try:
+            future = pool.submit(name, fmt, dpi, params)
+        except KeyError:
+            self._send_json({'error': f'unknown figure {name!r}'}, 404)
+            return
+        except ValueError as exc:
+            self._send_json({'error': str(exc)}, 400)
+            return
+        except QueueFull as exc:
+            self._send_json({'error': str(exc)}, 503)
+            return
+        try:
+            body = future.result()
+        except TimeoutError as exc:
+            self._send_json({'error': str(exc)}, 504)
+            return
+        except RenderError as exc:
+            status = 400 if str(exc).startswith('bad parameters') else 500
+            self._send_json({'error': str(exc)}, status)
+            return
+        self._send(body, CONTENT_TYPES[fmt])
+
+    def _send_json(self, value, status=200):
+        self._send(json.dumps(value).encode(), 'application/json', status)
+
+    def _send(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler logs client_address[0]
+        return request, ('unix', 0)
+
+
+def serve(pool, port=8765, host='127.0.0.1', socket_path=None, verbose=False):
+    """Start the HTTP front end for pool in a background thread; returns the server
+
+    With socket_path it listens on that Unix socket instead of host:port.
+    Call shutdown() to stop it.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = _UnixHTTPServer(socket_path, _RenderHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), _RenderHandler)
+        server.daemon_threads = True
+    server.pool = pool
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    from figures import EARLYON_CSV
+
+    parser = argparse.ArgumentParser(description='Serve the course figures from warm workers')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', metavar='PATH', help='listen on a Unix socket instead')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--earlyon-csv', default=EARLYON_CSV,
+                        help='EarlyON centres CSV, loaded by every worker at startup')
+    parser.add_argument('--max-rss-mb', type=float, default=1024,
+                        help='replace a worker once its resident memory passes this')
+    parser.add_argument('--max-jobs', type=int, default=None,
+                        help='replace a worker after this many renders')
+    parser.add_argument('--queue', type=int, default=64, help='requests allowed to wait')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds per render')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with RenderPool(args.workers, args.earlyon_csv, args.max_rss_mb, args.max_jobs, args.queue,
+                    args.timeout) as pool:
+        server = serve(pool, args.port, args.host, args.socket, args.verbose)
+        where = args.socket or f'http://{args.host}:{server.server_address[1]}'
+        print(f"{args.workers} workers ready in {time.perf_counter() - start:.1f}s, "
+              f"serving {', '.join(pool.figures)} on {where}")
+        for name, reason in pool.info['unavailable'].items():
+            print(f"  {name} unavailable: {reason}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# Synthetic datasets used by the course examples
+#
+# The generators here draw every column as one batched NumPy array per group
+# and assemble the DataFrame column by column, so they scale to millions of
+# rows without building one Python dict per row.
+
+from startup import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+CONTINENTS = ['Africa', 'Americas', 'Asia', 'Europe', 'Oceania']
+CONTINENT_COLORS = ['#3498db', '#e67e22', '#2ecc71', '#e74c3c', '#9b59b6']
+
+# Columns drawn for every group; each gets its own random stream so the
+# values do not depend on how the rows are chunked.
+_GAPMINDER_STREAMS = ('gdp_per_capita', 'life_noise', 'population')
+
+
+def _group_sizes(n_per_group, n_groups):
+    """Broadcast n_per_group to one row count per group"""
+    sizes = np.broadcast_to(np.asarray(n_per_group, dtype=np.int64), (n_groups,))
+    if (sizes < 0).any():
+        raise ValueError("n_per_group must be non-negative")
+    return sizes
+
+
+def _group_streams(seed, n_groups):
+    """One independent Generator per (group, column) pair"""
+    children = np.random.SeedSequence(seed).spawn(n_groups)
+    return [
+        {name: np.random.default_rng(child)
+         for name, child in zip(_GAPMINDER_STREAMS, child_seq.spawn(len(_GAPMINDER_STREAMS)))}
+        for child_seq in children
+    ]
+
+
+def _gapminder_frame(code, gdp, life_exp, population, group_dtype, color_dtype, color):
+    """Assemble one chunk column by column"""
+    n = len(gdp)
+    code_type = np.int8 if len(group_dtype.categories) < 128 else np.int32
+    frame = {
+        'continent': pd.Categorical.from_codes(np.full(n, code, dtype=code_type),
+                                               dtype=group_dtype),
+        'gdp_per_capita': gdp,
+        'life_expectancy': life_exp,
+        'population': population,
+    }
+    if color_dtype is not None:
+        color_code = color_dtype.categories.get_loc(color) if n else 0
+        frame['color'] = pd.Categorical.from_codes(np.full(n, color_code, dtype=code_type),
+                                                   dtype=color_dtype)
+    return pd.DataFrame(frame)
+
+
+def _dtypes(groups, colors):
+    group_dtype = pd.CategoricalDtype(groups)
+    color_dtype = None if colors is None else pd.CategoricalDtype(list(dict.fromkeys(colors)))
+    return group_dtype, color_dtype
+
+
+def iter_gapminder_like(n_per_group, groups=CONTINENTS, seed=42,
+                        colors=CONTINENT_COLORS, chunk_size=1_000_000):
+    """Yield the gapminder-like dataset as DataFrames of at most chunk_size rows
+
+    Concatenating the chunks gives exactly generate_gapminder_like(...) for
+    the same seed, whatever chunk_size is.
+    """
+    groups = list(groups)
+    sizes = _group_sizes(n_per_group, len(groups))
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if colors is not None and len(colors) < len(groups):
+        raise ValueError("need one color per group")
+    group_dtype, color_dtype = _dtypes(groups, colors)
+
+    for code, (size, streams) in enumerate(zip(sizes, _group_streams(seed, len(groups)))):
+        for start in range(0, int(size), chunk_size):
+            n = min(chunk_size, int(size) - start)
+            gdp = streams['gdp_per_capita'].lognormal(8, 1.5, n)
+            life_exp = 50 + 15 * np.log(gdp) + streams['life_noise'].normal(0, 3, n)
+            np.clip(life_exp, 40, 85, out=life_exp)
+            population = streams['population'].lognormal(15, 2, n)
+
+            yield _gapminder_frame(code, gdp, life_exp, population, group_dtype, color_dtype,
+                                   None if colors is None else colors[code])
+
+
+def generate_gapminder_like(n_per_group, groups=CONTINENTS, seed=42,
+                            colors=CONTINENT_COLORS, chunk_size=1_000_000):
+    """Build a life-expectancy vs GDP dataset with n_per_group rows per group
+
+    n_per_group is either one row count for every group or a sequence with
+    one count per group. Columns match the life-expectancy example:
+    continent, gdp_per_capita, life_expectancy, population and color.
+    Categories are stored as pandas categoricals to keep memory low.
+    """
+    groups = list(groups)
+    chunks = list(iter_gapminder_like(n_per_group, groups, seed, colors, chunk_size))
+    if not chunks:
+        empty = np.empty(0)
+        return _gapminder_frame(0, empty, empty, empty, *_dtypes(groups, colors), None)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def generate_gapminder_loop(n_per_group, groups=CONTINENTS, seed=42,
+                            colors=CONTINENT_COLORS):
+    """Original per-row dict loop, kept as the benchmark reference"""
+    np.random.seed(seed)
+    data = []
+    for i, continent in enumerate(groups):
+        n_countries = int(_group_sizes(n_per_group, len(groups))[i])
+        gdp = np.random.lognormal(8, 1.5, n_countries)
+        life_exp = 50 + 15 * np.log(gdp) + np.random.normal(0, 3, n_countries)
+        life_exp = np.clip(life_exp, 40, 85)
+
+        for j in range(n_countries):
+            data.append({
+                'continent': continent,
+                'gdp_per_capita': gdp[j],
+                'life_expectancy': life_exp[j],
+                'population': np.random.lognormal(15, 2),
+                'color': colors[i]
+            })
+
+    return pd.DataFrame(data)
+
+
+# EarlyON-shaped centres table: the language and geometry columns used by
+# assignment-3 plus filler columns so the file has the same width (35
+# columns) and a similar byte profile as the open-data extract.
+EARLYON_CITIES = ['Toronto', 'Scarborough', 'North York', 'Etobicoke', 'East York', 'York']
+EARLYON_LANGUAGES = ['French', 'Arabic', 'Mandarin', 'Cantonese', 'Tamil', 'Spanish',
+                     'Portuguese', 'Urdu', 'Punjabi', 'Tagalog', 'Farsi', 'Somali']
+EARLYON_COLUMNS = [
+    '_id', 'loc_id', 'program_name', 'agency', 'address', 'full_address',
+    'major_intersection', 'ward', 'ward_name', 'city', 'postal_code', 'phone',
+    'email', 'contact_name', 'website', 'languages', 'french_language_program',
+    'indigenous_program', 'serving_area', 'school_location', 'description',
+    'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+    'centre_type', 'registration', 'accessible', 'parking', 'last_updated', 'notes',
+    'geometry',
+]
+
+
+def generate_earlyon_like(n_rows, seed=613, language_rate=0.11, french_rate=0.01,
+                          indigenous_rate=0.03, first_id=1):
+    """Synthetic EarlyON centres table with n_rows rows
+
+    languages holds comma-separated language lists (NaN for English only);
+    geometry holds GeoJSON MultiPoint text in WGS84 around Toronto.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(first_id, first_id + n_rows)
+    city = np.asarray(EARLYON_CITIES)[rng.integers(0, len(EARLYON_CITIES), n_rows)]
+    ward = rng.integers(1, 26, n_rows)
+
+    # 1-3 languages for the multilingual centres, drawn without row loops
+    n_languages = np.where(rng.random(n_rows) < language_rate, rng.integers(1, 4, n_rows), 0)
+    distinct = np.argsort(rng.random((n_rows, len(EARLYON_LANGUAGES))), axis=1)[:, :3]
+    picks = np.asarray(EARLYON_LANGUAGES, dtype=object)[distinct]
+    languages = pd.Series(picks[:, 0])
+    for slot in (1, 2):
+        languages = languages.where(n_languages <= slot, languages + ', ' + picks[:, slot])
+    languages = languages.where(n_languages > 0)
+
+    lon = rng.normal(-79.38, 0.1, n_rows)
+    lat = rng.normal(43.70, 0.06, n_rows)
+    geometry = ('{"type": "MultiPoint", "coordinates": [['
+                + pd.Series(lon).round(6).astype(str) + ', '
+                + pd.Series(lat).round(6).astype(str) + ']]}')
+
+    id_text = pd.Series(ids).astype(str)
+    hours = np.where(rng.random(n_rows) < 0.7, '9:00am - 12:00pm', None)
+    frame = {
+        '_id': ids,
+        'loc_id': ids + 1000,
+        'program_name': 'EarlyON Child and Family Centre ' + id_text,
+        'agency': 'Agency ' + pd.Series(rng.integers(1, 60, n_rows)).astype(str),
+        'address': id_text + ' Queen St',
+        'full_address': id_text + ' Queen St, ' + city + ', ON',
+        'major_intersection': 'Queen St and Yonge St',
+        'ward': ward,
+        'ward_name': 'Ward ' + pd.Series(ward).astype(str),
+        'city': city,
+        'postal_code': 'M' + pd.Series(rng.integers(1, 10, n_rows)).astype(str) + 'A 1A1',
+        'phone': '416-555-' + pd.Series(ids % 10_000).astype(str).str.zfill(4),
+        'email': 'centre' + id_text + '@example.org',
+        'contact_name': 'Coordinator ' + id_text,
+        'website': 'https://example.org/centre/' + id_text,
+        'languages': languages,
+        'french_language_program': np.where(rng.random(n_rows) < french_rate, 'Yes', None),
+        'indigenous_program': np.where(rng.random(n_rows) < indigenous_rate, 'Yes', None),
+        'serving_area': city,
+        'school_location': np.where(rng.random(n_rows) < 0.4, 'Yes', 'No'),
+        'description': 'Drop-in programs for parents and caregivers with children 0-6.',
+        **{day: hours for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday')},
+        'saturday': None,
+        'sunday': None,
+        'centre_type': np.where(rng.random(n_rows) < 0.8, 'Main', 'Satellite'),
+        'registration': 'Drop-in',
+        'accessible': np.where(rng.random(n_rows) < 0.6, 'Yes', 'No'),
+        'parking': np.where(rng.random(n_rows) < 0.5, 'Yes', 'No'),
+        'last_updated': '2025-09-01',
+        'notes': None,
+        'geometry': geometry,
+    }
+    return pd.DataFrame(frame, columns=EARLYON_COLUMNS)
+
+
+def write_earlyon_csv(path, n_rows, seed=613, chunk_rows=200_000, **rates):
+    """Write an EarlyON-shaped CSV of n_rows centres, chunk_rows at a time
+
+    Same columns and text format as the open-data extract, so it exercises
+    load_earlyon() and the streaming readers at any size without holding
+    the whole table. rates are generate_earlyon_like()'s language rates.
+    """
+    # At least one (possibly empty) chunk, so the header is always written
+    for index, first in enumerate(range(0, max(n_rows, 1), chunk_rows)):
+        chunk = generate_earlyon_like(min(chunk_rows, n_rows - first), seed=seed + index,
+                                      first_id=first + 1, **rates)
+        chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+    return path
@@ -0,0 +1,85 @@
+# Fast startup for the visualization scripts
+#
+# pandas, matplotlib.pyplot and seaborn together take around a second to
+# import, which dominates short CLI and cron runs. lazy_import() hands back a
+# module object that only runs the real import on first attribute access,
+# so a script pays for a library only once a figure actually needs it.
+
+import importlib
+import os
+import re
+import subprocess
+import sys
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """Stand-in that imports the real module on first attribute access"""
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        # Later lookups go straight to the real module
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """Return module name, importing it on first attribute access
+
+    Works for submodules too (lazy_import('matplotlib.pyplot') does not
+    import matplotlib until pyplot is used). Already imported modules are
+    returned as they are.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name)
+
+
+def use_noninteractive_backend():
+    """Pick Agg before pyplot is imported, unless MPLBACKEND says otherwise
+
+    Scripts that only save files never need a GUI toolkit, and resolving
+    the interactive backend is a noticeable part of importing pyplot.
+    """
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+
+_IMPORT_TIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_time_breakdown(code='pass', args=(), top=15):
+    """Per-module import cost of running code, as with python -X importtime
+
+    Runs a fresh interpreter from this folder and returns up to top
+    (module, self_ms, cumulative_ms) rows for top-level imports, most
+    expensive first, plus the total wall time of the run in ms.
+    """
+    import time
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code, *args],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - start) * 1e3
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        # One leading space marks an import done directly by the script
+        if match and len(match.group(3)) == 1:
+            rows.append((match.group(4), int(match.group(1)) / 1e3, int(match.group(2)) / 1e3))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:top], wall_ms
+
+
+def print_import_times(code='pass', args=(), top=15):
+    rows, wall_ms = import_time_breakdown(code, args, top)
+    print(f"{'module':<32} {'self (ms)':>10} {'cumulative (ms)':>16}")
+    for module, self_ms, cumulative_ms in rows:
+        print(f"{module:<32} {self_ms:10.1f} {cumulative_ms:16.1f}")
+    print(f"\nwall time: {wall_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    # python startup.py "import figures"
+    print_import_times(sys.argv[1] if len(sys.argv) > 1 else 'pass')
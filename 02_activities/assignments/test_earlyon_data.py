@@ -0,0 +1,92 @@
+# Tests for the earlyon_data language matrix
+#
+# Run from this folder:
+#     python -m unittest test_earlyon_data
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from earlyon_data import (language_co_occurrence, language_counts, language_matrix,
+                          load_language_matrix)
+from sample_data import write_earlyon_csv
+
+# Free-text lists the tokenizer must agree on, with the counts they give
+MESSY_LANGUAGES = ['French, Arabic', 'english  and FRENCH', 'English And French',
+                   'Tamil;Urdu / ASL', 'arabic & French', 'French, french', None]
+MESSY_COUNTS = {'French': 5, 'Arabic': 2, 'English': 2, 'Tamil': 1, 'Urdu': 1, 'ASL': 1}
+
+
+def _rows(matrix):
+    indptr, indices, vocabulary = matrix['indptr'], matrix['indices'], matrix['vocabulary']
+    return [sorted(vocabulary[indices[indptr[i]:indptr[i + 1]]])
+            for i in range(len(indptr) - 1)]
+
+
+class LanguageMatrixTest(unittest.TestCase):
+
+    def test_messy_lists_tokenize_alike(self):
+        matrix = language_matrix(pd.Series(MESSY_LANGUAGES))
+        self.assertEqual(language_counts(matrix).to_dict(), MESSY_COUNTS)
+        self.assertEqual(_rows(matrix)[1], ['English', 'French'])
+        self.assertEqual(_rows(matrix)[3], ['ASL', 'Tamil', 'Urdu'])
+
+    def test_language_named_twice_counts_once(self):
+        matrix = language_matrix(pd.Series(['French, french', 'FRENCH and French']))
+        self.assertEqual(_rows(matrix), [['French'], ['French']])
+
+    def test_missing_and_blank_rows_are_empty(self):
+        matrix = language_matrix(pd.Series([None, 'Cree', '', ' , ', np.nan]))
+        self.assertEqual(_rows(matrix), [[], ['Cree'], [], [], []])
+
+    def test_no_languages_gives_an_empty_matrix(self):
+        for languages in ([None, None], ['', ' and '], []):
+            with self.subTest(languages=languages):
+                matrix = language_matrix(pd.Series(languages, dtype=object))
+                self.assertEqual(len(matrix['vocabulary']), 0)
+                self.assertEqual(matrix['indptr'].tolist(), [0] * (len(languages) + 1))
+                self.assertEqual(len(matrix['indices']), 0)
+                self.assertTrue(language_counts(matrix).empty)
+                self.assertEqual(language_co_occurrence(matrix).shape, (0, 0))
+
+    def test_categorical_input_matches_object_input(self):
+        languages = pd.Series(MESSY_LANGUAGES * 3)
+        plain = language_matrix(languages)
+        categorical = language_matrix(languages.astype('category'))
+        for name in ('vocabulary', 'indptr', 'indices'):
+            np.testing.assert_array_equal(plain[name], categorical[name])
+
+    def test_co_occurrence(self):
+        matrix = language_matrix(pd.Series(MESSY_LANGUAGES))
+        pairs = language_co_occurrence(matrix, ['French', 'English'])
+        self.assertEqual(pairs.loc['French', 'English'], 2)
+        self.assertEqual(pairs.loc['French', 'French'], MESSY_COUNTS['French'])
+        with self.assertRaises(KeyError):
+            language_co_occurrence(matrix, ['Klingon'])
+
+    def test_load_matches_and_is_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_earlyon_csv(os.path.join(tmp, 'earlyon.csv'), 500)
+            expected = language_matrix(pd.read_csv(path)['languages'])
+            first = load_language_matrix(path)
+            self.assertTrue(any(name.endswith('.npz') for name in os.listdir(tmp)))
+            second = load_language_matrix(path)
+            for name in ('vocabulary', 'indptr', 'indices'):
+                np.testing.assert_array_equal(first[name], expected[name])
+                np.testing.assert_array_equal(second[name], expected[name])
+
+    def test_empty_matrix_is_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_earlyon_csv(os.path.join(tmp, 'earlyon.csv'), 50)
+            pd.read_csv(path).assign(languages=None).to_csv(path, index=False)
+            for _ in range(2):
+                matrix = load_language_matrix(path)
+                self.assertEqual(len(matrix['vocabulary']), 0)
+                self.assertEqual(matrix['indptr'].tolist(), [0] * 51)
+
+
+if __name__ == '__main__':
+    unittest.main()
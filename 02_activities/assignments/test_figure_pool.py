@@ -0,0 +1,113 @@
+# Tests for figure_pool.FigurePool
+#
+# Run from this folder:
+#     python -m unittest                     # every test_*.py
+#     python -m unittest test_figure_pool
+
+import unittest
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgba
+
+from figure_pool import FigurePool
+
+
+class FigurePoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = FigurePool()
+        self.addCleanup(self.pool.close)
+
+    def test_release_resets_for_the_next_caller(self):
+        fig, ax = self.pool.subplots(figsize=(3, 2))
+        position = ax.get_position().bounds
+        ax.plot([1, 2, 3])
+        ax.set_title('first')
+        ax.set_aspect('equal')
+        ax.set_facecolor('red')
+        twin = ax.twinx()
+        fig.colorbar(ax.imshow([[0, 1]]), ax=ax)
+        fig.suptitle('suptitle')
+        fig.text(0.5, 0.5, 'note')
+        fig.legend(['line'])
+        fig.set_size_inches(8, 6)
+        fig.subplots_adjust(left=0.3)
+        self.pool.release(fig)
+
+        again, ax_again = self.pool.subplots(figsize=(3, 2))
+        self.assertIs(again, fig)
+        self.assertIs(ax_again, ax)
+        self.assertEqual(fig.axes, [ax])
+        self.assertNotIn(twin, fig.axes)
+        self.assertEqual((len(ax.lines), len(ax.images), ax.get_title()), (0, 0, ''))
+        self.assertEqual(ax.get_aspect(), 'auto')
+        self.assertEqual(ax.get_facecolor(), to_rgba(plt.rcParams['axes.facecolor']))
+        self.assertEqual(ax.get_position().bounds, position)
+        self.assertEqual((len(fig.texts), len(fig.legends)), (0, 0))
+        self.assertIsNone(fig._suptitle)
+        self.assertEqual(tuple(fig.get_size_inches()), (3, 2))
+        self.assertEqual(fig.subplotpars.left, plt.rcParams['figure.subplot.left'])
+        self.assertEqual(self.pool.stats()['reused'], 1)
+
+    def test_layouts_are_pooled_separately(self):
+        fig, _ = self.pool.subplots(figsize=(3, 2))
+        self.pool.release(fig)
+        other, axes = self.pool.subplots(1, 2, figsize=(3, 2))
+        self.assertIsNot(other, fig)
+        self.assertEqual(len(axes), 2)
+        self.pool.release(other)
+
+        with self.pool.borrow_mosaic([['a', 'b']], figsize=(3, 2)) as (mosaic, axes):
+            self.assertEqual(set(axes), {'a', 'b'})
+        with self.pool.borrow_mosaic([['a', 'b']], figsize=(3, 2)) as (again, _):
+            self.assertIs(again, mosaic)
+        self.assertEqual(self.pool.stats(), {'created': 3, 'reused': 1, 'discarded': 0,
+                                             'idle': 3, 'in_use': 0})
+
+    def test_figure_without_its_axes_is_discarded(self):
+        fig, ax = self.pool.subplots()
+        ax.remove()
+        self.pool.release(fig)
+        again, _ = self.pool.subplots()
+        self.assertIsNot(again, fig)
+        self.assertEqual(self.pool.stats()['discarded'], 1)
+
+    def test_idle_figures_are_capped(self):
+        pool = FigurePool(max_idle_per_layout=1)
+        self.addCleanup(pool.close)
+        first, _ = pool.subplots()
+        second, _ = pool.subplots()
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(pool.stats()['idle'], 1)
+        self.assertEqual(pool.stats()['discarded'], 1)
+        self.assertIsNone(second.canvas.figure)
+
+    def test_release_of_a_foreign_figure_raises(self):
+        fig = plt.figure()
+        self.addCleanup(plt.close, fig)
+        with self.assertRaises(ValueError):
+            self.pool.release(fig)
+
+    def test_borrow_releases_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.pool.borrow_subplots() as (fig, ax):
+                raise RuntimeError
+        self.assertEqual(self.pool.stats()['idle'], 1)
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+
+    def test_close_frees_idle_and_handed_out_figures(self):
+        idle, _ = self.pool.subplots()
+        self.pool.release(idle)
+        handed_out, _ = self.pool.subplots(2, 1)
+        self.pool.close()
+        self.assertIsNone(idle.canvas.figure)
+        self.assertIsNone(handed_out.canvas.figure)
+        self.assertEqual(self.pool.stats()['idle'], 0)
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# Tests for render_cache and export.py's use of it
+#
+# Run from this folder:
+#     python -m unittest test_render_cache
+
+import os
+import tempfile
+import unittest
+
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+
+from export import export_all
+from render_cache import RenderCache, builder_arguments, render_key
+
+STYLE = {'lines.linewidth': 1.5}
+CODE = 'code'
+
+
+def _builder(data=None, seed=42):
+    pass
+
+
+class RenderKeyTest(unittest.TestCase):
+
+    def key(self, params=None, fmt='png', dpi=100, style=STYLE, code=CODE):
+        return render_key('figure', params, fmt, dpi, style, code, builder=_builder)
+
+    def test_defaults_are_keyed_like_passed_values(self):
+        self.assertEqual(self.key(), self.key({'seed': 42}))
+        self.assertEqual(builder_arguments(_builder, {'seed': 7}), {'data': None, 'seed': 7})
+
+    def test_every_input_changes_the_key(self):
+        keys = {self.key(), self.key({'seed': 7}), self.key(fmt='svg'), self.key(dpi=300),
+                self.key(style={'lines.linewidth': 2}), self.key(code='changed')}
+        self.assertEqual(len(keys), 6)
+
+    def test_data_is_keyed_by_content(self):
+        frame = pd.DataFrame({'x': [1, 2, 3]})
+        self.assertEqual(self.key({'data': frame}), self.key({'data': frame.copy()}))
+        self.assertNotEqual(self.key({'data': frame}), self.key({'data': frame * 2}))
+
+    def test_input_file_is_keyed_by_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'input.csv')
+            with open(path, 'w') as f:
+                f.write('x\n1\n')
+            before = self.key({'data': path})
+            with open(path, 'a') as f:
+                f.write('2\n')
+            self.assertNotEqual(self.key({'data': path}), before)
+
+
+class RenderCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def write(self, name, size):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        return path
+
+    def test_store_then_fetch_hits(self):
+        cache = RenderCache(os.path.join(self.tmp, 'cache'))
+        output = os.path.join(self.tmp, 'out.png')
+        self.assertFalse(cache.fetch('key', output))
+        cache.store('key', self.write('a.png', 10))
+        self.assertTrue(cache.fetch('key', output))
+        with open(output, 'rb') as f:
+            self.assertEqual(f.read(), b'x' * 10)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'evictions': 0,
+                                         'entries': 1, 'bytes': 10})
+
+    def test_index_survives_reopening(self):
+        cache_dir = os.path.join(self.tmp, 'cache')
+        RenderCache(cache_dir).store('key', self.write('a.svg', 10))
+        reopened = RenderCache(cache_dir)
+        self.assertIn('key', reopened)
+        self.assertTrue(reopened.fetch('key', os.path.join(self.tmp, 'out.svg')))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = RenderCache(os.path.join(self.tmp, 'cache'), max_bytes=25)
+        cache.store('old', self.write('old.png', 10))
+        cache.store('used', self.write('used.png', 10))
+        cache._index['old']['last_used'] -= 10
+        cache._index['used']['last_used'] -= 5
+        self.assertTrue(cache.fetch('used', os.path.join(self.tmp, 'out.png')))
+        cache.store('new', self.write('new.png', 10))
+        self.assertNotIn('old', cache)
+        self.assertIn('used', cache)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertLessEqual(cache.total_bytes, 25)
+
+
+class ExportCacheTest(unittest.TestCase):
+
+    def test_unchanged_figures_come_from_the_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RenderCache(os.path.join(tmp, 'cache'))
+            first = export_all(['simple_example'], os.path.join(tmp, 'first'), ('png', 'svg'),
+                               dpi=50, workers=1, cache=cache)
+            second = export_all(['simple_example'], os.path.join(tmp, 'second'),
+                                ('png', 'svg'), dpi=50, workers=1, cache=cache)
+            self.assertEqual(first[0]['cached'], [])
+            self.assertEqual(second[0]['cached'], ['png', 'svg'])
+            self.assertEqual(cache.stats()['hits'], 2)
+            for fmt in ('png', 'svg'):
+                with open(os.path.join(tmp, 'first', f'simple_example.{fmt}'), 'rb') as a, \
+                        open(os.path.join(tmp, 'second', f'simple_example.{fmt}'), 'rb') as b:
+                    self.assertEqual(a.read(), b.read())
+
+            # Another dpi is another file
+            third = export_all(['simple_example'], os.path.join(tmp, 'third'), ('png',),
+                               dpi=60, workers=1, cache=cache)
+            self.assertEqual(third[0]['cached'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+# Tests for render_server: the worker pool's error paths and the HTTP front end
+#
+# Starts one real worker process (about as slow as one export.py run).
+# Run from this folder:
+#     python -m unittest test_render_server
+
+import json
+import unittest
+import urllib.error
+import urllib.request
+
+from render_server import QueueFull, RenderError, RenderPool, serve
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Long enough for any figure here at a low dpi, short enough to fail fast
+TIMEOUT = 60
+
+
+class RenderPoolTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = RenderPool(workers=1, queue_size=1, timeout=TIMEOUT, warm=False)
+        cls.server = serve(cls.pool, port=0)
+        cls.base = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.pool.close()
+
+    def tearDown(self):
+        self.pool.timeout = TIMEOUT
+
+    def get(self, path):
+        """(status, content type, body) of a GET"""
+        try:
+            with urllib.request.urlopen(self.base + path) as response:
+                return response.status, response.headers['Content-Type'], response.read()
+        except urllib.error.HTTPError as exc:
+            with exc:
+                return exc.code, exc.headers['Content-Type'], exc.read()
+
+    def test_render(self):
+        self.assertTrue(self.pool.render('simple_example', dpi=30).startswith(PNG_SIGNATURE))
+        self.assertTrue(self.pool.render('simple_example', 'svg').startswith(b'<?xml'))
+
+    def test_bad_requests_are_refused_before_queueing(self):
+        with self.assertRaises(KeyError):
+            self.pool.submit('no_such_figure')
+        with self.assertRaises(ValueError):
+            self.pool.submit('simple_example', format='gif')
+
+    def test_bad_parameters_raise_render_error(self):
+        before = self.pool.metrics.counts['error']
+        with self.assertRaisesRegex(RenderError, '^bad parameters for simple_example'):
+            self.pool.render('simple_example', params={'no_such_argument': 1})
+        self.assertEqual(self.pool.metrics.counts['error'], before + 1)
+        # The worker survives a failed render
+        self.assertEqual(self.pool.stats()['alive'], 1)
+
+    def test_full_queue_rejects(self):
+        # One job in flight and one waiting fill a queue of one
+        futures = []
+        with self.assertRaises(QueueFull):
+            for _ in range(3):
+                futures.append(self.pool.submit('simple_example', dpi=30))
+        for future in futures:
+            self.assertTrue(future.result().startswith(PNG_SIGNATURE))
+        self.assertGreaterEqual(self.pool.metrics.counts['rejected'], 1)
+
+    def test_timeout_kills_and_replaces_the_worker(self):
+        recycled, pid = self.pool.recycled, self.pool.stats()['pids']
+        before = self.pool.metrics.counts['timeout']
+        self.pool.timeout = 0.01
+        with self.assertRaises(TimeoutError):
+            self.pool.render('life_expectancy_gdp')
+        self.pool.timeout = TIMEOUT
+        self.assertEqual(self.pool.recycled, recycled + 1)
+        self.assertNotEqual(self.pool.stats()['pids'], pid)
+        self.assertEqual(self.pool.metrics.counts['timeout'], before + 1)
+        self.assertTrue(self.pool.render('simple_example', dpi=30).startswith(PNG_SIGNATURE))
+
+    def test_dead_worker_is_reported_and_replaced(self):
+        recycled = self.pool.recycled
+        before = self.pool.metrics.counts['crashed']
+        self.pool._workers[0].kill()
+        with self.assertRaisesRegex(RenderError, '^render worker died'):
+            self.pool.render('simple_example', dpi=30)
+        self.assertEqual(self.pool.recycled, recycled + 1)
+        self.assertEqual(self.pool.metrics.counts['crashed'], before + 1)
+        self.assertTrue(self.pool.render('simple_example', dpi=30).startswith(PNG_SIGNATURE))
+
+    def test_http_render(self):
+        status, content_type, body = self.get('/render/simple_example.png?dpi=30')
+        self.assertEqual((status, content_type), (200, 'image/png'))
+        self.assertTrue(body.startswith(PNG_SIGNATURE))
+
+    def test_http_errors(self):
+        cases = [
+            ('/render/no_such_figure.png', 404),
+            ('/render/simple_example.gif', 400),
+            ('/render/simple_example.png?dpi=abc', 400),
+            ('/render/simple_example.png?dpi=0', 400),
+            ('/render/simple_example.png?dpi=10000', 400),
+            ('/render/simple_example.png?data=x.csv', 400),
+            ('/render/simple_example.png?no_such_argument=1', 400),
+            ('/nowhere', 404),
+        ]
+        for path, expected in cases:
+            with self.subTest(path=path):
+                status, content_type, body = self.get(path)
+                self.assertEqual(status, expected)
+                self.assertEqual(content_type, 'application/json')
+                self.assertIn('error', json.loads(body))
+
+    def test_http_timeout_is_504(self):
+        self.pool.timeout = 0.01
+        status, _, body = self.get('/render/life_expectancy_gdp.png')
+        self.assertEqual(status, 504)
+        self.assertIn('longer than', json.loads(body)['error'])
+
+    def test_http_status_endpoints(self):
+        status, _, body = self.get('/healthz')
+        self.assertEqual((status, json.loads(body)['alive']), (200, 1))
+        status, _, body = self.get('/figures')
+        self.assertIn('simple_example', json.loads(body)['figures'])
+        status, _, body = self.get('/metrics')
+        self.assertIn('requests', json.loads(body))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,391 @@
+# Poster-size and zoomable exports rendered a region at a time
+#
+# fig.savefig('x.png', dpi=300) allocates one RGBA buffer for the whole
+# image (4 bytes per pixel: 6.4 GB at 40000 x 40000) and writes nothing
+# until it is all drawn and encoded. Here the layout and the tight bbox are
+# solved once at screen resolution and frozen, then each tile is a savefig()
+# of just that region of the figure: Agg only allocates the tile. Tiles are
+# drawn from the vector figure at every zoom level (no downsampling), in
+# worker processes that build the figure once each, and manifest.json
+# lists the pyramid so a viewer fetches only the tiles in view.
+# write_png_strips() streams one large PNG top to bottom the same way.
+# Run from this folder:
+#     python tiled_export.py life_expectancy_gdp --out poster_tiles --dpi 1200
+#     python tiled_export.py location_analysis --png poster.png --dpi 1200
+
+import argparse
+import io
+import json
+import math
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from startup import lazy_import
+
+mimage = lazy_import('matplotlib.image')
+np = lazy_import('numpy')
+mtransforms = lazy_import('matplotlib.transforms')
+
+TILE_SIZE = 512
+
+MANIFEST = 'manifest.json'
+
+# Tile paths relative to the output folder; rows count down from the top
+TILE_PATH = '{level}/{column}_{row}.png'
+
+# Tiles per worker task, to amortize the round trip to the pool
+_TILES_PER_TASK = 16
+
+# Rows filtered at once; the filter works in int16, so this bounds its temporaries
+_FILTER_ROWS = 16
+
+# Added to a region's width and height so Agg's int() sizing never drops a pixel
+_SIZE_EPSILON_PX = 0.01
+
+# Drawn past each inner edge of a tile or strip and cropped off. Agg clips
+# paths at the canvas edge before stroking them, so the caps, joins and
+# antialiasing of strokes crossing it differ from one full-size render;
+# 4 pt covers strokes up to 8 pt wide
+_CLIP_MARGIN_PT = 4
+
+
+def freeze_layout(fig, dpi, bbox_inches='tight', pad_inches=None):
+    """Solve fig's layout once and turn the engine off; returns the region to export in inches
+
+    A savefig() with a layout engine or a tight bbox dry-draws the whole
+    figure at the output dpi first, which allocates the full-size buffer
+    tiling avoids. Positions are figure fractions, so the solve holds at
+    any dpi; the tight bbox is measured at dpi, as savefig() would, with a
+    one-pixel renderer.
+    """
+    import matplotlib as mpl
+    from matplotlib.backends.backend_agg import RendererAgg
+
+    fig.draw_without_rendering()
+    fig.set_layout_engine(None)
+    if bbox_inches is None:
+        bbox_inches = mpl.rcParams['savefig.bbox']
+    if bbox_inches == 'tight':
+        if pad_inches is None:
+            pad_inches = mpl.rcParams['savefig.pad_inches']
+        original_dpi = fig.dpi
+        fig.dpi = dpi
+        try:
+            return fig.get_tightbbox(RendererAgg(1, 1, dpi)).padded(pad_inches)
+        finally:
+            fig.dpi = original_dpi
+    if bbox_inches in (None, 'standard'):
+        return mtransforms.Bbox.from_bounds(0, 0, *fig.get_size_inches())
+    return mtransforms.Bbox(bbox_inches)
+
+
+def _pixels(inches, dpi):
+    # Truncated like Agg sizes a savefig() canvas, less the float error
+    return max(1, int(inches * dpi + 1e-6))
+
+
+def tile_levels(region, dpi, tile_size=TILE_SIZE):
+    """The zoom levels of a pyramid over region (inches) at dpi
+
+    Level 0 fits one tile and each level doubles the resolution up to dpi
+    at the last one.
+    """
+    longest = max(_pixels(region.width, dpi), _pixels(region.height, dpi))
+    top = max(0, math.ceil(math.log2(longest / tile_size)))
+    levels = []
+    for level in range(top + 1):
+        level_dpi = dpi / 2 ** (top - level)
+        columns, rows = _pixels(region.width, level_dpi), _pixels(region.height, level_dpi)
+        levels.append({'level': level, 'dpi': level_dpi, 'width': columns, 'height': rows,
+                       'columns': math.ceil(columns / tile_size),
+                       'rows': math.ceil(rows / tile_size)})
+    return levels
+
+
+def region_bbox(region, dpi, left, top, width, height):
+    """Bbox in inches of a width x height pixel block at (left, top) of region at dpi"""
+    # A plain savefig() keeps the bottom edge and truncates the height to
+    # whole pixels, so rows are counted up from y0, not down from y1. The
+    # offsets are added in pixels, as savefig() scales the bbox by dpi, so
+    # text lands on the same subpixel positions as in one full-size render
+    x0 = (region.x0 * dpi + left) / dpi
+    y0 = (region.y0 * dpi + _pixels(region.height, dpi) - top - height) / dpi
+    y1 = y0 + height / dpi
+    # The slack goes past the right and top edges, which Agg then crops off
+    return mtransforms.Bbox.from_extents(x0, y0, x0 + (width + _SIZE_EPSILON_PX) / dpi,
+                                         y1 + _SIZE_EPSILON_PX / dpi)
+
+
+def visible_tiles(manifest, level, left, top, right, bottom):
+    """Tile paths a viewer needs for the pixel rectangle of one level"""
+    info = manifest['levels'][level]
+    size = manifest['tile_size']
+    columns = range(max(0, int(left // size)), min(info['columns'], math.ceil(right / size)))
+    rows = range(max(0, int(top // size)), min(info['rows'], math.ceil(bottom / size)))
+    return [manifest['path'].format(level=level, column=column, row=row)
+            for row in rows for column in columns]
+
+
+# Rendering, in this process or in pool workers
+
+_FIGURE = None
+
+
+def _init_worker(name, params, style, dpi):
+    """Pool initializer: build the figure once per worker, layout frozen"""
+    global _FIGURE
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    from figures import FIGURE_BUILDERS
+
+    if style:
+        matplotlib.rcParams.update(style)
+    _FIGURE = FIGURE_BUILDERS[name](**(params or {}))
+    freeze_layout(_FIGURE, dpi)
+
+
+def _render_block(fig, region, dpi, left, top, width, height):
+    """RGBA pixels of a width x height block at (left, top) of region at dpi"""
+    margin = math.ceil(_CLIP_MARGIN_PT * dpi / 72)
+    # No margin past the region's own edges, where a full-size render clips too
+    before_x = min(margin, left)
+    after_x = min(margin, _pixels(region.width, dpi) - left - width)
+    before_y = min(margin, top)
+    after_y = min(margin, _pixels(region.height, dpi) - top - height)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='rgba', dpi=dpi,
+                bbox_inches=region_bbox(region, dpi, left - before_x, top - before_y,
+                                        before_x + width + after_x,
+                                        before_y + height + after_y))
+    pixels = np.frombuffer(buffer.getvalue(), np.uint8)
+    pixels = pixels.reshape(before_y + height + after_y, before_x + width + after_x, 4)
+    return pixels[before_y:before_y + height, before_x:before_x + width]
+
+
+def _render_tiles(output_dir, region, level, tiles, tile_size, fig=None):
+    """Save each (column, row) tile of level; returns the bytes written"""
+    fig = fig or _FIGURE
+    written = 0
+    for column, row in tiles:
+        left, top = column * tile_size, row * tile_size
+        width = min(tile_size, level['width'] - left)
+        height = min(tile_size, level['height'] - top)
+        path = os.path.join(output_dir, TILE_PATH.format(level=level['level'], column=column,
+                                                         row=row))
+        pixels = _render_block(fig, region, level['dpi'], left, top, width, height)
+        mimage.imsave(path, np.ascontiguousarray(pixels), format='png', origin='upper',
+                      dpi=level['dpi'])
+        written += os.path.getsize(path)
+    return written
+
+
+def _render_strip(region, dpi, width, top, height, fig=None):
+    """RGBA pixels of a full-width strip of rows"""
+    fig = fig or _FIGURE
+    return _render_block(fig, region, dpi, 0, top, width, height).tobytes()
+
+
+class _Renderer:
+    """Runs render calls in this process (figure given) or in a pool building it by name"""
+
+    def __init__(self, figure, dpi, workers, params):
+        import matplotlib.pyplot as plt
+        from render_cache import active_style
+
+        self.pool, self.workers = None, 1
+        if isinstance(figure, str):
+            from figures import FIGURE_BUILDERS
+
+            style = active_style()
+            self.fig = FIGURE_BUILDERS[figure](**(params or {}))
+            self.owned = True
+            if workers != 1:
+                self.workers = workers or os.cpu_count() or 1
+                # spawn gives each worker a clean pyplot state, whatever the parent imported
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=get_context('spawn'),
+                    initializer=_init_worker, initargs=(figure, params, style, dpi))
+        else:
+            self.fig, self.owned = figure, False
+        self._close = plt.close
+        self.region = freeze_layout(self.fig, dpi)
+
+    def submit(self, func, *args):
+        """A zero-argument callable returning func(*args)'s result"""
+        if self.pool is None:
+            result = func(*args, fig=self.fig)
+            return lambda: result
+        return self.pool.submit(func, *args).result
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.owned:
+            self._close(self.fig)
+
+
+def export_tiles(figure, output_dir, dpi=300, tile_size=TILE_SIZE, workers=None, params=None):
+    """Render figure as a PNG tile pyramid under output_dir; returns the manifest
+
+    figure is a figures.py builder name (tiles render in worker processes,
+    each building the figure once; workers=1 renders here) or a Figure
+    (rendered in this process). Memory per renderer is one tile, however
+    large dpi makes the image. manifest.json records the region, tile size
+    and per-level pixel size and grid; tile (column, row) of level is at
+    manifest['path'].format(level=, column=, row=), row 0 at the top.
+    """
+    start = time.perf_counter()
+    renderer = _Renderer(figure, dpi, workers, params)
+    try:
+        region = renderer.region
+        levels = tile_levels(region, dpi, tile_size)
+        pending, written = [], 0
+        for level in levels:
+            os.makedirs(os.path.join(output_dir, str(level['level'])), exist_ok=True)
+            tiles = [(column, row) for row in range(level['rows'])
+                     for column in range(level['columns'])]
+            for first in range(0, len(tiles), _TILES_PER_TASK):
+                pending.append(renderer.submit(_render_tiles, output_dir, region, level,
+                                               tiles[first:first + _TILES_PER_TASK], tile_size))
+        for result in pending:
+            written += result()
+    finally:
+        renderer.close()
+
+    manifest = {
+        'figure': figure if isinstance(figure, str) else None,
+        'format': 'png',
+        'dpi': dpi,
+        'tile_size': tile_size,
+        'bbox_inches': list(region.extents),
+        'width': levels[-1]['width'],
+        'height': levels[-1]['height'],
+        'path': TILE_PATH,
+        'levels': levels,
+        'tiles': sum(level['columns'] * level['rows'] for level in levels),
+        'bytes': written,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    with open(os.path.join(output_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+# Streamed single-file PNG
+
+def _png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+def _paeth_rows(pixels, previous):
+    """PNG scanlines of an RGBA strip with the Paeth filter, each led by its filter byte
+
+    previous is the row above the strip (zeros at the top of the image).
+    """
+    height, width = pixels.shape[:2]
+    current = pixels.reshape(height, width * 4).astype(np.int16)
+    above = np.vstack([previous.reshape(1, -1).astype(np.int16), current[:-1]])
+    left = np.zeros_like(current)
+    left[:, 4:] = current[:, :-4]
+    upper_left = np.zeros_like(current)
+    upper_left[:, 4:] = above[:, :-4]
+    estimate = left + above - upper_left
+    to_left, to_above, to_upper_left = (np.abs(estimate - values)
+                                        for values in (left, above, upper_left))
+    predictor = np.where((to_left <= to_above) & (to_left <= to_upper_left), left,
+                         np.where(to_above <= to_upper_left, above, upper_left))
+    rows = np.empty((height, width * 4 + 1), np.uint8)
+    rows[:, 0] = 4
+    rows[:, 1:] = (current - predictor).astype(np.uint8)
+    return rows
+
+
+def write_png_strips(figure, path, dpi=300, strip_rows=256, workers=None, params=None,
+                     compress_level=6):
+    """Render figure into one PNG at dpi, strip_rows at a time; returns (width, height)
+
+    Strips are drawn in order (in workers when figure is a builder name,
+    like export_tiles()) and compressed straight into the file, so memory
+    is a few strips rather than the whole image and a viewer reading the
+    file shows it top down as it is written.
+    """
+    renderer = _Renderer(figure, dpi, workers, params)
+    try:
+        region = renderer.region
+        width, height = _pixels(region.width, dpi), _pixels(region.height, dpi)
+        # Bounds the strips rendered ahead of the encoder
+        window = 2 * renderer.workers
+        compressor = zlib.compressobj(compress_level)
+        previous = np.zeros(width * 4, np.uint8)
+        with open(path, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n')
+            f.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+            per_metre = round(dpi / 0.0254)
+            f.write(_png_chunk(b'pHYs', struct.pack('>IIB', per_metre, per_metre, 1)))
+
+            def write_next():
+                nonlocal previous
+                rows, result = queued.popleft()
+                pixels = np.frombuffer(result(), np.uint8).reshape(rows, width, 4)
+                for first in range(0, rows, _FILTER_ROWS):
+                    block = pixels[first:first + _FILTER_ROWS]
+                    data = compressor.compress(_paeth_rows(block, previous).tobytes())
+                    previous = block[-1]
+                    if data:
+                        f.write(_png_chunk(b'IDAT', data))
+
+            queued = deque()
+            for top in range(0, height, strip_rows):
+                rows = min(strip_rows, height - top)
+                queued.append((rows, renderer.submit(_render_strip, region, dpi, width, top,
+                                                     rows)))
+                if len(queued) >= window:
+                    write_next()
+            while queued:
+                write_next()
+            f.write(_png_chunk(b'IDAT', compressor.flush()))
+            f.write(_png_chunk(b'IEND', b''))
+    finally:
+        renderer.close()
+    return width, height
+
+
+def main():
+    from figures import EARLYON_CSV, EARLYON_FIGURES, FIGURE_BUILDERS
+
+    parser = argparse.ArgumentParser(description='Tiled or streamed high-resolution export')
+    parser.add_argument('name', choices=list(FIGURE_BUILDERS), metavar='figure',
+                        help=f"one of {', '.join(FIGURE_BUILDERS)}")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--out', help='folder for the tile pyramid and manifest.json')
+    output.add_argument('--png', help='write one PNG, streamed strip by strip, instead')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes to use (default: one per CPU, 1 = serial)')
+    parser.add_argument('--earlyon-csv', default=EARLYON_CSV,
+                        help='EarlyON centres CSV for the language and location analysis figures')
+    args = parser.parse_args()
+
+    params = {'input_file': args.earlyon_csv} if args.name in EARLYON_FIGURES else None
+    start = time.perf_counter()
+    if args.png:
+        width, height = write_png_strips(args.name, args.png, args.dpi, args.tile_size,
+                                         args.workers, params)
+        print(f"Wrote {args.png}: {width} x {height} px, {os.path.getsize(args.png) / 1e6:.1f} MB "
+              f"in {time.perf_counter() - start:.1f}s")
+        return
+    manifest = export_tiles(args.name, args.out, args.dpi, args.tile_size, args.workers, params)
+    print(f"Wrote {manifest['tiles']} tiles in {len(manifest['levels'])} levels "
+          f"({manifest['width']} x {manifest['height']} px, {manifest['bytes'] / 1e6:.1f} MB) "
+          f"to {args.out} in {manifest['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+# Compact SVG/PDF output
+#
+# matplotlib's vector backends write every marker of a bubble chart as its
+# own path (one <path> def or PDF XObject per marker size), every
+# coordinate with six decimals and a full style string on every <use>.
+# This backend writes each marker shape once and places it with a scale
+# and offset per point (the stroke width is divided by the scale, so
+# outlines keep their width), rounds coordinates to `precision` decimals
+# of a point (1/72 in), groups runs of markers with the same style, and
+# simplifies long polylines to `tolerance` points with matplotlib's own
+# path simplifier. save_compact() can also rasterize dense layers at the
+# save dpi while text, axes and legends stay vectors.
+#     save_compact(fig, 'bubbles.svg', rasterize_above=50_000)
+#     fig.savefig('bubbles.pdf', backend=COMPACT_BACKEND, precision=1)
+#
+# The renderers build on private matplotlib internals (matplotlib._path,
+# backend_pdf's Op/PdfFile/Verbatim, backend_svg._generate_css and the
+# renderers' underscore helpers), written against matplotlib 3.10 and
+# 3.11; the hatchcolors argument 3.11 added to the collection methods is
+# passed only when the installed version takes it. The project only pins matplotlib>=3.10.6, so if a release drops
+# those imports, COMPACT_AVAILABLE is False and every compact save falls
+# back to a plain savefig() (precision and tolerance are then ignored).
+
+import copy
+import inspect
+import os
+
+import matplotlib as mpl
+import numpy as np
+from matplotlib.backend_bases import RendererBase
+from matplotlib.backends.backend_mixed import MixedModeRenderer
+from matplotlib.backends.backend_pdf import FigureCanvasPdf, PdfPages, RendererPdf
+from matplotlib.backends.backend_svg import FigureCanvasSVG, RendererSVG
+from matplotlib.collections import Collection
+from matplotlib.lines import Line2D
+from matplotlib.transforms import Affine2D
+
+try:
+    from matplotlib import _path
+    from matplotlib.backends.backend_pdf import Op, PdfFile, Verbatim
+    from matplotlib.backends.backend_svg import _generate_css
+    COMPACT_AVAILABLE = True
+except ImportError:
+    COMPACT_AVAILABLE = False
+
+# Whether RendererBase takes the hatchcolors argument (matplotlib >= 3.11)
+_HAS_HATCHCOLORS = 'hatchcolors' in inspect.signature(RendererBase._iter_collection).parameters
+
+COMPACT_BACKEND = 'module://vector_export'
+
+VECTOR_FORMATS = ('svg', 'svgz', 'pdf')
+
+# Hundredths of a point (0.004 mm) are below anything a screen or printer shows
+DEFAULT_PRECISION = 2
+
+# Largest deviation, in points, a simplified polyline may have from the data
+DEFAULT_TOLERANCE = 0.25
+
+
+def _number(value, precision):
+    text = f'{value:.{precision}f}'.rstrip('0').rstrip('.') if precision else f'{value:.0f}'
+    return '0' if text in ('-0', '') else text
+
+
+def _simplified(path, tolerance):
+    """path with its simplification threshold set to tolerance (when it simplifies at all)"""
+    if tolerance is None or not path.should_simplify:
+        return path
+    path = copy.copy(path)
+    path.simplify_threshold = tolerance
+    return path
+
+
+def _marker_scales(master_transform, paths, all_transforms, linestyles):
+    """Per-transform scale when a collection is shared shapes scaled about their origin
+
+    Scatter plots draw one unit marker path under a scale-only transform
+    per point; anything else (rotations, dashes, data-space paths) returns
+    None and is drawn as matplotlib would.
+    """
+    if not len(paths) or not len(all_transforms) or not master_transform.is_affine:
+        return None
+    if not np.allclose(master_transform.get_matrix(), np.eye(3)):
+        return None
+    if any(dashes is not None for _, dashes in linestyles):
+        return None
+    matrices = np.asarray(all_transforms, float)
+    scales = matrices[:, 0, 0]
+    off_diagonal = matrices[:, [0, 1, 0, 1], [1, 0, 2, 2]]
+    if (off_diagonal != 0).any() or (matrices[:, 1, 1] != scales).any() or (scales < 0).any():
+        return None
+    return scales
+
+
+def _shape_precision(precision, scales):
+    """Decimals for a shape drawn at up to scales.max(), so placed copies keep precision"""
+    return precision + max(0, int(np.ceil(np.log10(max(scales.max(), 1)))))
+
+
+def _hatch_kwargs(hatchcolors, default):
+    # matplotlib 3.11 added per-item hatch colors to the collection methods; 3.10 has none
+    if not _HAS_HATCHCOLORS:
+        return {}
+    return {'hatchcolors': default if hatchcolors is None else hatchcolors}
+
+
+def _item_ids(ids, scales):
+    # Items cycle through paths and transforms like _iter_collection_raw_paths()
+    return [(ids[i % len(ids)], scales[i % len(scales)])
+            for i in range(max(len(ids), len(scales)))]
+
+
+class _ScaledLinewidth:
+    """Divide gc's line width by scale while the style is read, so outlines keep their width"""
+
+    def __init__(self, gc, scale):
+        self.gc, self.scale = gc, scale
+
+    def __enter__(self):
+        self.linewidth = self.gc.get_linewidth()
+        if self.scale:
+            self.gc.set_linewidth(self.linewidth / self.scale)
+
+    def __exit__(self, *exc_info):
+        self.gc.set_linewidth(self.linewidth)
+
+
+class RendererCompactSVG(RendererSVG):
+    """RendererSVG writing shared marker symbols, rounded coordinates and simplified lines"""
+
+    def __init__(self, width, height, svgwriter, basename=None, image_dpi=72, *, metadata=None,
+                 precision=DEFAULT_PRECISION, tolerance=DEFAULT_TOLERANCE):
+        self.precision = precision
+        self.tolerance = tolerance
+        super().__init__(width, height, svgwriter, basename, image_dpi, metadata=metadata)
+
+    def _convert_path(self, path, transform=None, clip=None, simplify=None, sketch=None,
+                      precision=None):
+        clip = (0.0, 0.0, self.width, self.height) if clip else None
+        return _path.convert_to_string(
+            path, transform, clip, simplify, sketch,
+            self.precision if precision is None else precision,
+            [b'M', b'L', b'Q', b'C', b'z'], False).decode('ascii')
+
+    def draw_path(self, gc, path, transform, rgbFace=None):
+        super().draw_path(gc, _simplified(path, self.tolerance), transform, rgbFace)
+
+    def draw_markers(self, gc, marker_path, marker_trans, path, trans, rgbFace=None):
+        # As RendererSVG.draw_markers, with the style written once on the group
+        if not len(path.vertices):
+            return
+        writer = self.writer
+        path_data = self._convert_path(marker_path, marker_trans + Affine2D().scale(1.0, -1.0),
+                                       simplify=False)
+        style = self._get_style_dict(gc, rgbFace)
+        key = (path_data, _generate_css(style))
+        oid = self._markers.get(key)
+        if oid is None:
+            oid = self._make_id('m', key)
+            writer.start('defs')
+            writer.element('path', id=oid, d=path_data,
+                           style=_generate_css({k: v for k, v in style.items()
+                                                if k.startswith('stroke')}))
+            writer.end('defs')
+            self._markers[key] = oid
+
+        writer.start('g', **self._get_clip_attrs(gc), style=self._get_style(gc, rgbFace))
+        if gc.get_url() is not None:
+            writer.start('a', {'xlink:href': gc.get_url(), 'target': '_blank'})
+        for vertices, _ in path.iter_segments(self._make_flip_transform(trans),
+                                              clip=(0, 0, self.width * 72, self.height * 72),
+                                              simplify=False):
+            if len(vertices):
+                x, y = vertices[-2:]
+                writer.element('use', attrib={'xlink:href': f'#{oid}',
+                                              'x': _number(x, self.precision),
+                                              'y': _number(y, self.precision)})
+        if gc.get_url() is not None:
+            writer.end('a')
+        writer.end('g')
+
+    def draw_path_collection(self, gc, master_transform, paths, all_transforms, offsets,
+                             offset_trans, facecolors, edgecolors, linewidths, linestyles,
+                             antialiaseds, urls, offset_position, *, hatchcolors=None):
+        scales = _marker_scales(master_transform, paths, all_transforms, linestyles)
+        if scales is None:
+            return super().draw_path_collection(
+                gc, master_transform, paths, all_transforms, offsets, offset_trans,
+                facecolors, edgecolors, linewidths, linestyles, antialiaseds, urls,
+                offset_position, **_hatch_kwargs(hatchcolors, None))
+
+        writer = self.writer
+        flip = Affine2D().scale(1.0, -1.0)
+        writer.start('defs')
+        ids = []
+        for i, path in enumerate(paths):
+            d = self._convert_path(path, flip, simplify=False,
+                                   precision=_shape_precision(self.precision, scales))
+            ids.append(f'C{self._path_collection_id:x}_{i:x}_{self._make_id("", d)}')
+            writer.element('path', id=ids[-1], d=d)
+        writer.end('defs')
+
+        group = None
+        for xo, yo, (path_id, scale), gc0, rgbFace in self._iter_collection(
+                gc, _item_ids(ids, scales), offsets, offset_trans, facecolors, edgecolors,
+                linewidths, linestyles, antialiaseds, urls, offset_position,
+                **_hatch_kwargs(hatchcolors, [])):
+            if not scale:
+                continue
+            # The stroke width varies with the scale, so it is the one property
+            # written per marker; the rest goes on the group
+            style = self._get_style_dict(gc0, rgbFace)
+            stroke_width = style.pop('stroke-width', None)
+            style = _generate_css(style)
+            clip_attrs = self._get_clip_attrs(gc0)
+            # Consecutive markers with one style share a <g> carrying it
+            key = (style, tuple(clip_attrs.items()))
+            if key != group:
+                if group is not None:
+                    writer.end('g')
+                writer.start('g', **clip_attrs, style=style)
+                group = key
+            url = gc0.get_url()
+            if url is not None:
+                writer.start('a', attrib={'xlink:href': url, 'target': '_blank'})
+            x, y = _number(xo, self.precision), _number(self.height - yo, self.precision)
+            if scale == 1:
+                attrib = {'xlink:href': f'#{path_id}', 'x': x, 'y': y}
+            else:
+                attrib = {'xlink:href': f'#{path_id}',
+                          'transform': f'translate({x} {y}) scale({_number(scale, 4)})'}
+            if stroke_width is not None:
+                attrib['stroke-width'] = f'{float(stroke_width) / scale:.3g}'
+            writer.element('use', attrib=attrib)
+            if url is not None:
+                writer.end('a')
+        if group is not None:
+            writer.end('g')
+        self._path_collection_id += 1
+
+
+if COMPACT_AVAILABLE:
+    class _CompactPdfFile(PdfFile):
+        """PdfFile writing path coordinates with `precision` decimals"""
+
+        def __init__(self, filename, metadata=None, precision=DEFAULT_PRECISION):
+            self.precision = precision
+            super().__init__(filename, metadata=metadata)
+
+        def pathOperations(self, path, transform, clip=None, simplify=None, sketch=None):
+            return [Verbatim(_path.convert_to_string(
+                path, transform, clip, simplify, sketch, self.precision,
+                [Op.moveto.value, Op.lineto.value, b'', Op.curveto.value, Op.closepath.value],
+                True))]
+
+
+class RendererCompactPdf(RendererPdf):
+    """RendererPdf drawing scatter markers from one XObject per shape, with simplified lines"""
+
+    def __init__(self, file, image_dpi, height, width, *, precision=DEFAULT_PRECISION,
+                 tolerance=DEFAULT_TOLERANCE):
+        self.precision = precision
+        self.tolerance = tolerance
+        super().__init__(file, image_dpi, height, width)
+
+    def draw_path(self, gc, path, transform, rgbFace=None):
+        super().draw_path(gc, _simplified(path, self.tolerance), transform, rgbFace)
+
+    def draw_path_collection(self, gc, master_transform, paths, all_transforms, offsets,
+                             offset_trans, facecolors, edgecolors, linewidths, linestyles,
+                             antialiaseds, urls, offset_position, *, hatchcolors=None):
+        scales = _marker_scales(master_transform, paths, all_transforms, linestyles)
+        facecolors, edgecolors = np.asarray(facecolors), np.asarray(edgecolors)
+        linewidths = np.asarray(linewidths, float)
+        # An XObject fixes whether it fills and strokes (and their alpha) for every
+        # use, as in RendererPdf.draw_path_collection
+        shared = True
+        if not len(facecolors):
+            filled, shared = False, not gc.get_hatch()
+        else:
+            filled = facecolors[0, 3] != 0
+            shared = (facecolors[:, 3] == facecolors[0, 3]).all()
+        if not len(edgecolors) or not linewidths.any():
+            stroked = False
+        else:
+            stroked = edgecolors[0, 3] != 0
+            shared = shared and (edgecolors[:, 3] == edgecolors[0, 3]).all()
+        if scales is None or not shared or not (scales > 0).any():
+            return super().draw_path_collection(
+                gc, master_transform, paths, all_transforms, offsets, offset_trans,
+                facecolors, edgecolors, linewidths, linestyles, antialiaseds, urls,
+                offset_position, **_hatch_kwargs(hatchcolors, None))
+
+        # Shapes are stored at the largest marker size, so `precision` holds for
+        # every use, and each use scales down from there
+        largest = scales.max()
+        relative = scales / largest
+        padding = linewidths.max(initial=0) / relative[relative > 0].min()
+        size = Affine2D().scale(largest)
+        names = [self.file.pathCollectionObject(gc, path, size, padding, filled, stroked)
+                 for path in paths]
+        extents = {name: path.get_extents(size) for name, path in zip(names, paths)}
+        width, height = self.file.width * 72, self.file.height * 72
+
+        output = self.file.output
+        output(*self.gc.push())
+        for xo, yo, (name, scale), gc0, rgbFace in self._iter_collection(
+                gc, _item_ids(names, relative), offsets, offset_trans, facecolors, edgecolors,
+                linewidths, linestyles, antialiaseds, urls, offset_position,
+                **_hatch_kwargs(hatchcolors, [])):
+            if not scale:
+                continue
+            # Skip markers entirely off the page, as RendererPdf does
+            x0, y0, x1, y1 = extents[name].extents * scale
+            if x1 + xo < 0 or x0 + xo > width or y1 + yo < 0 or y0 + yo > height:
+                continue
+            with _ScaledLinewidth(gc0, scale):
+                self.check_gc(gc0, rgbFace)
+            scale = float(f'{scale:.4g}')
+            output(Op.gsave, scale, 0, 0, scale, round(xo, self.precision),
+                   round(yo, self.precision), Op.concat_matrix, name, Op.use_xobject,
+                   Op.grestore)
+        output(*self.gc.pop())
+
+
+class FigureCanvasCompact(FigureCanvasSVG):
+    """Canvas for savefig(backend=COMPACT_BACKEND) to SVG or PDF
+
+    Takes savefig() keyword arguments precision (decimals of a point) and
+    tolerance (points; None leaves line simplification as matplotlib has it).
+    Without COMPACT_AVAILABLE it writes what the SVG and PDF backends do.
+    """
+
+    filetypes = {**FigureCanvasSVG.filetypes, 'pdf': 'Portable Document Format'}
+
+    def print_svg(self, filename, *, precision=DEFAULT_PRECISION, tolerance=DEFAULT_TOLERANCE,
+                  bbox_inches_restore=None, metadata=None, **kwargs):
+        import codecs
+        from matplotlib import cbook
+
+        if not COMPACT_AVAILABLE:
+            return super().print_svg(filename, bbox_inches_restore=bbox_inches_restore,
+                                     metadata=metadata)
+        # As FigureCanvasSVG.print_svg, with the compact renderer
+        with cbook.open_file_cm(filename, 'w', encoding='utf-8') as fh:
+            if not cbook.file_requires_unicode(fh):
+                fh = codecs.getwriter('utf-8')(fh)
+            dpi = self.figure.dpi
+            self.figure.dpi = 72
+            width, height = self.figure.get_size_inches()
+            renderer = MixedModeRenderer(
+                self.figure, width, height, dpi,
+                RendererCompactSVG(width * 72, height * 72, fh, image_dpi=dpi, metadata=metadata,
+                                   precision=precision, tolerance=tolerance),
+                bbox_inches_restore=bbox_inches_restore)
+            self.figure.draw(renderer)
+            renderer.finalize()
+
+    def print_svgz(self, filename, **kwargs):
+        import gzip
+        from matplotlib import cbook
+
+        with (cbook.open_file_cm(filename, 'wb') as fh,
+              gzip.GzipFile(mode='w', fileobj=fh) as gzipwriter):
+            return self.print_svg(gzipwriter, **kwargs)
+
+    def print_pdf(self, filename, *, precision=DEFAULT_PRECISION, tolerance=DEFAULT_TOLERANCE,
+                  bbox_inches_restore=None, metadata=None, **kwargs):
+        if not COMPACT_AVAILABLE:
+            return FigureCanvasPdf.print_pdf(self, filename,
+                                             bbox_inches_restore=bbox_inches_restore,
+                                             metadata=metadata)
+        # As FigureCanvasPdf.print_pdf, with the compact renderer
+        dpi = self.figure.dpi
+        self.figure.dpi = 72
+        width, height = self.figure.get_size_inches()
+        if isinstance(filename, PdfPages):
+            file = filename._ensure_file()
+        else:
+            file = _CompactPdfFile(filename, metadata=metadata, precision=precision)
+        try:
+            file.newPage(width, height)
+            renderer = MixedModeRenderer(
+                self.figure, width, height, dpi,
+                RendererCompactPdf(file, dpi, height, width, precision=precision,
+                                   tolerance=tolerance),
+                bbox_inches_restore=bbox_inches_restore)
+            self.figure.draw(renderer)
+            renderer.finalize()
+            if not isinstance(filename, PdfPages):
+                file.finalize()
+        finally:
+            if isinstance(filename, PdfPages):
+                file.endStream()
+            else:
+                file.close()
+
+    def get_default_filetype(self):
+        return 'svg'
+
+
+# What savefig(backend=COMPACT_BACKEND) loads
+FigureCanvas = FigureCanvasCompact
+
+
+def _element_count(artist):
+    """Markers or vertices an artist writes to a vector file"""
+    if isinstance(artist, Collection):
+        return max(len(artist.get_offsets()), sum(len(path) for path in artist.get_paths()))
+    if isinstance(artist, Line2D):
+        return len(artist.get_xydata())
+    return 0
+
+
+def dense_artists(fig, min_elements):
+    """Data artists of fig with more than min_elements markers or vertices"""
+    return [artist for ax in fig.axes for artist in ax.get_children()
+            if _element_count(artist) > min_elements]
+
+
+def save_compact(fig, fname, *, format=None, precision=DEFAULT_PRECISION,
+                 tolerance=DEFAULT_TOLERANCE, rasterize_above=None, **kwargs):
+    """fig.savefig() to SVG/PDF through the compact backend
+
+    rasterize_above rasterizes (at the save dpi) every collection or line
+    with more markers or vertices than that for this save only; text,
+    axes, legends and sparse layers stay vectors. Other keyword arguments
+    go to fig.savefig().
+    """
+    if format is None and isinstance(fname, (str, os.PathLike)):
+        format = os.path.splitext(os.fspath(fname))[1][1:]
+    format = (format or mpl.rcParams['savefig.format']).lower()
+    if format not in VECTOR_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(VECTOR_FORMATS)}, not {format!r}")
+    dense = dense_artists(fig, rasterize_above) if rasterize_above is not None else []
+    previous = [artist.get_rasterized() for artist in dense]
+    for artist in dense:
+        artist.set_rasterized(True)
+    try:
+        fig.savefig(fname, format=format, backend=COMPACT_BACKEND, precision=precision,
+                    tolerance=tolerance, **kwargs)
+    finally:
+        for artist, rasterized in zip(dense, previous):
+            artist.set_rasterized(rasterized)
+    return fname